@@ -11,24 +11,88 @@ Usage:
     python price_fetcher.py quotes --stocks
     python price_fetcher.py quotes --crypto
     python price_fetcher.py history BTC --days 30
+    python price_fetcher.py stats
+    python price_fetcher.py startup-check
+
+Scripts calling the CLI in a loop can use ``python -m price_fetcher`` from
+this directory to reuse cached bytecode instead of recompiling the script.
 """
 
 import os
 import sys
 import json
 import time
+import struct
+import marshal
+import zlib
 import logging
 import argparse
-from datetime import datetime, timedelta
-from typing import Optional
+import tempfile
+import mmap
+import atexit
+import importlib.util
+from array import array
+from bisect import bisect_left
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from functools import lru_cache, partial, wraps
+from typing import Any, Callable, Iterator, Optional
 from dataclasses import dataclass, asdict
 from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+# Lets --profile cover loading this module as well as the command
+_IMPORT_STARTED_NS = time.perf_counter_ns()
+
+
+class _LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    Unlike ``importlib.util.LazyLoader`` this is safe when the first access
+    races between the executor's worker threads.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def _lazy_import(name: str) -> Optional[Any]:
+    """Return a lazy stand-in for module ``name``, or None if it is not installed.
+
+    Keeps ``is None`` availability checks working without paying the import
+    cost at startup.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        return None
+    return _LazyModule(name)
+
+
+# Heavy dependencies load on first use so commands like `list`, `cache` and
+# cached quote lookups don't pay for them (see STARTUP_BUDGET_MS)
+asyncio = _lazy_import("asyncio")
+requests = _lazy_import("requests")  # Checked when an API client is created
+aiohttp = _lazy_import("aiohttp")  # Only needed for the asyncio clients
+np = _lazy_import("numpy")  # Candle columns fall back to array.array
+sqlite3 = _lazy_import("sqlite3")  # Only needed for cache_format="sqlite"
 
 try:
-    import requests
+    import fcntl
 except ImportError:
-    print("Error: 'requests' package not installed. Run: pip install requests")
-    sys.exit(1)
+    fcntl = None  # No cross-process locking (e.g. Windows)
 
 # Configure logging
 logging.basicConfig(
@@ -51,6 +115,28 @@ class Config:
     request_timeout: int = 15
     max_retries: int = 3
     retry_delay: float = 1.0
+    concurrent_fetch: bool = True  # Fetch asset categories in parallel
+    max_workers: int = 4
+    max_concurrency: int = 8  # In-flight requests per asyncio client
+    memory_cache_entries: int = 256  # In-process LRU tier (0 disables)
+    cache_format: str = "json"  # "json", "binary" or "sqlite"
+    cache_max_bytes: int = 256 * 1024 * 1024  # Size limit for the file cache formats, candles included (0 = unbounded)
+    cache_max_entries: int = 10000  # Entry limit for the file cache formats; a candle series is one entry (0 = unbounded)
+    lock_timeout: float = 30.0  # Max wait for another process's in-flight fetch
+    cache_hard_ttl_seconds: int = 0  # Serve stale quotes up to this age while refreshing (0 disables)
+    candle_store: bool = True  # Persist history and fetch only the missing tail
+    twelvedata_rate_per_minute: int = 0  # API credits per minute, shared by all processes (0 disables)
+    coingecko_rate_per_minute: int = 30  # Requests per minute (0 disables)
+    rate_limit_mode: str = "queue"  # "queue" waits for budget, "fail" raises RateLimitExceeded
+    rate_limit_max_wait: float = 60.0  # Longest queue wait before failing
+    twelvedata_batch_size: int = 120  # Max symbols per TwelveData batch quote request
+    coingecko_page_size: int = 100  # Coins per CoinGecko markets page (max 250)
+    refresh_mode: str = "ttl"  # "ttl", or "market" to refresh each asset class on its trading schedule
+    watch_interval: float = 5.0  # Seconds between polls in watch()
+    quote_board: bool = True  # Publish fetched quotes to the shared-memory QuoteBoard
+    metrics: bool = True  # Record request/cache metrics and add them to the metrics file at exit
+    twelvedata_base_url: str = ""  # Override the TwelveData API root (e.g. a stand-in server)
+    coingecko_base_url: str = ""  # Override the CoinGecko API root
 
     @classmethod
     def from_env(cls) -> "Config":
@@ -61,6 +147,28 @@ class Config:
             cache_ttl_seconds=int(os.environ.get("PRICE_CACHE_TTL", "60")),
             request_timeout=int(os.environ.get("PRICE_REQUEST_TIMEOUT", "15")),
             max_retries=int(os.environ.get("PRICE_MAX_RETRIES", "3")),
+            concurrent_fetch=os.environ.get("PRICE_CONCURRENT_FETCH", "1") != "0",
+            max_workers=int(os.environ.get("PRICE_MAX_WORKERS", "4")),
+            max_concurrency=int(os.environ.get("PRICE_MAX_CONCURRENCY", "8")),
+            memory_cache_entries=int(os.environ.get("PRICE_MEMORY_CACHE_ENTRIES", "256")),
+            cache_format=os.environ.get("PRICE_CACHE_FORMAT", "json"),
+            cache_max_bytes=int(os.environ.get("PRICE_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+            cache_max_entries=int(os.environ.get("PRICE_CACHE_MAX_ENTRIES", "10000")),
+            lock_timeout=float(os.environ.get("PRICE_LOCK_TIMEOUT", "30")),
+            cache_hard_ttl_seconds=int(os.environ.get("PRICE_CACHE_HARD_TTL", "0")),
+            candle_store=os.environ.get("PRICE_CANDLE_STORE", "1") != "0",
+            twelvedata_rate_per_minute=int(os.environ.get("TWELVE_DATA_RATE_LIMIT", "0")),
+            coingecko_rate_per_minute=int(os.environ.get("COINGECKO_RATE_LIMIT", "30")),
+            rate_limit_mode=os.environ.get("PRICE_RATE_LIMIT_MODE", "queue"),
+            rate_limit_max_wait=float(os.environ.get("PRICE_RATE_LIMIT_MAX_WAIT", "60")),
+            twelvedata_batch_size=int(os.environ.get("TWELVE_DATA_BATCH_SIZE", "120")),
+            coingecko_page_size=int(os.environ.get("COINGECKO_PAGE_SIZE", "100")),
+            refresh_mode=os.environ.get("PRICE_REFRESH_MODE", "ttl"),
+            watch_interval=float(os.environ.get("PRICE_WATCH_INTERVAL", "5")),
+            quote_board=os.environ.get("PRICE_QUOTE_BOARD", "1") != "0",
+            metrics=os.environ.get("PRICE_METRICS", "1") != "0",
+            twelvedata_base_url=os.environ.get("TWELVE_DATA_BASE_URL", ""),
+            coingecko_base_url=os.environ.get("COINGECKO_BASE_URL", ""),
         )
 
 
@@ -108,6 +216,13 @@ CRYPTO = {
 # Combined mapping for all assets
 ALL_ASSETS = {**STOCKS_ETFS, **COMMODITIES, **CRYPTO}
 
+# Quote cache key for each asset category
+QUOTE_CATEGORIES = {
+    "stock_quotes": STOCKS_ETFS,
+    "commodity_quotes": COMMODITIES,
+    "crypto_quotes": CRYPTO,
+}
+
 
 # =============================================================================
 # Data Classes
@@ -144,320 +259,2521 @@ class PriceCandle:
     volume: float
 
 
+class CandleSeries:
+    """Columnar OHLCV candles backed by one contiguous typed array per field.
+
+    Columns are NumPy arrays when NumPy is installed, otherwise
+    ``array.array``. Indexing and iteration build PriceCandle rows on
+    demand, so code written against ``list[PriceCandle]`` keeps working.
+    """
+
+    COLUMNS = (
+        ("time", "q"),
+        ("open", "d"),
+        ("high", "d"),
+        ("low", "d"),
+        ("close", "d"),
+        ("volume", "d"),
+    )
+    DTYPES = {"q": "<i8", "d": "<f8"}
+
+    def __init__(self, columns: Optional[dict] = None):
+        columns = columns or {}
+        self.columns = {
+            name: self._column(typecode, columns.get(name, ()))
+            for name, typecode in self.COLUMNS
+        }
+        if len({len(c) for c in self.columns.values()}) > 1:
+            raise ValueError("Candle columns must have equal length")
+
+    @classmethod
+    def _column(cls, typecode: str, data):
+        """Coerce ``data`` to a column, without copying when it already is one."""
+        if np is not None:
+            return np.asarray(data, dtype=cls.DTYPES[typecode])
+        if isinstance(data, array) and data.typecode == typecode:
+            return data
+        return array(typecode, data)
+
+    @classmethod
+    def from_candles(cls, candles) -> "CandleSeries":
+        """Build from an iterable of PriceCandle rows."""
+        candles = list(candles)
+        return cls({name: [getattr(c, name) for c in candles] for name, _ in cls.COLUMNS})
+
+    @classmethod
+    def from_buffers(cls, buffers: dict) -> "CandleSeries":
+        """Build from raw little-endian column buffers (zero-copy with NumPy)."""
+        columns = {}
+        for name, typecode in cls.COLUMNS:
+            if np is not None:
+                columns[name] = np.frombuffer(buffers[name], dtype=cls.DTYPES[typecode])
+            else:
+                columns[name] = array(typecode)
+                columns[name].frombytes(buffers[name])
+        return cls(columns)
+
+    def __len__(self) -> int:
+        return len(self.columns["time"])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CandleSeries({name: column[index] for name, column in self.columns.items()})
+        return PriceCandle(*(column[index].item() if np is not None else column[index]
+                             for column in self.columns.values()))
+
+    def __iter__(self):
+        for row in zip(*(column.tolist() for column in self.columns.values())):
+            yield PriceCandle(*row)
+
+    def __repr__(self) -> str:
+        return f"CandleSeries({len(self)} candles)"
+
+    @property
+    def times(self):
+        return self.columns["time"]
+
+    def between(self, start: Optional[int] = None, end: Optional[int] = None) -> "CandleSeries":
+        """Candles with ``start <= time < end`` (times must be ascending)."""
+        times = self.times
+        if np is not None:
+            lo = int(np.searchsorted(times, start, "left")) if start is not None else 0
+            hi = int(np.searchsorted(times, end, "left")) if end is not None else len(times)
+        else:
+            lo = bisect_left(times, start) if start is not None else 0
+            hi = bisect_left(times, end) if end is not None else len(times)
+        return self[lo:hi]
+
+    def sorted(self) -> "CandleSeries":
+        """Return the series ordered by time (self if already ordered)."""
+        times = self.times
+        if np is not None:
+            if len(times) < 2 or bool(np.all(times[1:] >= times[:-1])):
+                return self
+            order = np.argsort(times, kind="stable")
+            return CandleSeries({name: column[order] for name, column in self.columns.items()})
+        if all(a <= b for a, b in zip(times, times[1:])):
+            return self
+        order = sorted(range(len(times)), key=times.__getitem__)
+        return CandleSeries({name: [column[i] for i in order] for name, column in self.columns.items()})
+
+    def to_bytes(self, name: str) -> memoryview:
+        """Zero-copy view of one column's raw little-endian bytes."""
+        column = self.columns[name]
+        if np is not None:
+            column = np.ascontiguousarray(column)
+        return memoryview(column).cast("B")
+
+    def to_dicts(self) -> list[dict]:
+        """Rows as plain dicts (for JSON output)."""
+        names = list(self.columns)
+        return [dict(zip(names, row)) for row in zip(*(c.tolist() for c in self.columns.values()))]
+
+
 @dataclass
 class HistoricalData:
     """Historical price data for an asset."""
     symbol: str
     name: str
-    candles: list[PriceCandle]
+    candles: CandleSeries
     interval: str
     source: str
 
+    def __post_init__(self):
+        if not isinstance(self.candles, CandleSeries):
+            self.candles = CandleSeries.from_candles(self.candles)
+
+    def to_dict(self) -> dict:
+        return {
+            "symbol": self.symbol,
+            "name": self.name,
+            "interval": self.interval,
+            "source": self.source,
+            "candles": self.candles.to_dicts()
+        }
+
+
+# =============================================================================
+# Resampling
+# =============================================================================
+
+# Weekly buckets start on Monday (1970-01-05), like TwelveData's weekly candles
+WEEK_ORIGIN = 4 * 86400
+
+
+def resample_ohlcv(prices: list, volumes: list, step: int) -> CandleSeries:
+    """Aggregate ``[timestamp_ms, value]`` point series into OHLCV candles.
+
+    Price points are grouped into UTC buckets of ``step`` seconds, stamped
+    with the bucket start. Each bucket takes the volume sample as of its
+    last price point (the nearest later sample if none precedes it);
+    CoinGecko volumes are rolling 24h totals, so they are not summed.
+    """
+    origin = WEEK_ORIGIN if step % (7 * 86400) == 0 else 0
+    if not prices:
+        return CandleSeries()
+
+    if np is None:
+        return _resample_ohlcv_rows(prices, volumes, step, origin)
+
+    points = np.asarray(prices, dtype=np.float64).reshape(-1, 2)
+    points = points[~np.isnan(points[:, 1])]
+    points = points[np.argsort(points[:, 0], kind="stable")]
+    if not len(points):
+        return CandleSeries()
+    times = (points[:, 0] // 1000).astype(np.int64)
+    values = points[:, 1]
+
+    buckets = (times - origin) // step * step + origin
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(times)] - 1
+
+    volume = np.zeros(len(starts))
+    samples = np.asarray(volumes, dtype=np.float64).reshape(-1, 2)
+    samples = samples[~np.isnan(samples[:, 1])]
+    if len(samples):
+        samples = samples[np.argsort(samples[:, 0], kind="stable")]
+        index = np.searchsorted(samples[:, 0] // 1000, times[ends], "right") - 1
+        volume = samples[np.clip(index, 0, None), 1]
+
+    return CandleSeries({
+        "time": buckets[starts],
+        "open": values[starts],
+        "high": np.maximum.reduceat(values, starts),
+        "low": np.minimum.reduceat(values, starts),
+        "close": values[ends],
+        "volume": volume,
+    })
+
+
+def _resample_ohlcv_rows(prices: list, volumes: list, step: int, origin: int) -> CandleSeries:
+    """Pure-Python fallback for ``resample_ohlcv``."""
+    points = sorted((int(t // 1000), v) for t, v in prices if v is not None)
+    samples = sorted((int(t // 1000), v) for t, v in volumes if v is not None)
+    sample_times = [t for t, _ in samples]
+
+    columns = {name: [] for name, _ in CandleSeries.COLUMNS}
+    last_time = None
+    for t, value in points:
+        bucket = (t - origin) // step * step + origin
+        if not columns["time"] or bucket != columns["time"][-1]:
+            if last_time is not None:
+                columns["volume"].append(_volume_as_of(samples, sample_times, last_time))
+            columns["time"].append(bucket)
+            columns["open"].append(value)
+            columns["high"].append(value)
+            columns["low"].append(value)
+            columns["close"].append(value)
+        else:
+            columns["high"][-1] = max(columns["high"][-1], value)
+            columns["low"][-1] = min(columns["low"][-1], value)
+            columns["close"][-1] = value
+        last_time = t
+    if last_time is not None:
+        columns["volume"].append(_volume_as_of(samples, sample_times, last_time))
+
+    return CandleSeries(columns)
+
+
+def _volume_as_of(samples: list, sample_times: list, t: int) -> float:
+    if not samples:
+        return 0.0
+    index = bisect_left(sample_times, t + 1) - 1
+    return samples[max(index, 0)][1]
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+METRICS_FILE_NAME = "fetch.metrics"
+
+
+def _endpoint_label(endpoint: str) -> str:
+    """Metrics label for an API endpoint, with path IDs collapsed.
+
+    ``coins/bitcoin/market_chart`` becomes ``coins/:id/market_chart`` so
+    label values stay bounded.
+    """
+    parts = endpoint.split("/")
+    if len(parts) > 2:
+        parts[1:-1] = [":id"] * (len(parts) - 2)
+    return "/".join(parts)
+
+
+class Metrics:
+    """Process-wide counters and latency histograms keyed by name and labels.
+
+    Recording is a dict update under a lock, cheap enough for every request
+    and cache read. CLI calls are short-lived, so ``flush`` (run at exit
+    once ``configure`` has been called) adds this process's numbers to a
+    JSON file in the cache dir, under a FileLock; the ``stats`` command
+    reports the accumulated totals or renders them as Prometheus text.
+
+    Series recorded:
+        requests_total{provider,endpoint,status}   HTTP attempts ("error": no response)
+        request_seconds{provider,endpoint}         per-attempt latency incl. body
+        retries_total{provider,endpoint}           attempts after the first
+        rate_limited_total{provider}               429 responses
+        credits_total{provider}                    API credits spent (TwelveData)
+        stage_seconds{component,stage}             rate_limit wait, parse, cache read/write
+        cache_reads_total{tier,result}             memory/file tier hits and misses
+        cache_lookups_total{key,result}            fresh/stale/miss per quote cache key
+        refresh_seconds{key}                       upstream refresh of a quote cache key
+    """
+
+    # Histogram bucket upper bounds in seconds; a final +Inf bucket is implied
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    PREFIX = "price_fetcher_"
+    LOCK_TIMEOUT = 5.0
+
+    def __init__(self):
+        self.enabled = True
+        self.path: Optional[Path] = None
+        self.since = time.time()
+        self._counters: dict[tuple, float] = {}
+        # Per series: a count per bucket (including +Inf), then the sum
+        self._histograms: dict[tuple, list[float]] = {}
+        self._lock = threading.Lock()
+        self._flush_registered = False
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Add ``value`` to a counter."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        if not self._flush_registered:
+            self._register_flush()
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Record a latency in a histogram."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(self.BUCKETS) + 2)
+            series[bisect_left(self.BUCKETS, seconds)] += 1
+            series[-1] += seconds
+        if not self._flush_registered:
+            self._register_flush()
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Time the enclosed block into histogram ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name: str, **labels) -> Callable:
+        """Decorator timing every call of a function into histogram ``name``."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_request(self, provider: str, endpoint: str, status, seconds: float) -> None:
+        """Record one HTTP attempt; ``status`` is the response code or "error"."""
+        endpoint = _endpoint_label(endpoint)
+        self.inc("requests_total", provider=provider, endpoint=endpoint, status=str(status))
+        self.observe("request_seconds", seconds, provider=provider, endpoint=endpoint)
+        if status == 429:
+            self.inc("rate_limited_total", provider=provider)
+
+    def configure(self, config: Config) -> None:
+        """Enable recording per ``config.metrics``, flushing to its cache_dir at exit."""
+        self.enabled = config.metrics
+        if not self.enabled:
+            return
+        self.path = Path(config.cache_dir) / METRICS_FILE_NAME
+        if self._counters or self._histograms:
+            self._register_flush()
+
+    def _register_flush(self) -> None:
+        """Flush at exit, once configured and something has been recorded.
+
+        Commands that record nothing (``cache --clear``, ``cache --stats``) then
+        never touch the metrics file.
+        """
+        with self._lock:
+            if self._flush_registered or self.path is None:
+                return
+            self._flush_registered = True
+        atexit.register(self.flush)
+
+    # -- Aggregation ----------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        """JSON-serializable copy of every series."""
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = [(key, list(series)) for key, series in self._histograms.items()]
+        return {
+            "since": self.since,
+            "buckets": list(self.BUCKETS),
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in counters
+            ],
+            "histograms": [
+                {"name": name, "labels": dict(labels), "counts": series[:-1], "sum": series[-1]}
+                for (name, labels), series in histograms
+            ],
+        }
+
+    def merge(self, data: dict) -> None:
+        """Add series from a ``to_dict`` copy (histograms with other buckets are dropped)."""
+        same_buckets = tuple(data.get("buckets", ())) == self.BUCKETS
+        with self._lock:
+            self.since = min(self.since, data.get("since", self.since))
+            for item in data.get("counters", ()):
+                key = (item["name"], tuple(sorted(item["labels"].items())))
+                self._counters[key] = self._counters.get(key, 0) + item["value"]
+            for item in data.get("histograms", ()) if same_buckets else ():
+                key = (item["name"], tuple(sorted(item["labels"].items())))
+                series = self._histograms.setdefault(key, [0] * (len(self.BUCKETS) + 2))
+                for i, value in enumerate(item["counts"] + [item["sum"]]):
+                    series[i] += value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.since = time.time()
+
+    @classmethod
+    def load(cls, path: Path) -> "Metrics":
+        """Read a metrics file written by ``flush`` (empty if missing or unreadable)."""
+        metrics = cls()
+        try:
+            with open(path, "r") as f:
+                metrics.merge(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return metrics
+
+    def _file_lock(self, path: Path) -> "FileLock":
+        return FileLock(path.with_name(f".{path.name}.lock"))
+
+    def flush(self) -> None:
+        """Add everything recorded since the last flush to the metrics file, then reset."""
+        if self.path is None:
+            return
+        data = self.to_dict()
+        if not data["counters"] and not data["histograms"]:
+            return
+        self.reset()
+
+        path = self.path
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with self._file_lock(path).held(self.LOCK_TIMEOUT):
+                total = Metrics.load(path)
+                total.merge(data)
+                fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+                with os.fdopen(fd, "w") as f:
+                    json.dump(total.to_dict(), f)
+                os.replace(tmp_path, path)
+        except OSError as e:  # Includes LockTimeout
+            # Keep the data so a later flush can still write it
+            self.merge(data)
+            logger.warning(f"Could not write metrics to {path}: {e}")
+
+    def totals(self) -> "Metrics":
+        """Persisted totals plus what this process has not flushed yet."""
+        total = Metrics.load(self.path) if self.path is not None else Metrics()
+        total.merge(self.to_dict())
+        return total
+
+    @staticmethod
+    def clear_file(path: Path) -> None:
+        """Delete a metrics file (e.g. ``stats --reset``)."""
+        try:
+            Path(path).unlink()
+        except FileNotFoundError:
+            pass
+
+    # -- Queries --------------------------------------------------------------
+
+    def counters(self, name: str) -> list[tuple[dict, float]]:
+        """All series of counter ``name`` as (labels, value)."""
+        with self._lock:
+            return [(dict(labels), value) for (n, labels), value in self._counters.items() if n == name]
+
+    def histograms(self, name: str) -> list[tuple[dict, list[float]]]:
+        """All series of histogram ``name`` as (labels, bucket counts + sum)."""
+        with self._lock:
+            return [(dict(labels), list(series)) for (n, labels), series in self._histograms.items()
+                    if n == name]
+
+    @classmethod
+    def quantile(cls, series: list[float], q: float) -> Optional[float]:
+        """Estimate a quantile from bucket counts, interpolating within the bucket.
+
+        Like Prometheus' ``histogram_quantile``, values in the +Inf bucket
+        are reported as the largest finite bound.
+        """
+        counts = series[:-1]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if i == len(cls.BUCKETS):
+                    return cls.BUCKETS[-1]
+                lower = cls.BUCKETS[i - 1] if i else 0.0
+                return lower + (cls.BUCKETS[i] - lower) * (rank - seen) / count
+            seen += count
+        return cls.BUCKETS[-1]
+
+    def render_prometheus(self) -> str:
+        """Every series in the Prometheus text exposition format."""
+        def labels_text(labels, extra=()):
+            pairs = [*labels, *extra]
+            if not pairs:
+                return ""
+            escape = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n"})
+            return "{" + ",".join(f'{k}="{str(v).translate(escape)}"' for k, v in pairs) + "}"
+
+        def number(value):
+            return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(series)) for key, series in self._histograms.items())
+
+        lines = []
+        last = None
+        for (name, labels), value in counters:
+            if name != last:
+                lines.append(f"# TYPE {self.PREFIX}{name} counter")
+                last = name
+            lines.append(f"{self.PREFIX}{name}{labels_text(labels)} {number(value)}")
+
+        for (name, labels), series in histograms:
+            if name != last:
+                lines.append(f"# TYPE {self.PREFIX}{name} histogram")
+                last = name
+            cumulative = 0
+            for bound, count in zip((*self.BUCKETS, "+Inf"), series[:-1]):
+                cumulative += count
+                le = bound if isinstance(bound, str) else f"{bound:g}"
+                lines.append(f"{self.PREFIX}{name}_bucket{labels_text(labels, [('le', le)])} {number(cumulative)}")
+            lines.append(f"{self.PREFIX}{name}_sum{labels_text(labels)} {number(series[-1])}")
+            lines.append(f"{self.PREFIX}{name}_count{labels_text(labels)} {number(cumulative)}")
+
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+# Shared by every client, cache and fetcher in the process
+METRICS = Metrics()
+
+
+# =============================================================================
+# Tracing
+# =============================================================================
+
+# Code flag of ``async def`` functions (inspect.CO_COROUTINE, without importing inspect)
+CO_COROUTINE = 0x80
+
+
+class _Span:
+    """Context manager recording one span into a Tracer."""
+
+    __slots__ = ("tracer", "name", "cat", "args", "started")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.tracer.add(self.name, self.cat, self.started, time.perf_counter_ns(), **self.args)
+
+
+class Tracer:
+    """Opt-in span recorder that writes Chrome trace-event JSON.
+
+    Disabled (the default), ``span`` returns a shared no-op context and
+    costs one attribute check. Started, every span is kept in memory
+    with its thread - or asyncio task, so concurrent coroutines get
+    their own rows - and ``write_chrome_trace`` saves them for
+    chrome://tracing or Perfetto.
+
+    ``start(network=True)`` also patches ``socket.getaddrinfo``,
+    ``socket.socket.connect`` and ``ssl.SSLContext.wrap_socket`` until
+    ``stop``, splitting request time into DNS, TCP connect and TLS
+    handshake; the asyncio clients report connection setup through an
+    aiohttp TraceConfig instead.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.origin_ns = 0
+        self._spans: list[tuple] = []
+        self._tids: dict[tuple, int] = {}
+        self._tid_names: dict[int, str] = {}
+        self._patches: list[tuple[Any, str, Any]] = []
+
+    def start(self, origin_ns: Optional[int] = None, network: bool = True) -> None:
+        """Start recording; timestamps are relative to ``origin_ns`` (default: now)."""
+        self._spans.clear()
+        self.origin_ns = time.perf_counter_ns() if origin_ns is None else origin_ns
+        self.enabled = True
+        if network and not self._patches:
+            self._patch_network()
+
+    def stop(self) -> None:
+        """Stop recording and undo the network patches; recorded spans are kept."""
+        self.enabled = False
+        for owner, attr, original in reversed(self._patches):
+            setattr(owner, attr, original)
+        self._patches.clear()
+
+    def _tid(self) -> int:
+        """Small integer id of the current asyncio task, or else thread."""
+        key, name = None, None
+        loop_module = sys.modules.get("asyncio")  # Never import asyncio just to trace
+        if loop_module is not None:
+            try:
+                task = loop_module.current_task()
+            except RuntimeError:
+                task = None
+            if task is not None:
+                key, name = ("task", id(task)), task.get_name()
+        if key is None:
+            key, name = ("thread", threading.get_ident()), threading.current_thread().name
+
+        tid = self._tids.get(key)
+        if tid is None:
+            tid = self._tids.setdefault(key, len(self._tids) + 1)
+            self._tid_names[tid] = name
+        return tid
+
+    def add(self, name: str, cat: str, start_ns: int, end_ns: int, **args) -> None:
+        """Record a finished span."""
+        if self.enabled:
+            self._spans.append((name, cat, start_ns, end_ns, self._tid(), args))
+
+    def span(self, name: str, cat: str = "fetch", **args):
+        """Context manager timing the enclosed block as a span."""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name, cat, args)
+
+    def traced(self, name: str, cat: str = "fetch") -> Callable:
+        """Decorator recording every call of a function or coroutine function as a span."""
+        def decorator(fn):
+            if fn.__code__.co_flags & CO_COROUTINE:
+                @wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await fn(*args, **kwargs)
+                    with _Span(self, name, cat, {}):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, name, cat, {}):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # -- Network hooks --------------------------------------------------------
+
+    def _patch(self, owner: Any, attr: str, name: str, skip: Optional[Callable] = None) -> None:
+        original = getattr(owner, attr)
+        tracer = self
+
+        @wraps(original)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled or (skip is not None and skip(*args)):
+                return original(*args, **kwargs)
+            with _Span(tracer, name, "net", {}):
+                return original(*args, **kwargs)
+
+        self._patches.append((owner, attr, original))
+        setattr(owner, attr, wrapper)
+
+    def _patch_network(self) -> None:
+        import socket
+        import ssl
+
+        self._patch(socket, "getaddrinfo", "net.dns")
+        # Non-blocking connects (asyncio) return at once; aiohttp traces those
+        self._patch(socket.socket, "connect", "net.connect", skip=lambda sock, *a: sock.gettimeout() == 0.0)
+        self._patch(ssl.SSLContext, "wrap_socket", "net.tls")
+
+    def aiohttp_trace_config(self) -> "aiohttp.TraceConfig":
+        """TraceConfig recording aiohttp connection setup (TCP connect and TLS) as spans."""
+        config = aiohttp.TraceConfig()
+
+        async def on_start(session, ctx, params):
+            ctx.connect_started = time.perf_counter_ns()
+
+        async def on_end(session, ctx, params):
+            self.add("net.connect", "net", ctx.connect_started, time.perf_counter_ns())
+
+        config.on_connection_create_start.append(on_start)
+        config.on_connection_create_end.append(on_end)
+        return config
+
+    # -- Output ---------------------------------------------------------------
+
+    def write_chrome_trace(self, path: str) -> None:
+        """Write recorded spans as Chrome trace-event JSON."""
+        pid = os.getpid()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self._tid_names.items()
+        ]
+        events.extend(
+            {"name": name, "cat": cat, "ph": "X", "pid": pid, "tid": tid,
+             "ts": (start - self.origin_ns) / 1000, "dur": (end - start) / 1000,
+             "args": {k: str(v) for k, v in args.items()}}
+            for name, cat, start, end, tid, args in self._spans
+        )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def elapsed_ms(self) -> float:
+        """Time from the trace origin to the end of the last span."""
+        return max((s[3] for s in self._spans), default=self.origin_ns) / 1e6 - self.origin_ns / 1e6
+
+    def summary(self) -> list[dict]:
+        """Per span name: count, total, self (total minus child spans) and max time in ms.
+
+        Sorted by self time, so the top rows are where time is actually spent.
+        """
+        by_tid: dict[int, list[tuple]] = {}
+        for span in self._spans:
+            by_tid.setdefault(span[4], []).append(span)
+
+        stats: dict[str, dict] = {}
+        for spans in by_tid.values():
+            spans.sort(key=lambda s: (s[2], -s[3]))  # Parents before the children they enclose
+            child_ns = [0] * len(spans)
+            stack: list[int] = []  # Indices of enclosing spans
+            for i, (_, _, start, end, _, _) in enumerate(spans):
+                while stack and spans[stack[-1]][3] <= start:
+                    stack.pop()
+                if stack:
+                    child_ns[stack[-1]] += end - start
+                stack.append(i)
+
+            for (name, _, start, end, _, _), child in zip(spans, child_ns):
+                entry = stats.setdefault(name, {"name": name, "count": 0, "total_ms": 0.0,
+                                                "self_ms": 0.0, "max_ms": 0.0})
+                entry["count"] += 1
+                entry["total_ms"] += (end - start) / 1e6
+                entry["self_ms"] += max(0, end - start - child) / 1e6
+                entry["max_ms"] = max(entry["max_ms"], (end - start) / 1e6)
+
+        return sorted(stats.values(), key=lambda e: e["self_ms"], reverse=True)
+
+
+_NO_SPAN = nullcontext()
+
+# Shared by every client, cache and fetcher in the process
+TRACER = Tracer()
+
 
 # =============================================================================
 # Cache Manager
 # =============================================================================
 
-class CacheManager:
-    """Simple file-based cache for price data."""
+class MemoryCache:
+    """Bounded in-process LRU cache with per-key TTL."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a value if present and not expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        if ttl_seconds <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Remove a key if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
 
-    def __init__(self, cache_dir: str, ttl_seconds: int = 60):
+class CacheManager:
+    """Simple file-based cache for price data.
+
+    With ``memory_entries`` > 0, ``get_quotes``/``set_quotes`` keep built
+    PriceQuote lists in a MemoryCache in front of the files (write-through).
+
+    ``ttl_seconds`` is the soft TTL. Quote entries stay readable as stale
+    through ``lookup_quotes`` until ``hard_ttl_seconds``.
+
+    Every ``set_quotes`` also updates a symbol-keyed quote index (one
+    file, ``INDEX_KEY``) so single symbols resolve without loading or
+    scanning whole category lists.
+
+    Entry files are spread over ``SHARDS`` subdirectories by key hash. With
+    ``max_bytes`` or ``max_entries`` set, reads record use in each file's
+    access time and writes start a background ``sweep`` once one is due,
+    which expires old entries and evicts least recently used ones. Each
+    series in ``candle_store`` counts as one entry toward the limits.
+
+    Other storage backends subclass this, overriding ``_read``, ``set``,
+    ``clear``, ``expire``, ``sweep`` and ``usage`` plus, where they store
+    them differently, the index methods and ``candle_store``.
+    ``CACHE_BACKENDS`` maps ``Config.cache_format`` to the class.
+    """
+
+    SUFFIX = ".json"
+    INDEX_KEY = "quote_index"
+    INDEX_LOCK_TIMEOUT = 5.0
+    # Entries and index rows are kept at least this long, since
+    # RefreshScheduler serves last closes until the next session opens
+    RETENTION_SECONDS = 7 * 24 * 3600
+    SHARDS = 16
+    SWEEP_INTERVAL = 300.0  # Longest time between sweeps of a bounded cache
+    SWEEP_LOW_WATER = 0.9  # Evict down to this fraction of the limits
+    STALE_TEMP_SECONDS = 3600  # Temp files this old were left by a crashed writer
+
+    def __init__(self, cache_dir: str, ttl_seconds: int = 60, memory_entries: int = 0,
+                 hard_ttl_seconds: int = 0, max_bytes: int = 0, max_entries: int = 0):
         self.cache_dir = Path(cache_dir)
         self.ttl_seconds = ttl_seconds
+        self.hard_ttl_seconds = max(ttl_seconds, hard_ttl_seconds)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
         self.cache_dir.mkdir(exist_ok=True)
+        self.memory = MemoryCache(memory_entries) if memory_entries > 0 else None
+        self._index: Optional[dict[str, tuple[float, PriceQuote]]] = None
+        self._index_mtime: Optional[int] = None
+        self._index_lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._sweeping = False
+        self._unswept_entries = 0
+        self._unswept_bytes = 0
+
+    @property
+    def bounded(self) -> bool:
+        return bool(self.max_bytes or self.max_entries)
+
+    @property
+    def retention_seconds(self) -> float:
+        """How long an entry is kept before it expires."""
+        return max(self.hard_ttl_seconds, self.RETENTION_SECONDS)
 
     def _get_cache_path(self, key: str) -> Path:
         """Get cache file path for a key."""
         safe_key = key.replace("/", "_").replace(":", "_")
-        return self.cache_dir / f"{safe_key}.json"
+        shard = zlib.crc32(safe_key.encode()) % self.SHARDS
+        return self.cache_dir / f"{shard:02x}" / f"{safe_key}{self.SUFFIX}"
 
-    def get(self, key: str) -> Optional[dict]:
-        """Get cached data if not expired."""
-        cache_path = self._get_cache_path(key)
-        if not cache_path.exists():
-            return None
+    def _write_atomic(self, path: Path, payload: bytes) -> None:
+        """Write via a temp file and rename so readers never see partial data."""
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
 
+    @TRACER.traced("cache.read", "cache")
+    def _read(self, key: str, max_age: float) -> Optional[tuple[float, Any]]:
+        """Read an entry no older than ``max_age``; returns (age in seconds, data) or None."""
+        cache_path = self._get_cache_path(key)
         try:
+            # Files are replaced atomically, so mtime is the write time
+            if time.time() - cache_path.stat().st_mtime > max_age:
+                return None
+
             with open(cache_path, "r") as f:
                 data = json.load(f)
 
-            cached_time = datetime.fromisoformat(data.get("_cached_at", "2000-01-01"))
-            if datetime.now() - cached_time > timedelta(seconds=self.ttl_seconds):
-                return None
-
-            return data.get("data")
-        except (json.JSONDecodeError, KeyError):
+                cached_time = datetime.fromisoformat(data.get("_cached_at", "2000-01-01"))
+                age = (datetime.now() - cached_time).total_seconds()
+                if age > max_age:
+                    return None
+                self._touch(f.fileno())
+            return age, data.get("data")
+        except (OSError, json.JSONDecodeError, KeyError):
             return None
 
-    def set(self, key: str, data: dict) -> None:
-        """Cache data with timestamp."""
-        cache_path = self._get_cache_path(key)
-        cache_data = {
+    def _touch(self, fd: int) -> None:
+        """Record a read in the file's access time (mtime stays the write time)."""
+        if not self.bounded:
+            return
+        try:
+            os.utime(fd, ns=(time.time_ns(), os.fstat(fd).st_mtime_ns))
+        except (OSError, NotImplementedError):
+            pass
+
+    def _encode(self, data: Any) -> bytes:
+        """Serialize an entry for writing."""
+        return json.dumps({
             "_cached_at": datetime.now().isoformat(),
             "data": data
-        }
-        with open(cache_path, "w") as f:
-            json.dump(cache_data, f)
+        }).encode()
 
-    def clear(self) -> None:
-        """Clear all cached data."""
-        for cache_file in self.cache_dir.glob("*.json"):
-            cache_file.unlink()
+    def get(self, key: str) -> Optional[dict]:
+        """Get cached data if not expired."""
+        entry = self._read(key, self.ttl_seconds)
+        return entry[1] if entry else None
 
+    @TRACER.traced("cache.write", "cache")
+    def set(self, key: str, data: dict) -> None:
+        """Cache data with timestamp."""
+        payload = self._encode(data)
+        self._write_atomic(self._get_cache_path(key), payload)
+        self._note_write(len(payload))
 
-# =============================================================================
-# TwelveData API Client
-# =============================================================================
+    def lock(self, key: str) -> "FileLock":
+        """Get the cross-process lock guarding refreshes of ``key``."""
+        safe_key = key.replace("/", "_").replace(":", "_")
+        return FileLock(self.cache_dir / f".{safe_key}.lock")
 
-class TwelveDataClient:
-    """Client for TwelveData API - Stocks, ETFs, Commodities."""
+    def read_quotes(self, key: str, max_age: Optional[float] = None) -> Optional[tuple[list[PriceQuote], float]]:
+        """Get cached quotes no older than ``max_age`` (default: hard TTL) as (quotes, age).
 
-    BASE_URL = "https://api.twelvedata.com"
+        Built objects are served from memory when possible.
+        """
+        if max_age is None:
+            max_age = self.hard_ttl_seconds
+
+        if self.memory is not None:
+            entry = self.memory.get(key)
+            if entry is not None:
+                written_at, quotes = entry
+                age = time.time() - written_at
+                if age <= max_age:
+                    METRICS.inc("cache_reads_total", tier="memory", result="hit")
+                    return list(quotes), age
+            METRICS.inc("cache_reads_total", tier="memory", result="miss")
+
+        with METRICS.timer("stage_seconds", component="cache", stage="read"):
+            entry = self._read(key, max_age)
+            if entry is None or not entry[1]:
+                METRICS.inc("cache_reads_total", tier="file", result="miss")
+                return None
 
-    # Interval mappings for historical data
-    INTERVALS = {
-        "1D": ("15min", 96),      # 15-min candles for 1 day
-        "1W": ("1h", 168),        # Hourly candles for 1 week
-        "1M": ("1day", 30),       # Daily candles for 1 month
-        "3M": ("1day", 90),       # Daily candles for 3 months
-        "1Y": ("1day", 365),      # Daily candles for 1 year
-        "5Y": ("1week", 260),     # Weekly candles for 5 years
-    }
+            age, data = entry
+            quotes = [PriceQuote(**q) for q in data]
+        METRICS.inc("cache_reads_total", tier="file", result="hit")
 
-    def __init__(self, api_key: str, config: Config):
-        self.api_key = api_key
-        self.config = config
-        self.session = requests.Session()
-        self.session.headers.update({
-            "Accept": "application/json",
-            "User-Agent": "InsiderTrading-PriceFetcher/1.0"
-        })
+        if self.memory is not None:
+            # Never outlive the file entry this was loaded from
+            self.memory.set(key, (time.time() - age, tuple(quotes)), max_age - age)
+        return quotes, age
 
-    def _request(self, endpoint: str, params: dict) -> dict:
-        """Make API request with retry logic."""
-        params["apikey"] = self.api_key
-        url = f"{self.BASE_URL}/{endpoint}"
+    def lookup_quotes(self, key: str) -> Optional[tuple[list[PriceQuote], bool]]:
+        """Get cached quotes younger than the hard TTL as (quotes, is_stale)."""
+        entry = self.read_quotes(key)
+        if entry is None:
+            return None
+        quotes, age = entry
+        return quotes, age > self.ttl_seconds
 
-        last_error = None
-        for attempt in range(self.config.max_retries):
+    def get_quotes(self, key: str) -> Optional[list[PriceQuote]]:
+        """Get cached quotes if not expired."""
+        entry = self.lookup_quotes(key)
+        if entry is None or entry[1]:
+            return None
+        return entry[0]
+
+    def set_quotes(self, key: str, quotes: list[PriceQuote], ttl_seconds: Optional[float] = None) -> None:
+        """Cache quotes in memory (for ``ttl_seconds``) and on disk."""
+        if self.memory is not None:
+            ttl = self.hard_ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.hard_ttl_seconds)
+            self.memory.set(key, (time.time(), tuple(quotes)), ttl)
+        with METRICS.timer("stage_seconds", component="cache", stage="write"):
+            self.set(key, [q.to_dict() for q in quotes])
+            self.update_index(quotes)
+
+    def _load_index(self) -> dict[str, tuple[float, PriceQuote]]:
+        """Load the quote index, reusing the parsed copy while the file is unchanged."""
+        try:
+            mtime = self._get_cache_path(self.INDEX_KEY).stat().st_mtime_ns
+        except OSError:
+            return {}
+        if self._index is not None and mtime == self._index_mtime:
+            return self._index
+
+        entry = self._read(self.INDEX_KEY, float("inf"))
+        raw = entry[1] if entry else None
+        self._index = {
+            symbol: (item["cached_at"], PriceQuote(**item["quote"]))
+            for symbol, item in (raw or {}).items()
+        }
+        self._index_mtime = mtime
+        return self._index
+
+    @TRACER.traced("cache.index_write", "cache")
+    def update_index(self, quotes: list[PriceQuote]) -> None:
+        """Record quotes in the symbol index, dropping entries past the retention period."""
+        if not quotes:
+            return
+
+        with self._index_lock:
+            lock = self.lock(self.INDEX_KEY)
+            if not lock.acquire(self.INDEX_LOCK_TIMEOUT):
+                # Writing without the lock would drop other processes' updates
+                logger.warning("Timed out waiting for the quote index lock; index not updated")
+                return
             try:
-                response = self.session.get(
-                    url,
-                    params=params,
-                    timeout=self.config.request_timeout
-                )
-                response.raise_for_status()
-                data = response.json()
+                now = time.time()
+                index = dict(self._load_index())
+                index.update((q.symbol, (now, q)) for q in quotes)
+                index = {s: e for s, e in index.items() if now - e[0] <= self.retention_seconds}
+                self.set(self.INDEX_KEY, {
+                    symbol: {"cached_at": cached_at, "quote": quote.to_dict()}
+                    for symbol, (cached_at, quote) in index.items()
+                })
+                self._index = index
+                self._index_mtime = self._get_cache_path(self.INDEX_KEY).stat().st_mtime_ns
+            finally:
+                lock.release()
+
+    @TRACER.traced("cache.index_read", "cache")
+    def read_index(self, symbols: list[str]) -> dict[str, tuple[PriceQuote, float]]:
+        """Look up symbols in the quote index as {symbol: (quote, age)}."""
+        with self._index_lock:
+            index = self._load_index()
+
+        now = time.time()
+        return {s: (index[s][1], now - index[s][0]) for s in symbols if s in index}
+
+    def lookup_index(self, symbols: list[str]) -> dict[str, tuple[PriceQuote, bool]]:
+        """Look up symbols in the quote index as {symbol: (quote, is_stale)}.
+
+        Symbols that are missing or past the hard TTL are left out.
+        """
+        return {
+            symbol: (quote, age > self.ttl_seconds)
+            for symbol, (quote, age) in self.read_index(symbols).items()
+            if age <= self.hard_ttl_seconds
+        }
 
-                # Check for API-level errors
-                if data.get("status") == "error":
-                    raise ValueError(data.get("message", "Unknown API error"))
+    def candle_store(self) -> "CandleStore":
+        """Get the candle store kept alongside this cache."""
+        return CandleStore(self.cache_dir / "candles", on_write=self._note_write)
 
-                return data
+    def _scan(self) -> Iterator[os.DirEntry]:
+        """Yield every file in the shard directories, plus unsharded entries from older versions."""
+        shards = {f"{i:02x}" for i in range(self.SHARDS)}
+        try:
+            with os.scandir(self.cache_dir) as top:
+                for entry in top:
+                    if entry.name in shards and entry.is_dir():
+                        with os.scandir(entry.path) as shard:
+                            yield from shard
+                    elif entry.name.endswith(self.SUFFIX) and entry.is_file():
+                        yield entry
+        except FileNotFoundError:
+            return
+
+    def _entries(self) -> Iterator[tuple[os.DirEntry, os.stat_result]]:
+        """Yield (file, stat) for stored entries; stale temp files are deleted on the way."""
+        now = time.time()
+        for entry in self._scan():
+            try:
+                if entry.name.startswith("."):
+                    if entry.name.endswith(".tmp") and now - entry.stat().st_mtime > self.STALE_TEMP_SECONDS:
+                        os.unlink(entry.path)
+                elif entry.name.endswith(self.SUFFIX):
+                    yield entry, entry.stat()
+            except FileNotFoundError:
+                pass  # Replaced or removed by another process
+
+    def usage(self) -> dict:
+        """Count stored entries and their bytes, candle series included."""
+        entries = total = 0
+        for _, stat in self._entries():
+            entries += 1
+            total += stat.st_size
+        series = candle_bytes = 0
+        for _, size, _, _ in self.candle_store().entries():
+            series += 1
+            candle_bytes += size
+        return {"entries": entries + series, "bytes": total + candle_bytes,
+                "candle_series": series, "candle_bytes": candle_bytes,
+                "max_entries": self.max_entries, "max_bytes": self.max_bytes}
+
+    def expire(self) -> int:
+        """Delete entries past the retention period and return how many were removed."""
+        return self.sweep(evict=False)["expired"]
+
+    def sweep(self, evict: bool = True) -> dict:
+        """Delete expired entries, then least recently used ones until below the limits.
+
+        Evicts down to ``SWEEP_LOW_WATER`` of each limit so the next writes
+        don't trigger another sweep straight away. The quote index is never
+        evicted, nor is a candle series while it is being updated. Returns
+        usage after the sweep with expired/evicted counts.
+        """
+        cutoff = time.time() - self.retention_seconds
+        index_name = f"{self.INDEX_KEY}{self.SUFFIX}"
+        kept = []
+        expired = 0
+        for entry, stat in self._entries():
+            if entry.name == index_name:
+                kept.append((float("inf"), stat.st_size, None))
+            elif stat.st_mtime < cutoff:
+                self._remove(entry.path)
+                expired += 1
+            else:
+                kept.append((stat.st_atime, stat.st_size, partial(self._remove, entry.path)))
 
-            except requests.RequestException as e:
-                last_error = e
-                logger.warning(f"Attempt {attempt + 1} failed: {e}")
-                if attempt < self.config.max_retries - 1:
-                    time.sleep(self.config.retry_delay * (2 ** attempt))
+        candles = self.candle_store()
+        for key, size, used_at, fetched_at in candles.entries():
+            if fetched_at < cutoff and candles.remove(key):
+                expired += 1
+            else:
+                kept.append((used_at, size, partial(candles.remove, key)))
+
+        entries, total = len(kept), sum(size for _, size, _ in kept)
+        evicted = 0
+        if evict and self.bounded:
+            max_entries = self.max_entries or float("inf")
+            max_bytes = self.max_bytes or float("inf")
+            if entries > max_entries or total > max_bytes:
+                max_entries, max_bytes = max_entries * self.SWEEP_LOW_WATER, max_bytes * self.SWEEP_LOW_WATER
+                for used_at, size, remove in sorted(kept, key=lambda item: item[0]):
+                    if (entries <= max_entries and total <= max_bytes) or used_at == float("inf"):
+                        break
+                    if not remove():
+                        continue
+                    entries -= 1
+                    total -= size
+                    evicted += 1
+
+        with self._sweep_lock:
+            self._unswept_entries = self._unswept_bytes = 0
+        try:
+            self._sweep_stamp().touch()
+        except OSError:
+            pass
+        if expired or evicted:
+            METRICS.inc("cache_evictions_total", expired, reason="expired")
+            METRICS.inc("cache_evictions_total", evicted, reason="lru")
+            logger.info(f"Cache sweep removed {expired} expired and {evicted} least recently used entries")
+        return {"entries": entries, "bytes": total, "expired": expired, "evicted": evicted}
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        return True
 
-        raise last_error or Exception("All retry attempts failed")
+    def _sweep_stamp(self) -> Path:
+        """The sweep lock file, whose mtime records the last sweep by any process."""
+        return self.cache_dir / ".sweep.lock"
 
-    def get_quote(self, symbol: str) -> dict:
-        """Get real-time quote for a symbol."""
-        return self._request("quote", {"symbol": symbol})
+    def _note_write(self, size: int) -> None:
+        """Count a write and start a background sweep if one is due.
 
-    def get_quotes(self, symbols: list[str]) -> dict:
-        """Get multiple quotes at once."""
-        symbols_param = ",".join(symbols)
-        return self._request("quote", {"symbol": symbols_param})
+        A sweep is due after ``SWEEP_INTERVAL`` or once this process has
+        written the headroom ``SWEEP_LOW_WATER`` leaves under either limit.
+        """
+        if not self.bounded:
+            return
+
+        with self._sweep_lock:
+            self._unswept_entries += 1
+            self._unswept_bytes += size
+            headroom = 1 - self.SWEEP_LOW_WATER
+            due = (
+                (self.max_entries and self._unswept_entries >= self.max_entries * headroom)
+                or (self.max_bytes and self._unswept_bytes >= self.max_bytes * headroom)
+            )
+            if not due:
+                try:
+                    due = time.time() - self._sweep_stamp().stat().st_mtime >= self.SWEEP_INTERVAL
+                except OSError:
+                    due = True
+            if not due or self._sweeping:
+                return
+            self._sweeping = True
+
+        # Not a daemon: a short-lived CLI still finishes the sweep before exiting
+        threading.Thread(target=self._background_sweep, name="cache-sweep").start()
+
+    def _background_sweep(self) -> None:
+        try:
+            lock = self.lock("sweep")
+            # Skip if another process is already sweeping
+            if lock.try_acquire():
+                try:
+                    self.sweep()
+                finally:
+                    lock.release()
+        except Exception as e:
+            logger.warning(f"Cache sweep failed: {e}")
+        finally:
+            with self._sweep_lock:
+                self._sweeping = False
 
-    def get_time_series(self, symbol: str, interval: str, outputsize: int) -> dict:
-        """Get historical time series data."""
-        return self._request("time_series", {
-            "symbol": symbol,
-            "interval": interval,
-            "outputsize": outputsize
-        })
+    def clear(self) -> None:
+        """Clear all cached data."""
+        if self.memory is not None:
+            self.memory.clear()
+        self._index = None
+        for entry, _ in self._entries():
+            self._remove(entry.path)
 
-    def fetch_stock_quotes(self) -> list[PriceQuote]:
-        """Fetch quotes for all stocks and ETFs."""
-        if not self.api_key:
-            raise ValueError("TWELVE_DATA_API_KEY not configured")
 
-        quotes = []
-        symbols = [info["twelvedata"] for info in STOCKS_ETFS.values()]
+class BinaryCacheManager(CacheManager):
+    """File cache using a fixed binary header and a marshal-encoded body.
 
-        try:
-            data = self.get_quotes(symbols)
+    The header holds the write time, so expired entries are rejected after
+    reading 16 bytes, without decoding the body.
+    """
 
-            # Handle single vs multiple response format
-            if isinstance(data, dict) and "symbol" in data:
-                # Single symbol response
-                data = {data["symbol"]: data}
+    SUFFIX = ".bin"
+    MAGIC = b"PFC1"
+    # magic, marshal format version, padding, cached_at (unix seconds)
+    HEADER = struct.Struct("<4sB3xd")
 
-            for symbol, info in STOCKS_ETFS.items():
-                td_symbol = info["twelvedata"]
-                quote_data = data.get(td_symbol, {})
+    def _encode(self, data: Any) -> bytes:
+        header = self.HEADER.pack(self.MAGIC, marshal.version, time.time())
+        return header + marshal.dumps(data)
 
-                if quote_data.get("status") == "error":
-                    logger.warning(f"Error fetching {symbol}: {quote_data.get('message')}")
-                    continue
+    @TRACER.traced("cache.read", "cache")
+    def _read(self, key: str, max_age: float) -> Optional[tuple[float, Any]]:
+        cache_path = self._get_cache_path(key)
+        try:
+            with open(cache_path, "rb") as f:
+                header = f.read(self.HEADER.size)
+                if len(header) != self.HEADER.size:
+                    return None
+
+                magic, version, cached_at = self.HEADER.unpack(header)
+                if magic != self.MAGIC or version != marshal.version:
+                    return None
+
+                age = time.time() - cached_at
+                if age > max_age:
+                    return None
+
+                self._touch(f.fileno())
+                return age, marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
 
-                price = float(quote_data.get("close", 0))
-                prev_close = float(quote_data.get("previous_close", price))
-                change_usd = price - prev_close
-                change_pct = (change_usd / prev_close * 100) if prev_close > 0 else 0
-
-                quotes.append(PriceQuote(
-                    symbol=symbol,
-                    name=info["name"],
-                    price=price,
-                    change_24h=round(change_pct, 2),
-                    change_24h_usd=round(change_usd, 2),
-                    high_24h=float(quote_data.get("high", 0)) or None,
-                    low_24h=float(quote_data.get("low", 0)) or None,
-                    volume_24h=float(quote_data.get("volume", 0)) or None,
-                    market_cap=None,
-                    timestamp=datetime.now().isoformat(),
-                    source="twelvedata",
-                    asset_type=info["type"]
-                ))
-        except Exception as e:
-            logger.error(f"Error fetching stock quotes: {e}")
-            raise
 
-        return quotes
+# =============================================================================
+# Request Coalescing
+# =============================================================================
 
-    def fetch_commodity_quotes(self) -> list[PriceQuote]:
-        """Fetch quotes for all commodities."""
-        if not self.api_key:
-            raise ValueError("TWELVE_DATA_API_KEY not configured")
+class LockTimeout(TimeoutError):
+    """Raised when a FileLock could not be acquired in time."""
 
-        quotes = []
-        symbols = [info["twelvedata"] for info in COMMODITIES.values()]
 
-        try:
-            data = self.get_quotes(symbols)
+class FileLock:
+    """Advisory exclusive lock on a file, shared by all processes using the cache.
 
-            # Handle single vs multiple response format
-            if isinstance(data, dict) and "symbol" in data:
-                data = {data["symbol"]: data}
+    One instance may be shared by threads: it also holds a thread lock, so
+    only one thread at a time owns the file descriptor.
+    """
 
-            for symbol, info in COMMODITIES.items():
-                td_symbol = info["twelvedata"]
-                quote_data = data.get(td_symbol, {})
+    POLL_INTERVAL = 0.05
 
-                if quote_data.get("status") == "error":
-                    logger.warning(f"Error fetching {symbol}: {quote_data.get('message')}")
-                    continue
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._thread_lock = threading.Lock()
 
-                price = float(quote_data.get("close", 0))
-                prev_close = float(quote_data.get("previous_close", price))
-                change_usd = price - prev_close
-                change_pct = (change_usd / prev_close * 100) if prev_close > 0 else 0
-
-                quotes.append(PriceQuote(
-                    symbol=symbol,
-                    name=info["name"],
-                    price=price,
-                    change_24h=round(change_pct, 2),
-                    change_24h_usd=round(change_usd, 4),
-                    high_24h=float(quote_data.get("high", 0)) or None,
-                    low_24h=float(quote_data.get("low", 0)) or None,
-                    volume_24h=None,  # Forex pairs don't have volume
-                    market_cap=None,
-                    timestamp=datetime.now().isoformat(),
-                    source="twelvedata",
-                    asset_type="commodity"
-                ))
-        except Exception as e:
-            logger.error(f"Error fetching commodity quotes: {e}")
-            raise
+    def try_acquire(self) -> bool:
+        """Acquire without blocking; returns False if another holder has it."""
+        if not self._thread_lock.acquire(blocking=False):
+            return False
+        if fcntl is None:
+            return True
 
-        return quotes
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                self._thread_lock.release()
+                return False
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._fd = fd
+        return True
+
+    def acquire(self, timeout: float) -> bool:
+        """Acquire, polling for up to ``timeout`` seconds."""
+        deadline = time.monotonic() + timeout
+        while not self.try_acquire():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.POLL_INTERVAL)
+        return True
+
+    async def acquire_async(self, timeout: float) -> bool:
+        """Acquire without blocking the event loop."""
+        deadline = time.monotonic() + timeout
+        while not self.try_acquire():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.POLL_INTERVAL)
+        return True
+
+    def release(self) -> None:
+        """Release the lock if held."""
+        if not self._thread_lock.locked():
+            return
+        fd, self._fd = self._fd, None
+        try:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+        finally:
+            self._thread_lock.release()
+
+    @contextmanager
+    def held(self, timeout: float) -> Iterator[None]:
+        """Hold the lock for a block, raising LockTimeout if it can't be acquired in time."""
+        if not self.acquire(timeout):
+            raise LockTimeout(f"Timed out after {timeout:g}s waiting for {self.path}")
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def held_async(self, timeout: float):
+        """Asyncio variant of ``held``."""
+        if not await self.acquire_async(timeout):
+            raise LockTimeout(f"Timed out after {timeout:g}s waiting for {self.path}")
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution.
+
+    The first thread to call ``do`` for a key runs ``fn``; threads arriving
+    while it runs block and receive the same result (or exception).
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result: Any = None
+            self.error: Optional[BaseException] = None
+
+    def __init__(self):
+        self._calls: dict[str, "SingleFlight._Call"] = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self, key: str) -> bool:
+        """Whether a call for ``key`` is currently running."""
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key: str, fn) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
 
-    def fetch_historical(self, symbol: str, window: str = "1M") -> HistoricalData:
-        """Fetch historical price data for a symbol."""
-        if not self.api_key:
-            raise ValueError("TWELVE_DATA_API_KEY not configured")
+        if call.error is not None:
+            raise call.error
+        return call.result
 
-        # Get symbol mapping
-        asset_info = STOCKS_ETFS.get(symbol) or COMMODITIES.get(symbol)
-        if not asset_info:
-            raise ValueError(f"Unknown symbol: {symbol}")
 
-        td_symbol = asset_info["twelvedata"]
-        interval, outputsize = self.INTERVALS.get(window, self.INTERVALS["1M"])
+class AsyncSingleFlight:
+    """Asyncio counterpart of SingleFlight: one in-flight task per key.
 
-        data = self.get_time_series(td_symbol, interval, outputsize)
+    Waiters are shielded, so a cancelled waiter does not cancel the shared
+    fetch for everyone else.
+    """
 
-        if "values" not in data:
-            raise ValueError("No historical data returned")
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
 
-        # Convert to candles (TwelveData returns newest first)
-        candles = []
-        for v in reversed(data["values"]):
-            try:
-                candles.append(PriceCandle(
-                    time=int(datetime.fromisoformat(v["datetime"].replace(" ", "T")).timestamp()),
-                    open=float(v["open"]),
-                    high=float(v["high"]),
-                    low=float(v["low"]),
-                    close=float(v["close"]),
-                    volume=float(v.get("volume", 0))
-                ))
-            except (ValueError, KeyError) as e:
-                logger.warning(f"Skipping invalid candle: {e}")
+    def in_flight(self, key: str) -> bool:
+        """Whether a task for ``key`` is currently running."""
+        return key in self._tasks
 
-        return HistoricalData(
-            symbol=symbol,
-            name=asset_info["name"],
-            candles=candles,
-            interval=interval,
-            source="twelvedata"
-        )
+    async def do(self, key: str, fn) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task)
 
 
 # =============================================================================
-# CoinGecko API Client
+# Rate Limiting
 # =============================================================================
 
-class CoinGeckoClient:
-    """Client for CoinGecko API - Cryptocurrencies."""
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot be made within the provider's rate budget."""
 
-    BASE_URL = "https://api.coingecko.com/api/v3"
 
-    def __init__(self, config: Config):
-        self.config = config
-        self.session = requests.Session()
-        self.session.headers.update({
-            "Accept": "application/json",
-            "User-Agent": "InsiderTrading-PriceFetcher/1.0"
-        })
+class TokenBucket:
+    """Token-bucket rate limiter whose state is shared through a file.
 
-    def _request(self, endpoint: str, params: dict = None) -> dict:
-        """Make API request with retry logic."""
-        url = f"{self.BASE_URL}/{endpoint}"
+    The bucket (tokens, last update) lives in ``path`` and is updated under
+    a FileLock, so the CLI, cron jobs and workers using the same cache_dir
+    draw from one budget. In "queue" mode callers reserve tokens and wait
+    for them (up to ``max_wait``); in "fail" mode they get
+    RateLimitExceeded as soon as the budget is empty.
+    """
 
-        last_error = None
-        for attempt in range(self.config.max_retries):
+    STATE = struct.Struct("<dd")
+    LOCK_TIMEOUT = 5.0
+
+    def __init__(self, path: Path, rate_per_minute: float, mode: str = "queue", max_wait: float = 60.0):
+        self.path = Path(path)
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.fail_fast = mode == "fail"
+        self.max_wait = max_wait
+        self._lock = FileLock(self.path.with_name(self.path.name + ".lock"))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def for_provider(cls, config: Config, provider: str) -> Optional["TokenBucket"]:
+        """Build the shared bucket for a provider, or None if limiting is disabled."""
+        rate = getattr(config, f"{provider}_rate_per_minute")
+        if rate <= 0:
+            return None
+        return cls(Path(config.cache_dir) / f".ratelimit_{provider}", rate,
+                   config.rate_limit_mode, config.rate_limit_max_wait)
+
+    def _load(self, now: float) -> float:
+        """Current token count, refilled up to now."""
+        try:
+            with open(self.path, "rb") as f:
+                tokens, updated_at = self.STATE.unpack(f.read(self.STATE.size))
+        except (OSError, struct.error):
+            return self.capacity
+        return min(self.capacity, tokens + (now - updated_at) * self.rate)
+
+    def _store(self, tokens: float, now: float) -> None:
+        with open(self.path, "wb") as f:
+            f.write(self.STATE.pack(tokens, now))
+
+    def _reserve(self, tokens: float) -> float:
+        """Take ``tokens`` (caller holds the lock); returns seconds to wait before using them."""
+        now = time.time()
+        available = self._load(now)
+        wait = max(0.0, (tokens - available) / self.rate)
+        if wait > 0 and (self.fail_fast or wait > self.max_wait):
+            raise RateLimitExceeded(f"Rate limit budget exhausted for {self.path.name} (retry in {wait:.1f}s)")
+        self._store(available - tokens, now)
+        return wait
+
+    @TRACER.traced("ratelimit.acquire", "ratelimit")
+    def acquire(self, tokens: float = 1) -> None:
+        """Reserve tokens, sleeping until they are available (queue mode)."""
+        with self._lock.held(self.LOCK_TIMEOUT):
+            wait = self._reserve(tokens)
+        if wait > 0:
+            logger.info(f"Rate limit: waiting {wait:.1f}s for {self.path.name}")
+            time.sleep(wait)
+
+    @TRACER.traced("ratelimit.acquire", "ratelimit")
+    async def acquire_async(self, tokens: float = 1) -> None:
+        """Asyncio variant of ``acquire``."""
+        async with self._lock.held_async(self.LOCK_TIMEOUT):
+            wait = self._reserve(tokens)
+        if wait > 0:
+            logger.info(f"Rate limit: waiting {wait:.1f}s for {self.path.name}")
+            await asyncio.sleep(wait)
+
+    def penalize(self, seconds: float) -> None:
+        """Empty the bucket for ``seconds`` (e.g. after a 429 with Retry-After).
+
+        In queue mode the penalty is capped so the next single-token
+        acquire waits at most ``max_wait`` instead of failing.
+        """
+        with self._lock.held(self.LOCK_TIMEOUT):
+            self._apply_penalty(seconds)
+
+    async def penalize_async(self, seconds: float) -> None:
+        """Asyncio variant of ``penalize``."""
+        async with self._lock.held_async(self.LOCK_TIMEOUT):
+            self._apply_penalty(seconds)
+
+    def _apply_penalty(self, seconds: float) -> None:
+        """Empty the bucket for ``seconds`` (caller holds the lock)."""
+        if not self.fail_fast:
+            seconds = min(seconds, max(0.0, self.max_wait - 1 / self.rate))
+        now = time.time()
+        self._store(min(self._load(now), -seconds * self.rate), now)
+
+
+# =============================================================================
+# Quote Board
+# =============================================================================
+
+QUOTE_BOARD_NAME = "quotes.board"
+
+
+class QuoteBoard:
+    """Memory-mapped quote board readable by any process without locks or JSON.
+
+    Layout (little-endian)::
+
+        header  magic "PQB1", u16 version, u16 record size, u32 record count,
+                u64 sequence, 12 pad bytes                        (32 bytes)
+        record  16s symbol (UTF-8, NUL padded), then doubles: price,
+                change_24h, change_24h_usd, high_24h, low_24h,
+                volume_24h, market_cap, updated_at (epoch)         (80 bytes)
+
+    There is one record per symbol in ``SYMBOLS`` order (the symbol field
+    is for readers without that table); records never written have
+    ``updated_at == 0`` and missing values are NaN.
+
+    The sequence is a seqlock: a writer makes it odd, rewrites the records
+    and makes it even again. Readers copy the records and retry if the
+    sequence was odd or changed, so every snapshot is consistent across
+    symbols. Writers are serialized by a FileLock. (Like any seqlock
+    written from Python, this relies on the CPU not reordering the
+    sequence and record stores, which holds on x86.)
+    """
+
+    MAGIC = b"PQB1"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHIQ12x")
+    SEQ_OFFSET = 12
+    SEQ = struct.Struct("<Q")
+    RECORD = struct.Struct("<16s8d")
+    SYMBOLS = tuple(ALL_ASSETS)
+    LOCK_TIMEOUT = 5.0
+    READ_RETRIES = 1000
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.size = self.HEADER.size + self.RECORD.size * len(self.SYMBOLS)
+        self._slots = {symbol: i for i, symbol in enumerate(self.SYMBOLS)}
+        self._lock = FileLock(self.path.with_name(f".{self.path.name}.lock"))
+        self._write_lock = threading.Lock()
+        self._map: Optional[mmap.mmap] = None
+        self._map_writable = False
+        self._inode: Optional[int] = None
+
+    def _create(self) -> None:
+        """Write an empty board atomically (caller holds the lock)."""
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, self.RECORD.size, len(self.SYMBOLS), 0)
+        records = b"".join(
+            self.RECORD.pack(symbol.encode(), *([float("nan")] * 7), 0.0) for symbol in self.SYMBOLS
+        )
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header + records)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _open(self, writable: bool = False) -> Optional[mmap.mmap]:
+        """Map the board file, remapping if it was replaced; None if missing or foreign."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        if self._map is not None and st.st_ino == self._inode and (self._map_writable or not writable):
+            return self._map
+
+        self.close()
+        if st.st_size != self.size:
+            return None
+        with open(self.path, "r+b" if writable else "rb") as f:
+            board = mmap.mmap(f.fileno(), self.size, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, record_size, count, _ = self.HEADER.unpack_from(board)
+        if (magic, version, record_size, count) != (self.MAGIC, self.VERSION, self.RECORD.size, len(self.SYMBOLS)):
+            board.close()
+            return None
+        self._map, self._inode, self._map_writable = board, st.st_ino, writable
+        return board
+
+    def close(self) -> None:
+        """Unmap the board."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def clear(self) -> None:
+        """Delete the board file."""
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def publish(self, quotes: list[PriceQuote]) -> None:
+        """Write quotes into their records in one seqlock-protected update."""
+        records = []
+        for q in quotes:
+            slot = self._slots.get(q.symbol)
+            if slot is None:
+                continue
+            try:
+                updated_at = datetime.fromisoformat(q.timestamp).timestamp()
+            except ValueError:
+                updated_at = time.time()
+            values = (q.price, q.change_24h, q.change_24h_usd, q.high_24h, q.low_24h, q.volume_24h, q.market_cap)
+            records.append((slot, self.RECORD.pack(
+                q.symbol.encode(), *(float("nan") if v is None else float(v) for v in values), updated_at
+            )))
+        if not records:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._write_lock:
+            if not self._lock.acquire(self.LOCK_TIMEOUT):
+                logger.warning(f"Timed out waiting for the lock on {self.path}; quotes not published")
+                return
+            try:
+                board = self._open(writable=True)
+                if board is None:
+                    self._create()
+                    board = self._open(writable=True)
+
+                seq = self.SEQ.unpack_from(board, self.SEQ_OFFSET)[0] | 1
+                self.SEQ.pack_into(board, self.SEQ_OFFSET, seq)  # Odd: write in progress
+                for slot, record in records:
+                    offset = self.HEADER.size + slot * self.RECORD.size
+                    board[offset:offset + self.RECORD.size] = record
+                self.SEQ.pack_into(board, self.SEQ_OFFSET, seq + 1)
+            finally:
+                self._lock.release()
+
+    def _read_records(self, start: int = 0, count: Optional[int] = None) -> Optional[bytes]:
+        """Copy ``count`` records from slot ``start`` (default: all) under the seqlock.
+
+        Returns None if the board does not exist.
+        """
+        board = self._open()
+        if board is None:
+            return None
+        begin = self.HEADER.size + start * self.RECORD.size
+        end = self.size if count is None else begin + count * self.RECORD.size
+        for _ in range(self.READ_RETRIES):
+            seq = self.SEQ.unpack_from(board, self.SEQ_OFFSET)[0]
+            if seq & 1:
+                time.sleep(0)
+                continue
+            records = board[begin:end]
+            if self.SEQ.unpack_from(board, self.SEQ_OFFSET)[0] == seq:
+                return records
+        raise TimeoutError(f"Quote board {self.path} kept changing during read")
+
+    @staticmethod
+    def _build_quote(symbol: str, record: tuple) -> Optional[PriceQuote]:
+        updated_at = record[8]
+        if not updated_at:
+            return None
+        price, change, change_usd, high, low, volume, market_cap = [
+            None if v != v else v for v in record[1:8]  # NaN marks a missing value
+        ]
+        info = ALL_ASSETS[symbol]
+        return PriceQuote(
+            symbol, info["name"], price, change, change_usd, high, low, volume, market_cap,
+            datetime.fromtimestamp(updated_at).isoformat(),
+            "coingecko" if symbol in CRYPTO else "twelvedata", info["type"],
+        )
+
+    def records(self) -> dict[str, tuple]:
+        """Consistent raw view as {symbol: (price, change_24h, change_24h_usd, high_24h,
+        low_24h, volume_24h, market_cap, updated_at)}, with NaN for missing values.
+
+        Skips building PriceQuote objects, for readers polling in a hot loop.
+        """
+        records = self._read_records()
+        if records is None:
+            return {}
+        return {
+            symbol: record[1:]
+            for symbol, record in zip(self.SYMBOLS, self.RECORD.iter_unpack(records))
+            if record[8]
+        }
+
+    def snapshot(self) -> dict[str, PriceQuote]:
+        """Consistent view of every published symbol, keyed by symbol."""
+        records = self._read_records()
+        if records is None:
+            return {}
+
+        quotes = {}
+        for symbol, record in zip(self.SYMBOLS, self.RECORD.iter_unpack(records)):
+            quote = self._build_quote(symbol, record)
+            if quote is not None:
+                quotes[symbol] = quote
+        return quotes
+
+    def get(self, symbol: str) -> Optional[PriceQuote]:
+        """Read a single symbol's record, or None if it was never published."""
+        symbol = symbol.upper()
+        slot = self._slots.get(symbol)
+        if slot is None:
+            return None
+        record = self._read_records(slot, 1)
+        if record is None:
+            return None
+        return self._build_quote(symbol, self.RECORD.unpack(record))
+
+
+# =============================================================================
+# Candle Store
+# =============================================================================
+
+# Candle interval lengths in seconds
+INTERVAL_SECONDS = {
+    "15min": 900,
+    "1h": 3600,
+    "1hour": 3600,
+    "1day": 86400,
+    "1week": 604800,
+}
+
+
+def _local_epochs(naive_seconds):
+    """Convert naive local wall-clock seconds (NumPy int64 array) to Unix epochs.
+
+    Local UTC offsets are resolved once per distinct hour, which is exact
+    for DST transitions on hour boundaries.
+    """
+    if not time.daylight:
+        return naive_seconds + time.timezone
+
+    hours, inverse = np.unique(naive_seconds // 3600, return_inverse=True)
+    epoch = datetime(1970, 1, 1)
+    offsets = np.array([
+        int((epoch + timedelta(hours=int(h))).timestamp()) - int(h) * 3600
+        for h in hours
+    ], dtype=np.int64)
+    return naive_seconds + offsets[inverse]
+
+
+class CandleStore:
+    """Persistent, append-only columnar store of candles.
+
+    Each symbol/interval series is a directory holding one packed array
+    file per OHLCV column plus ``meta.json`` with the row count, first and
+    last candle times and the last upstream fetch time. New candles are
+    appended; only the rows they overlap at the tail are rewritten.
+
+    ``on_write`` is called with the bytes each merge writes; CacheManager
+    uses it to count series toward its limits and schedule sweeps.
+    """
+
+    def __init__(self, root: Path, on_write: Optional[Callable[[int], None]] = None):
+        self.root = Path(root)
+        self.on_write = on_write
+
+    def _series_dir(self, symbol: str, interval: str) -> Path:
+        safe_symbol = symbol.replace("/", "_").replace(":", "_")
+        return self.root / f"{safe_symbol}_{interval}"
+
+    def lock(self, symbol: str, interval: str) -> FileLock:
+        """Get the cross-process lock guarding updates of a series."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        safe_symbol = symbol.replace("/", "_").replace(":", "_")
+        return FileLock(self.root / f".{safe_symbol}_{interval}.lock")
+
+    def meta(self, symbol: str, interval: str) -> Optional[dict]:
+        """Get series metadata, or None if nothing is stored."""
+        try:
+            with open(self._series_dir(symbol, interval) / "meta.json", "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _write_meta(self, series_dir: Path, meta: dict) -> None:
+        tmp_path = series_dir / "meta.json.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, series_dir / "meta.json")
+
+    def _read_series(self, series_dir: Path, rows: int) -> CandleSeries:
+        buffers = {}
+        for name, _ in CandleSeries.COLUMNS:
+            try:
+                with open(series_dir / f"{name}.col", "rb") as f:
+                    buffers[name] = f.read(rows * 8)
+            except FileNotFoundError:
+                buffers[name] = b""
+        # Trim to whole rows present in every column
+        rows = min(len(b) for b in buffers.values()) // 8
+        return CandleSeries.from_buffers({name: b[:rows * 8] for name, b in buffers.items()})
+
+    @TRACER.traced("candles.read", "cache")
+    def read(self, symbol: str, interval: str, since: Optional[int] = None) -> CandleSeries:
+        """Read stored candles, optionally only those at or after ``since``.
+
+        Callers should hold ``lock(symbol, interval)`` so a concurrent merge
+        can't hand them a mix of old and new columns.
+        """
+        meta = self.meta(symbol, interval)
+        if not meta:
+            return CandleSeries()
+
+        series_dir = self._series_dir(symbol, interval)
+        series = self._read_series(series_dir, meta["rows"])
+        self._touch(series_dir)
+        return series.between(since) if since is not None else series
+
+    def _touch(self, series_dir: Path) -> None:
+        """Record a read in meta.json's access time (mtime stays the last merge)."""
+        try:
+            fd = os.open(series_dir / "meta.json", os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.utime(fd, ns=(time.time_ns(), os.fstat(fd).st_mtime_ns))
+        except (OSError, NotImplementedError):
+            pass
+        finally:
+            os.close(fd)
+
+    @TRACER.traced("candles.write", "cache")
+    def merge(self, symbol: str, interval: str, candles: CandleSeries, exhausted: bool = False) -> dict:
+        """Merge fetched candles into a series and return the updated metadata.
+
+        An update that carries every stored candle from its first time on
+        (a tail refresh) replaces those rows and appends the rest; any other
+        overlap rewrites the series as the union of stored and fetched
+        candles. ``exhausted`` records that upstream has no history before
+        the first candle. Callers should hold ``lock(symbol, interval)``.
+        """
+        series_dir = self._series_dir(symbol, interval)
+        series_dir.mkdir(parents=True, exist_ok=True)
+        meta = self.meta(symbol, interval) or {"rows": 0, "exhausted": False}
+        candles = candles.sorted()
+
+        stored = self._read_series(series_dir, meta["rows"]) if meta["rows"] else CandleSeries()
+        if len(stored) < meta["rows"]:
+            logger.warning(f"Candle series {symbol} {interval} is missing rows; rewriting it")
+            meta, stored = {"rows": 0, "exhausted": False}, CandleSeries()
+        times = stored.times
+
+        def is_stored(t: int) -> bool:
+            i = bisect_left(times, t)
+            return i < len(times) and times[i] == t
+
+        candles = self._without_partial_head(candles, int(times[-1]) if len(times) else None, is_stored)
+        if len(candles):
+            first_time, last_time = int(candles.times[0]), int(candles.times[-1])
+            cut = bisect_left(times, first_time)
+            overlap = times[cut:]
+            if list(candles.times[:len(overlap)]) != list(overlap):
+                # Splicing would drop stored candles the update skips: rebuild the union
+                union = {c.time: c for c in stored}
+                union.update((c.time, c) for c in candles)
+                candles = CandleSeries.from_candles(union[t] for t in sorted(union))
+                first_time, last_time, cut = int(candles.times[0]), int(candles.times[-1]), 0
+
+            try:
+                self._write_columns(series_dir, candles, cut)
+            except FileNotFoundError:
+                # A column file vanished since it was read; keep only the update
+                logger.warning(f"Candle series {symbol} {interval} is missing a column; rewriting it")
+                meta["exhausted"], cut = False, 0
+                self._write_columns(series_dir, candles, cut)
+
+            meta.update({
+                "rows": cut + len(candles),
+                "first_time": int(times[0]) if cut else first_time,
+                "last_time": last_time,
+            })
+
+        if exhausted:
+            meta["exhausted"] = True
+        meta["fetched_at"] = time.time()
+        self._write_meta(series_dir, meta)
+        if self.on_write is not None:
+            self.on_write(len(candles) * 8 * len(CandleSeries.COLUMNS))
+        return meta
+
+    @staticmethod
+    def _write_columns(series_dir: Path, candles: CandleSeries, cut: int) -> None:
+        """Write ``candles`` into every column file from row ``cut`` on, truncating the rest."""
+        for name, _ in CandleSeries.COLUMNS:
+            with open(series_dir / f"{name}.col", "r+b" if cut else "wb") as f:
+                f.seek(cut * 8)
+                f.truncate()
+                f.write(candles.to_bytes(name))
+
+    @staticmethod
+    def _without_partial_head(candles: CandleSeries, stored_last_time: Optional[int],
+                              is_stored: Callable[[int], bool]) -> CandleSeries:
+        """Drop an update's first candle when a complete stored candle has the same time.
+
+        Resampled updates start mid-bucket, so their first candle may cover
+        only part of its bucket. Stored candles before the last one are
+        complete; the last may still be forming and is always replaced.
+        """
+        if len(candles) and stored_last_time is not None:
+            head = int(candles.times[0])
+            if head < stored_last_time and is_stored(head):
+                return candles[1:]
+        return candles
+
+    def entries(self) -> Iterator[tuple[Any, int, float, float]]:
+        """Yield (key, bytes, last read, last fetched) for each stored series.
+
+        ``key`` identifies the series to ``remove``.
+        """
+        try:
+            with os.scandir(self.root) as top:
+                series_dirs = [entry for entry in top if entry.is_dir()]
+        except FileNotFoundError:
+            return
+        for series_dir in series_dirs:
             try:
+                meta_stat = os.stat(os.path.join(series_dir.path, "meta.json"))
+                with os.scandir(series_dir.path) as files:
+                    size = sum(f.stat().st_size for f in files)
+            except FileNotFoundError:
+                continue  # Being created or removed
+            yield series_dir.name, size, meta_stat.st_atime, meta_stat.st_mtime
+
+    def remove(self, key: Any) -> bool:
+        """Delete a series by its ``entries`` key; returns False if it is being updated."""
+        lock = FileLock(self.root / f".{key}.lock")
+        if not lock.try_acquire():
+            return False
+        try:
+            self._remove_dir(self.root / key)
+        finally:
+            lock.release()
+        return True
+
+    @staticmethod
+    def _remove_dir(series_dir: Path) -> None:
+        try:
+            for path in series_dir.iterdir():
+                path.unlink(missing_ok=True)
+            series_dir.rmdir()
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        """Remove all stored series."""
+        if not self.root.exists():
+            return
+        for series_dir in self.root.iterdir():
+            if series_dir.is_dir():
+                self._remove_dir(series_dir)
+
+
+# How long a stored series is served before its tail is refreshed
+HISTORY_TTL_SECONDS = {
+    "15min": 300,
+    "1h": 900,
+    "1hour": 900,
+    "1day": 3600,
+    "1week": 6 * 3600,
+}
+
+
+@dataclass
+class HistoryRequest:
+    """Resolved parameters for one historical data request.
+
+    TwelveData windows are a candle count (``outputsize``); CoinGecko
+    windows are a number of ``days``. Windows that share an interval
+    (1M, 3M and 1Y are all daily) share one stored series.
+    """
+    symbol: str
+    name: str
+    source: str
+    window: str
+    interval: str
+    outputsize: int = 0
+    days: int = 0
+
+    @classmethod
+    def resolve(cls, symbol: str, window: str) -> Optional["HistoryRequest"]:
+        """Resolve a symbol and window, or None for unknown symbols."""
+        if symbol in STOCKS_ETFS or symbol in COMMODITIES:
+            asset_info, interval, outputsize = TwelveDataClient._resolve_historical(symbol, window)
+            return cls(symbol, asset_info["name"], "twelvedata", window, interval, outputsize=outputsize)
+        if symbol in CRYPTO:
+            days = CoinGeckoClient.WINDOW_DAYS.get(window, 30)
+            return cls(symbol, CRYPTO[symbol]["name"], "coingecko", window,
+                       CoinGeckoClient._interval(days), days=days)
+        return None
+
+    @property
+    def step(self) -> int:
+        return INTERVAL_SECONDS[self.interval]
+
+    @property
+    def ttl(self) -> float:
+        return HISTORY_TTL_SECONDS.get(self.interval, 3600)
+
+    def widest(self) -> "HistoryRequest":
+        """The longest window with the same symbol and interval (may be this one)."""
+        widest = self
+        for window in TwelveDataClient.INTERVALS:
+            other = HistoryRequest.resolve(self.symbol, window)
+            if other.interval == self.interval and (other.outputsize, other.days) > (widest.outputsize, widest.days):
+                widest = other
+        return widest
+
+    def covered_by(self, meta: Optional[dict], now: float) -> bool:
+        """Whether stored history reaches back far enough for this window."""
+        if not meta or not meta["rows"]:
+            return False
+        if meta.get("exhausted"):
+            return True
+        if self.outputsize:
+            return meta["rows"] >= self.outputsize
+        return meta["first_time"] <= now - self.days * 86400 + self.step
+
+    def tail_size(self, meta: dict, now: float) -> Optional[int]:
+        """Request size (candles or days) covering everything after the last stored candle.
+
+        Sized against ``widest()``, not this window, so a short request
+        never leaves a hole that longer windows would serve later. Returns
+        None when the gap is longer than the widest window, which should
+        then be fetched in full.
+        """
+        widest = self.widest()
+        gap = max(0, now - meta["last_time"])
+        if widest.outputsize:
+            # +1 re-fetches the last (possibly still forming) candle
+            size = int(gap // self.step) + 2
+            return size if size <= widest.outputsize else None
+        # Ask for at least two days so daily series keep daily granularity
+        size = int(gap // 86400) + (1 if self.step < 86400 else 2)
+        return size if size <= widest.days else None
+
+    def start(self, now: float) -> Optional[int]:
+        """Earliest candle time in a days window (None for candle-count windows)."""
+        if self.outputsize:
+            return None
+        # Keep the candle whose bucket contains the window start, as a direct fetch would
+        return int(now - self.days * 86400) - self.step + 1
+
+    def select(self, candles: CandleSeries, now: float) -> CandleSeries:
+        """Trim stored candles to this window."""
+        if self.outputsize:
+            return candles[-self.outputsize:]
+        return candles.between(self.start(now))
+
+    def is_exhausted(self, data: HistoricalData, now: float) -> bool:
+        """Whether a full-window fetch returned less history than requested."""
+        if not data.candles:
+            return True
+        if self.outputsize:
+            return len(data.candles) < self.outputsize
+        return data.candles[0].time > now - self.days * 86400 + self.step
+
+    def to_historical(self, candles: CandleSeries) -> HistoricalData:
+        return HistoricalData(
+            symbol=self.symbol,
+            name=self.name,
+            candles=candles,
+            interval=self.interval,
+            source=self.source
+        )
+
+
+# =============================================================================
+# SQLite Cache
+# =============================================================================
+
+class SQLiteDatabase:
+    """Cache database in WAL mode, with one connection per thread and process.
+
+    WAL lets any number of processes read while one writes. Writers take
+    the write lock up front (``BEGIN IMMEDIATE``) and wait up to
+    ``BUSY_TIMEOUT`` for another process's transaction to finish.
+    """
+
+    FILE_NAME = "cache.sqlite3"
+    BUSY_TIMEOUT = 30.0
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            cached_at REAL NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_cached_at ON entries (cached_at);
+
+        CREATE TABLE IF NOT EXISTS quote_index (
+            symbol TEXT PRIMARY KEY,
+            cached_at REAL NOT NULL,
+            quote TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS quote_index_cached_at ON quote_index (cached_at);
+
+        CREATE TABLE IF NOT EXISTS series (
+            symbol TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            first_time INTEGER,
+            last_time INTEGER,
+            fetched_at REAL,
+            exhausted INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (symbol, interval)
+        );
+
+        CREATE TABLE IF NOT EXISTS candles (
+            symbol TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            time INTEGER NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            volume REAL NOT NULL,
+            PRIMARY KEY (symbol, interval, time)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path: Path):
+        if sqlite3 is None:
+            raise ImportError("Python was built without sqlite3; use cache_format 'json' or 'binary'")
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def connection(self) -> "sqlite3.Connection":
+        """Get this thread's connection, opening it (and the schema) on first use."""
+        conn = getattr(self._local, "conn", None)
+        # Connections must not be shared with a forked child
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent with NORMAL; a power loss can only drop the last commits
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(self.SCHEMA)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator["sqlite3.Connection"]:
+        """Run statements in one write transaction; nested uses join the outer one."""
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+class SQLiteCacheManager(CacheManager):
+    """Cache kept in one SQLite database under ``cache_dir``.
+
+    Category entries are rows of ``entries`` keyed by cache key. The quote
+    index is a table keyed by symbol, so index updates are upserts instead
+    of rewrites of one shared file. Candles live in the same database
+    (see ``SQLiteCandleStore``).
+    """
+
+    # Stays under SQLITE_MAX_VARIABLE_NUMBER on old SQLite builds (999)
+    MAX_PARAMS = 500
+
+    def __init__(self, cache_dir: str, ttl_seconds: int = 60, memory_entries: int = 0,
+                 hard_ttl_seconds: int = 0, max_bytes: int = 0, max_entries: int = 0):
+        # Size limits apply to the file formats only
+        super().__init__(cache_dir, ttl_seconds, memory_entries, hard_ttl_seconds)
+        self.db = SQLiteDatabase(self.cache_dir / SQLiteDatabase.FILE_NAME)
+
+    @TRACER.traced("cache.read", "cache")
+    def _read(self, key: str, max_age: float) -> Optional[tuple[float, Any]]:
+        try:
+            row = self.db.connection().execute(
+                "SELECT cached_at, data FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache read of {key} failed: {e}")
+            return None
+        if row is None:
+            return None
+
+        age = time.time() - row[0]
+        if age > max_age:
+            return None
+        return age, json.loads(row[1])
+
+    @TRACER.traced("cache.write", "cache")
+    def set(self, key: str, data: dict) -> None:
+        with self.db.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO entries (key, cached_at, data) VALUES (?, ?, ?)",
+                         (key, time.time(), json.dumps(data)))
+
+    def set_quotes(self, key: str, quotes: list[PriceQuote], ttl_seconds: Optional[float] = None) -> None:
+        # The entry and its index rows commit together
+        with self.db.transaction():
+            super().set_quotes(key, quotes, ttl_seconds)
+
+    @TRACER.traced("cache.index_write", "cache")
+    def update_index(self, quotes: list[PriceQuote]) -> None:
+        if not quotes:
+            return
+
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO quote_index (symbol, cached_at, quote) VALUES (?, ?, ?)",
+                             [(q.symbol, now, json.dumps(q.to_dict())) for q in quotes])
+            conn.execute("DELETE FROM quote_index WHERE cached_at < ?", (now - self.retention_seconds,))
+
+    @TRACER.traced("cache.index_read", "cache")
+    def read_index(self, symbols: list[str]) -> dict[str, tuple[PriceQuote, float]]:
+        now = time.time()
+        found = {}
+        try:
+            conn = self.db.connection()
+            for i in range(0, len(symbols), self.MAX_PARAMS):
+                chunk = symbols[i:i + self.MAX_PARAMS]
+                rows = conn.execute(
+                    f"SELECT symbol, cached_at, quote FROM quote_index WHERE symbol IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                found.update((symbol, (PriceQuote(**json.loads(quote)), now - cached_at))
+                             for symbol, cached_at, quote in rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Quote index read failed: {e}")
+        return found
+
+    def candle_store(self) -> "SQLiteCandleStore":
+        return SQLiteCandleStore(self.db, self.cache_dir / "candles")
+
+    def usage(self) -> dict:
+        entries, total = self.db.connection().execute(
+            "SELECT count(*), coalesce(sum(length(data)), 0) FROM entries"
+        ).fetchone()
+        series = candle_bytes = 0
+        for _, size, _, _ in self.candle_store().entries():
+            series += 1
+            candle_bytes += size
+        return {"entries": entries + series, "bytes": total + candle_bytes,
+                "candle_series": series, "candle_bytes": candle_bytes,
+                "max_entries": 0, "max_bytes": 0}
+
+    def expire(self) -> int:
+        cutoff = time.time() - self.retention_seconds
+        with self.db.transaction() as conn:
+            expired = conn.execute("DELETE FROM entries WHERE cached_at < ?", (cutoff,)).rowcount
+        candles = self.candle_store()
+        for key, _, _, fetched_at in candles.entries():
+            if fetched_at < cutoff and candles.remove(key):
+                expired += 1
+        return expired
+
+    def sweep(self, evict: bool = True) -> dict:
+        expired = self.expire()
+        if expired:
+            METRICS.inc("cache_evictions_total", expired, reason="expired")
+        usage = self.usage()
+        return {"entries": usage["entries"], "bytes": usage["bytes"], "expired": expired, "evicted": 0}
+
+    def clear(self) -> None:
+        if self.memory is not None:
+            self.memory.clear()
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM quote_index")
+
+
+class SQLiteCandleStore(CandleStore):
+    """CandleStore backed by the ``candles`` and ``series`` tables.
+
+    Rows are keyed by (symbol, interval, time), so ``read`` with ``since``
+    is a range scan and overlapping candles are replaced in place. ``root``
+    only holds the refresh lock files.
+    """
+
+    COLUMN_NAMES = tuple(name for name, _ in CandleSeries.COLUMNS)
+
+    def __init__(self, db: SQLiteDatabase, root: Path, on_write: Optional[Callable[[int], None]] = None):
+        super().__init__(root, on_write)
+        self.db = db
+
+    def meta(self, symbol: str, interval: str) -> Optional[dict]:
+        row = self.db.connection().execute(
+            "SELECT row_count, first_time, last_time, fetched_at, exhausted FROM series"
+            " WHERE symbol = ? AND interval = ?", (symbol, interval)
+        ).fetchone()
+        if row is None:
+            return None
+
+        rows, first_time, last_time, fetched_at, exhausted = row
+        return {"rows": rows, "first_time": first_time, "last_time": last_time,
+                "fetched_at": fetched_at, "exhausted": bool(exhausted)}
+
+    @TRACER.traced("candles.read", "cache")
+    def read(self, symbol: str, interval: str, since: Optional[int] = None) -> CandleSeries:
+        rows = self.db.connection().execute(
+            f"SELECT {', '.join(self.COLUMN_NAMES)} FROM candles"
+            " WHERE symbol = ? AND interval = ? AND time >= ? ORDER BY time",
+            (symbol, interval, since if since is not None else -(1 << 63))
+        ).fetchall()
+        if not rows:
+            return CandleSeries()
+        return CandleSeries(dict(zip(self.COLUMN_NAMES, zip(*rows))))
+
+    @TRACER.traced("candles.write", "cache")
+    def merge(self, symbol: str, interval: str, candles: CandleSeries, exhausted: bool = False) -> dict:
+        with self.db.transaction() as conn:
+            previous = self.meta(symbol, interval)
+            candles = self._without_partial_head(
+                candles.sorted(), previous["last_time"] if previous else None,
+                lambda t: conn.execute("SELECT 1 FROM candles WHERE symbol = ? AND interval = ? AND time = ?",
+                                       (symbol, interval, t)).fetchone() is not None
+            )
+            if len(candles):
+                rows = zip(*(column.tolist() for column in candles.columns.values()))
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO candles (symbol, interval, {', '.join(self.COLUMN_NAMES)})"
+                    f" VALUES (?, ?, {', '.join('?' * len(self.COLUMN_NAMES))})",
+                    ((symbol, interval, *row) for row in rows)
+                )
+
+            exhausted = exhausted or bool(previous and previous["exhausted"])
+            conn.execute(
+                "INSERT OR REPLACE INTO series"
+                " (symbol, interval, row_count, first_time, last_time, fetched_at, exhausted)"
+                " SELECT ?, ?, count(*), min(time), max(time), ?, ? FROM candles"
+                " WHERE symbol = ? AND interval = ?",
+                (symbol, interval, time.time(), int(exhausted), symbol, interval)
+            )
+        if self.on_write is not None:
+            self.on_write(len(candles) * 8 * len(self.COLUMN_NAMES))
+        return self.meta(symbol, interval)
+
+    def entries(self) -> Iterator[tuple[Any, int, float, float]]:
+        # Reads aren't recorded here, so the last fetch stands in for the last read
+        rows = self.db.connection().execute(
+            "SELECT symbol, interval, row_count, fetched_at FROM series"
+        ).fetchall()
+        for symbol, interval, row_count, fetched_at in rows:
+            yield (symbol, interval), row_count * 8 * len(self.COLUMN_NAMES), fetched_at or 0.0, fetched_at or 0.0
+
+    def remove(self, key: Any) -> bool:
+        lock = self.lock(*key)
+        if not lock.try_acquire():
+            return False
+        try:
+            with self.db.transaction() as conn:
+                conn.execute("DELETE FROM candles WHERE symbol = ? AND interval = ?", key)
+                conn.execute("DELETE FROM series WHERE symbol = ? AND interval = ?", key)
+        finally:
+            lock.release()
+        return True
+
+    def clear(self) -> None:
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM candles")
+            conn.execute("DELETE FROM series")
+
+
+# Cache implementations selectable via Config.cache_format
+CACHE_BACKENDS = {
+    "json": CacheManager,
+    "binary": BinaryCacheManager,
+    "sqlite": SQLiteCacheManager,
+}
+
+
+# =============================================================================
+# API Client Base
+# =============================================================================
+
+def _base_url(client) -> str:
+    """API root for a client: the configured override, else its BASE_URL."""
+    return getattr(client.config, f"{client.PROVIDER}_base_url") or client.BASE_URL
+
+
+class _SyncClient:
+    """Shared requests plumbing for the synchronous API clients.
+
+    The session, and with it the ``requests`` import, is created on the
+    first API call so offline commands start fast.
+    """
+
+    BASE_URL = ""
+    PROVIDER = ""
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.limiter = TokenBucket.for_provider(config, self.PROVIDER)
+        self._session: Optional["requests.Session"] = None
+
+    @property
+    def session(self) -> "requests.Session":
+        """HTTP session, created (and ``requests`` loaded) on the first API call."""
+        if self._session is None:
+            if requests is None:
+                raise ImportError("'requests' package not installed. Run: pip install requests")
+            self._session = requests.Session()
+            self._session.headers.update({
+                "Accept": "application/json",
+                "User-Agent": "InsiderTrading-PriceFetcher/1.0"
+            })
+        return self._session
+
+    def _get(self, endpoint: str, params: dict) -> "requests.Response":
+        """Perform one GET, recording its latency and status in METRICS."""
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with TRACER.span("http.get", self.PROVIDER, endpoint=_endpoint_label(endpoint)):
                 response = self.session.get(
-                    url,
-                    params=params or {},
+                    f"{_base_url(self)}/{endpoint}",
+                    params=params,
                     timeout=self.config.request_timeout
                 )
+            status = response.status_code
+            return response
+        finally:
+            METRICS.record_request(self.PROVIDER, endpoint, status, time.perf_counter() - started)
 
-                # Handle rate limiting
-                if response.status_code == 429:
+
+# =============================================================================
+# TwelveData API Client
+# =============================================================================
+
+class TwelveDataClient(_SyncClient):
+    """Client for TwelveData API - Stocks, ETFs, Commodities."""
+
+    BASE_URL = "https://api.twelvedata.com"
+    PROVIDER = "twelvedata"
+
+    # Interval mappings for historical data
+    INTERVALS = {
+        "1D": ("15min", 96),      # 15-min candles for 1 day
+        "1W": ("1h", 168),        # Hourly candles for 1 week
+        "1M": ("1day", 30),       # Daily candles for 1 month
+        "3M": ("1day", 90),       # Daily candles for 3 months
+        "1Y": ("1day", 365),      # Daily candles for 1 year
+        "5Y": ("1week", 260),     # Weekly candles for 5 years
+    }
+
+    def __init__(self, api_key: str, config: Config):
+        super().__init__(config)
+        self.api_key = api_key
+
+    def _request(self, endpoint: str, params: dict, credits: int = 1) -> dict:
+        """Make API request with retry logic.
+
+        ``credits`` is the request's cost against the rate limit budget
+        (TwelveData charges one credit per symbol).
+        """
+        params["apikey"] = self.api_key
+
+        last_error = None
+        for attempt in range(self.config.max_retries):
+            if attempt:
+                METRICS.inc("retries_total", provider=self.PROVIDER, endpoint=endpoint)
+            if self.limiter:
+                with METRICS.timer("stage_seconds", component=self.PROVIDER, stage="rate_limit"):
+                    self.limiter.acquire(credits)
+            try:
+                response = self._get(endpoint, params)
+
+                # Out of credits: make every process sharing the budget back off
+                if response.status_code == 429 and self.limiter:
                     retry_after = int(response.headers.get("Retry-After", 60))
-                    logger.warning(f"Rate limited. Waiting {retry_after}s...")
-                    time.sleep(retry_after)
+                    logger.warning(f"Rate limited. Backing off {retry_after}s...")
+                    self.limiter.penalize(retry_after)
+                    last_error = RateLimitExceeded(f"{self.PROVIDER} {endpoint} rate limited (429)")
                     continue
 
                 response.raise_for_status()
-                return response.json()
+                METRICS.inc("credits_total", credits, provider=self.PROVIDER)
+                with TRACER.span("http.decode", self.PROVIDER):
+                    data = response.json()
+
+                # Check for API-level errors
+                if data.get("status") == "error":
+                    raise ValueError(data.get("message", "Unknown API error"))
+
+                return data
 
             except requests.RequestException as e:
                 last_error = e
@@ -467,284 +2783,1787 @@ class CoinGeckoClient:
 
         raise last_error or Exception("All retry attempts failed")
 
-    def fetch_crypto_quotes(self) -> list[PriceQuote]:
-        """Fetch quotes for all cryptocurrencies."""
-        quotes = []
+    def get_quote(self, symbol: str) -> dict:
+        """Get real-time quote for a symbol."""
+        return self._request("quote", {"symbol": symbol})
 
-        # Get all CoinGecko IDs
-        coin_ids = [info["coingecko_id"] for info in CRYPTO.values()]
-        ids_param = ",".join(coin_ids)
+    def _get_quote_batch(self, symbols: list[str]) -> dict:
+        """Request one batch of quotes, keyed by symbol."""
+        symbols_param = ",".join(symbols)
+        data = self._request("quote", {"symbol": symbols_param}, credits=len(symbols))
+        return self._normalize_batch(data, symbols)
+
+    @staticmethod
+    def _normalize_batch(data: dict, symbols: list[str]) -> dict:
+        """Key a ``quote`` response by symbol (single-symbol responses are flat)."""
+        if isinstance(data, dict) and "symbol" in data:
+            return {data["symbol"]: data}
+        if len(symbols) == 1 and isinstance(data, dict) and symbols[0] not in data:
+            return {symbols[0]: data}
+        return data
+
+    @staticmethod
+    def _chunks(symbols: list[str], size: int) -> list[list[str]]:
+        size = max(1, size)
+        return [symbols[i:i + size] for i in range(0, len(symbols), size)]
+
+    @staticmethod
+    def _merge_chunks(chunks: list[list[str]], results: list) -> dict:
+        """Merge per-chunk responses; symbols of failed chunks get error entries.
+
+        Raises the first error if every chunk failed.
+        """
+        merged, errors = {}, []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                errors.append(result)
+                logger.warning(f"Quote batch {chunk[0]}..{chunk[-1]} ({len(chunk)} symbols) failed: {result}")
+                merged.update((s, {"status": "error", "message": f"batch failed: {result}"}) for s in chunk)
+            else:
+                merged.update(result)
+        if errors and len(errors) == len(chunks):
+            raise errors[0]
+        return merged
 
-        try:
-            data = self._request("coins/markets", {
-                "vs_currency": "usd",
-                "ids": ids_param,
-                "order": "market_cap_desc",
-                "per_page": 100,
-                "page": 1,
-                "sparkline": "false",
-                "price_change_percentage": "24h"
-            })
+    def get_quotes(self, symbols: list[str]) -> dict:
+        """Get multiple quotes at once, keyed by symbol.
 
-            # Create lookup by ID
-            data_by_id = {item["id"]: item for item in data}
+        Symbol lists larger than ``config.twelvedata_batch_size`` are split
+        into batches requested in parallel (up to ``config.max_workers``).
+        """
+        chunks = self._chunks(symbols, self.config.twelvedata_batch_size)
+        if len(chunks) == 1:
+            return self._get_quote_batch(symbols)
 
-            for symbol, info in CRYPTO.items():
-                coin_data = data_by_id.get(info["coingecko_id"])
-                if not coin_data:
-                    logger.warning(f"No data found for {symbol}")
-                    continue
+        def fetch(chunk):
+            try:
+                return self._get_quote_batch(chunk)
+            except Exception as e:
+                return e
 
-                price = coin_data.get("current_price", 0)
-                change_pct = coin_data.get("price_change_percentage_24h", 0) or 0
-                change_usd = coin_data.get("price_change_24h", 0) or 0
-
-                quotes.append(PriceQuote(
-                    symbol=symbol,
-                    name=info["name"],
-                    price=price,
-                    change_24h=round(change_pct, 2),
-                    change_24h_usd=round(change_usd, 4),
-                    high_24h=coin_data.get("high_24h"),
-                    low_24h=coin_data.get("low_24h"),
-                    volume_24h=coin_data.get("total_volume"),
-                    market_cap=coin_data.get("market_cap"),
-                    timestamp=datetime.now().isoformat(),
-                    source="coingecko",
-                    asset_type="crypto"
-                ))
-        except Exception as e:
-            logger.error(f"Error fetching crypto quotes: {e}")
-            raise
+        with ThreadPoolExecutor(max_workers=min(self.config.max_workers, len(chunks)),
+                                thread_name_prefix="twelvedata-batch") as executor:
+            results = list(executor.map(fetch, chunks))
+        return self._merge_chunks(chunks, results)
+
+    def get_time_series(self, symbol: str, interval: str, outputsize: int) -> dict:
+        """Get historical time series data."""
+        return self._request("time_series", {
+            "symbol": symbol,
+            "interval": interval,
+            "outputsize": outputsize
+        })
+
+    @staticmethod
+    @METRICS.timed("stage_seconds", component="twelvedata", stage="parse")
+    @TRACER.traced("twelvedata.parse", "twelvedata")
+    def _build_quotes(data: dict, assets: dict, change_decimals: int = 2,
+                      with_volume: bool = True) -> list[PriceQuote]:
+        """Convert a batch ``quote`` response into PriceQuotes for ``assets``."""
+        # Handle single vs multiple response format
+        if isinstance(data, dict) and "symbol" in data:
+            # Single symbol response
+            data = {data["symbol"]: data}
+
+        quotes = []
+        for symbol, info in assets.items():
+            td_symbol = info["twelvedata"]
+            quote_data = data.get(td_symbol, {})
+
+            if quote_data.get("status") == "error":
+                logger.warning(f"Error fetching {symbol}: {quote_data.get('message')}")
+                continue
+
+            price = float(quote_data.get("close", 0))
+            prev_close = float(quote_data.get("previous_close", price))
+            change_usd = price - prev_close
+            change_pct = (change_usd / prev_close * 100) if prev_close > 0 else 0
+
+            quotes.append(PriceQuote(
+                symbol=symbol,
+                name=info["name"],
+                price=price,
+                change_24h=round(change_pct, 2),
+                change_24h_usd=round(change_usd, change_decimals),
+                high_24h=float(quote_data.get("high", 0)) or None,
+                low_24h=float(quote_data.get("low", 0)) or None,
+                # Forex pairs don't have volume
+                volume_24h=(float(quote_data.get("volume", 0)) or None) if with_volume else None,
+                market_cap=None,
+                timestamp=datetime.now().isoformat(),
+                source="twelvedata",
+                asset_type=info["type"]
+            ))
 
         return quotes
 
-    def fetch_historical(self, symbol: str, days: int = 30) -> HistoricalData:
-        """Fetch historical price data for a cryptocurrency."""
-        asset_info = CRYPTO.get(symbol)
+    @staticmethod
+    def _resolve_historical(symbol: str, window: str) -> tuple[dict, str, int]:
+        """Resolve asset info, interval and output size for a history request."""
+        asset_info = STOCKS_ETFS.get(symbol) or COMMODITIES.get(symbol)
         if not asset_info:
-            raise ValueError(f"Unknown crypto symbol: {symbol}")
+            raise ValueError(f"Unknown symbol: {symbol}")
 
-        coin_id = asset_info["coingecko_id"]
+        interval, outputsize = TwelveDataClient.INTERVALS.get(window, TwelveDataClient.INTERVALS["1M"])
+        return asset_info, interval, outputsize
 
-        data = self._request(f"coins/{coin_id}/market_chart", {
-            "vs_currency": "usd",
-            "days": days,
-            "interval": "daily" if days > 1 else "hourly"
-        })
+    @staticmethod
+    def _parse_time_series(values: list[dict]) -> tuple[CandleSeries, list[int]]:
+        """Parse ``time_series`` rows (oldest first) into columns in one pass.
 
-        if "prices" not in data:
+        Returns the candles and the indices of rows that could not be
+        parsed. Naive datetimes are interpreted in local time, as
+        ``datetime.timestamp()`` does.
+        """
+        if np is None:
+            return TwelveDataClient._parse_time_series_rows(values)
+
+        def column(key: str, dtype, default=None):
+            raw = [v.get(key, default) for v in values]
+            try:
+                return np.array(raw, dtype=dtype), None
+            except (ValueError, TypeError):
+                # Slow path only when the batch contains bad rows
+                parsed, bad = [], []
+                for item in raw:
+                    try:
+                        parsed.append(np.array(item, dtype=dtype))
+                        bad.append(False)
+                    except (ValueError, TypeError):
+                        parsed.append(np.array(0, dtype=dtype))
+                        bad.append(True)
+                return np.array(parsed, dtype=dtype), np.array(bad, dtype=bool)
+
+        columns, invalid = {}, np.zeros(len(values), dtype=bool)
+        for name, key, dtype, default in (
+            ("time", "datetime", "datetime64[s]", None),
+            ("open", "open", np.float64, None),
+            ("high", "high", np.float64, None),
+            ("low", "low", np.float64, None),
+            ("close", "close", np.float64, None),
+            ("volume", "volume", np.float64, 0),
+        ):
+            columns[name], bad = column(key, dtype, default)
+            if bad is not None:
+                invalid |= bad
+            # NumPy turns missing values (None) into NaN/NaT instead of raising
+            invalid |= np.isnat(columns[name]) if name == "time" else np.isnan(columns[name])
+
+        if invalid.any():
+            columns = {name: col[~invalid] for name, col in columns.items()}
+        columns["time"] = _local_epochs(columns["time"].astype(np.int64))
+        return CandleSeries(columns), np.flatnonzero(invalid).tolist()
+
+    @staticmethod
+    def _parse_time_series_rows(values: list[dict]) -> tuple[CandleSeries, list[int]]:
+        """Pure-Python fallback for ``_parse_time_series``."""
+        columns = {name: [] for name, _ in CandleSeries.COLUMNS}
+        invalid = []
+        for i, v in enumerate(values):
+            try:
+                row = (
+                    int(datetime.fromisoformat(v["datetime"].replace(" ", "T")).timestamp()),
+                    float(v["open"]),
+                    float(v["high"]),
+                    float(v["low"]),
+                    float(v["close"]),
+                    float(v.get("volume", 0))
+                )
+            except (ValueError, KeyError, TypeError, AttributeError):
+                invalid.append(i)
+                continue
+            for (name, _), value in zip(CandleSeries.COLUMNS, row):
+                columns[name].append(value)
+        return CandleSeries(columns), invalid
+
+    @staticmethod
+    @METRICS.timed("stage_seconds", component="twelvedata", stage="parse")
+    @TRACER.traced("twelvedata.parse", "twelvedata")
+    def _build_historical(symbol: str, asset_info: dict, interval: str, data: dict) -> HistoricalData:
+        """Convert a ``time_series`` response into HistoricalData."""
+        if "values" not in data:
             raise ValueError("No historical data returned")
 
-        # CoinGecko returns [timestamp_ms, price] pairs
-        # We need to construct OHLC from the data
-        prices = data["prices"]
-        volumes = data.get("total_volumes", [])
-
-        # Create volume lookup
-        volume_lookup = {int(v[0] / 1000): v[1] for v in volumes}
-
-        candles = []
-        for i, (timestamp_ms, price) in enumerate(prices):
-            timestamp = int(timestamp_ms / 1000)
-            volume = volume_lookup.get(timestamp, 0)
-
-            # For daily data, we approximate OHLC
-            # In reality, we'd need separate OHLC endpoint
-            candles.append(PriceCandle(
-                time=timestamp,
-                open=price,
-                high=price * 1.005,  # Approximate
-                low=price * 0.995,   # Approximate
-                close=price,
-                volume=volume
-            ))
+        # TwelveData returns newest first
+        candles, invalid = TwelveDataClient._parse_time_series(data["values"][::-1])
+        if invalid:
+            logger.warning(f"Skipping {len(invalid)} invalid candles for {symbol} "
+                           f"(rows {invalid[:10]}{'...' if len(invalid) > 10 else ''})")
+
+        return HistoricalData(
+            symbol=symbol,
+            name=asset_info["name"],
+            candles=candles,
+            interval=interval,
+            source="twelvedata"
+        )
+
+    def fetch_stock_quotes(self) -> list[PriceQuote]:
+        """Fetch quotes for all stocks and ETFs."""
+        if not self.api_key:
+            raise ValueError("TWELVE_DATA_API_KEY not configured")
+
+        symbols = [info["twelvedata"] for info in STOCKS_ETFS.values()]
+
+        try:
+            return self._build_quotes(self.get_quotes(symbols), STOCKS_ETFS)
+        except Exception as e:
+            logger.error(f"Error fetching stock quotes: {e}")
+            raise
+
+    def fetch_commodity_quotes(self) -> list[PriceQuote]:
+        """Fetch quotes for all commodities."""
+        if not self.api_key:
+            raise ValueError("TWELVE_DATA_API_KEY not configured")
+
+        symbols = [info["twelvedata"] for info in COMMODITIES.values()]
+
+        try:
+            return self._build_quotes(self.get_quotes(symbols), COMMODITIES,
+                                      change_decimals=4, with_volume=False)
+        except Exception as e:
+            logger.error(f"Error fetching commodity quotes: {e}")
+            raise
+
+    def fetch_historical(self, symbol: str, window: str = "1M",
+                         outputsize: Optional[int] = None) -> HistoricalData:
+        """Fetch historical price data for a symbol.
+
+        ``outputsize`` overrides the window's candle count (e.g. to fetch only a tail).
+        """
+        if not self.api_key:
+            raise ValueError("TWELVE_DATA_API_KEY not configured")
+
+        asset_info, interval, window_size = self._resolve_historical(symbol, window)
+        outputsize = outputsize or window_size
+        data = self.get_time_series(asset_info["twelvedata"], interval, outputsize)
+        return self._build_historical(symbol, asset_info, interval, data)
+
+
+# =============================================================================
+# CoinGecko API Client
+# =============================================================================
+
+class CoinGeckoClient(_SyncClient):
+    """Client for CoinGecko API - Cryptocurrencies."""
+
+    BASE_URL = "https://api.coingecko.com/api/v3"
+    PROVIDER = "coingecko"
+
+    # Window to days mapping for historical data
+    WINDOW_DAYS = {"1D": 1, "1W": 7, "1M": 30, "3M": 90, "1Y": 365, "5Y": 1825}
+
+    def _request(self, endpoint: str, params: dict = None) -> dict:
+        """Make API request with retry logic."""
+        last_error = None
+        for attempt in range(self.config.max_retries):
+            if attempt:
+                METRICS.inc("retries_total", provider=self.PROVIDER, endpoint=_endpoint_label(endpoint))
+            if self.limiter:
+                with METRICS.timer("stage_seconds", component=self.PROVIDER, stage="rate_limit"):
+                    self.limiter.acquire()
+            try:
+                response = self._get(endpoint, params or {})
+
+                # Handle rate limiting
+                if response.status_code == 429:
+                    retry_after = int(response.headers.get("Retry-After", 60))
+                    if self.limiter:
+                        # The next acquire() waits or fails fast per rate_limit_mode
+                        logger.warning(f"Rate limited. Backing off {retry_after}s...")
+                        self.limiter.penalize(retry_after)
+                    else:
+                        logger.warning(f"Rate limited. Waiting {retry_after}s...")
+                        time.sleep(retry_after)
+                    last_error = RateLimitExceeded(f"{self.PROVIDER} {endpoint} rate limited (429)")
+                    continue
+
+                response.raise_for_status()
+                with TRACER.span("http.decode", self.PROVIDER):
+                    return response.json()
+
+            except requests.RequestException as e:
+                last_error = e
+                logger.warning(f"Attempt {attempt + 1} failed: {e}")
+                if attempt < self.config.max_retries - 1:
+                    time.sleep(self.config.retry_delay * (2 ** attempt))
+
+        raise last_error or Exception("All retry attempts failed")
+
+    @staticmethod
+    def _markets_pages(per_page: int) -> list[dict]:
+        """Query parameters for each ``coins/markets`` page covering all of CRYPTO.
+
+        Pages are split by coin ID rather than by ``page`` number, so every
+        tracked coin lands on exactly one page even if market-cap ranks
+        shift between requests, and each URL stays bounded.
+        """
+        per_page = max(1, min(per_page, 250))
+        coin_ids = [info["coingecko_id"] for info in CRYPTO.values()]
+        return [
+            {
+                "vs_currency": "usd",
+                "ids": ",".join(coin_ids[i:i + per_page]),
+                "order": "market_cap_desc",
+                "per_page": per_page,
+                "page": 1,
+                "sparkline": "false",
+                "price_change_percentage": "24h"
+            }
+            for i in range(0, len(coin_ids), per_page)
+        ]
+
+    @staticmethod
+    def _merge_pages(results: list) -> list:
+        """Concatenate page results, logging failed pages.
+
+        Raises the first error if every page failed.
+        """
+        merged, errors = [], []
+        for page, result in enumerate(results, 1):
+            if isinstance(result, Exception):
+                errors.append(result)
+                logger.warning(f"Markets page {page}/{len(results)} failed: {result}")
+            else:
+                merged.extend(result)
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        return merged
+
+    @staticmethod
+    @METRICS.timed("stage_seconds", component="coingecko", stage="parse")
+    @TRACER.traced("coingecko.parse", "coingecko")
+    def _build_quotes(data: list) -> list[PriceQuote]:
+        """Convert a ``coins/markets`` response into PriceQuotes."""
+        # Create lookup by ID
+        data_by_id = {item["id"]: item for item in data}
+
+        quotes = []
+        for symbol, info in CRYPTO.items():
+            coin_data = data_by_id.get(info["coingecko_id"])
+            if not coin_data:
+                logger.warning(f"No data found for {symbol}")
+                continue
+
+            price = coin_data.get("current_price", 0)
+            change_pct = coin_data.get("price_change_percentage_24h", 0) or 0
+            change_usd = coin_data.get("price_change_24h", 0) or 0
+
+            quotes.append(PriceQuote(
+                symbol=symbol,
+                name=info["name"],
+                price=price,
+                change_24h=round(change_pct, 2),
+                change_24h_usd=round(change_usd, 4),
+                high_24h=coin_data.get("high_24h"),
+                low_24h=coin_data.get("low_24h"),
+                volume_24h=coin_data.get("total_volume"),
+                market_cap=coin_data.get("market_cap"),
+                timestamp=datetime.now().isoformat(),
+                source="coingecko",
+                asset_type="crypto"
+            ))
+
+        return quotes
+
+    @staticmethod
+    def _interval(days: int) -> str:
+        """Candle interval for a ``days`` range (matches TwelveData.INTERVALS)."""
+        if days <= 1:
+            return "15min"
+        if days <= 7:
+            return "1h"
+        if days <= 365:
+            return "1day"
+        return "1week"
+
+    @staticmethod
+    def _chart_params(days: int, interval: Optional[str] = None) -> dict:
+        """Query parameters for the ``market_chart`` request."""
+        interval = interval or CoinGeckoClient._interval(days)
+        params = {"vs_currency": "usd", "days": days}
+        if INTERVAL_SECONDS[interval] >= 86400:
+            params["interval"] = "daily"
+        # Otherwise CoinGecko picks the finest granularity available:
+        # 5-minute points for 1 day, hourly points up to 90 days
+        return params
+
+    @staticmethod
+    @METRICS.timed("stage_seconds", component="coingecko", stage="parse")
+    @TRACER.traced("coingecko.parse", "coingecko")
+    def _build_historical(symbol: str, asset_info: dict, days: int, data: dict,
+                          interval: Optional[str] = None) -> HistoricalData:
+        """Convert a ``market_chart`` response into HistoricalData."""
+        if "prices" not in data:
+            raise ValueError("No historical data returned")
+
+        # CoinGecko returns [timestamp_ms, value] point series; aggregate
+        # them into real OHLCV buckets at the target interval
+        interval = interval or CoinGeckoClient._interval(days)
+        candles = resample_ohlcv(data["prices"], data.get("total_volumes", []),
+                                 INTERVAL_SECONDS[interval])
+
+        return HistoricalData(
+            symbol=symbol,
+            name=asset_info["name"],
+            candles=candles,
+            interval=interval,
+            source="coingecko"
+        )
+
+    def get_markets(self, per_page: Optional[int] = None) -> list:
+        """Get ``coins/markets`` rows for all tracked coins.
+
+        Pages of ``per_page`` coins (default ``config.coingecko_page_size``)
+        are requested in parallel, up to ``config.max_workers`` at a time.
+        """
+        pages = self._markets_pages(per_page or self.config.coingecko_page_size)
+        if len(pages) == 1:
+            return self._request("coins/markets", pages[0])
+
+        def fetch(params):
+            try:
+                return self._request("coins/markets", params)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(self.config.max_workers, len(pages)),
+                                thread_name_prefix="coingecko-page") as executor:
+            results = list(executor.map(fetch, pages))
+        return self._merge_pages(results)
+
+    def fetch_crypto_quotes(self, per_page: Optional[int] = None) -> list[PriceQuote]:
+        """Fetch quotes for all cryptocurrencies."""
+        try:
+            return self._build_quotes(self.get_markets(per_page))
+        except Exception as e:
+            logger.error(f"Error fetching crypto quotes: {e}")
+            raise
+
+    def fetch_historical(self, symbol: str, days: int = 30, interval: Optional[str] = None) -> HistoricalData:
+        """Fetch historical price data for a cryptocurrency.
+
+        Points are resampled into candles of ``interval`` (a key of
+        INTERVAL_SECONDS), defaulting to the interval implied by ``days``.
+        """
+        asset_info = CRYPTO.get(symbol)
+        if not asset_info:
+            raise ValueError(f"Unknown crypto symbol: {symbol}")
+
+        data = self._request(f"coins/{asset_info['coingecko_id']}/market_chart",
+                             self._chart_params(days, interval))
+        return self._build_historical(symbol, asset_info, days, data, interval)
+
+
+# =============================================================================
+# Refresh Scheduling
+# =============================================================================
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """The ``n``-th ``weekday`` (0 = Monday) of a month; ``n=-1`` is the last."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+
+def _observed(day: date) -> date:
+    """Weekend holidays move to the adjacent Friday or Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year: int) -> frozenset:
+    """Full-day NYSE closures in ``year`` (early closes are treated as full sessions)."""
+    new_year = date(year, 1, 1)
+    days = {
+        # A Saturday New Year's Day is not observed on the prior Friday
+        new_year + timedelta(days=1) if new_year.weekday() == 6 else new_year,
+        _nth_weekday(year, 1, 0, 3),   # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),   # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),   # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(d for d in days if d.weekday() < 5)
+
+
+@dataclass(frozen=True)
+class MarketSchedule:
+    """Trading sessions and refresh cadence for one asset class.
+
+    ``sessions`` holds, per weekday (0 = Monday), the (open, close) minutes
+    of each session in ``timezone``; a session closing at 1440 continues
+    into the next day. No sessions means the market never closes.
+    """
+    timezone: str = "UTC"
+    sessions: tuple = ()
+    holidays: Optional[Callable[[int], frozenset]] = None  # year -> dates with no sessions
+    reference_move: float = 1.0  # Median |24h change| (%) at which the base TTL applies
+
+    def state(self, now: float) -> tuple[bool, Optional[float]]:
+        """Return (is_open, epoch of the most recent close) at ``now``."""
+        if not self.sessions:
+            return True, None
+
+        from zoneinfo import ZoneInfo
+
+        tz = ZoneInfo(self.timezone)
+        local = datetime.fromtimestamp(now, tz)
+        for days_back in range(10):
+            day = local.date() - timedelta(days=days_back)
+            if self.holidays and day in self.holidays(day.year):
+                continue
+            midnight = datetime(day.year, day.month, day.day, tzinfo=tz)
+            for open_minute, close_minute in reversed(self.sessions[day.weekday()]):
+                start = midnight + timedelta(minutes=open_minute)
+                end = midnight + timedelta(minutes=close_minute)
+                if start <= local < end:
+                    return True, None
+                if end <= local and close_minute < 1440:
+                    return False, end.timestamp()
+        return False, None
+
+
+_NYSE_WEEK = (((570, 960),),) * 5 + ((), ())  # 09:30-16:00 ET, Monday-Friday
+_GLOBEX_WEEK = (((0, 1020), (1080, 1440)),) * 4 + (((0, 1020),), (), ((1080, 1440),))  # Sun 18:00-Fri 17:00 ET
+
+# Market schedule for each quote category (see Config.refresh_mode)
+MARKET_SCHEDULES = {
+    "stock_quotes": MarketSchedule("America/New_York", _NYSE_WEEK, nyse_holidays, reference_move=1.0),
+    "commodity_quotes": MarketSchedule("America/New_York", _GLOBEX_WEEK, reference_move=1.0),
+    "crypto_quotes": MarketSchedule(reference_move=3.0),
+}
+
+
+class RefreshScheduler:
+    """Per-asset-class quote freshness from trading sessions and volatility.
+
+    Offers the same ``lookup_quotes``/``lookup_index`` interface as the cache
+    it wraps, but judges staleness per category:
+
+    - While a market is open, entries go stale after ``cache_ttl_seconds``
+      scaled by recent volatility: the class's reference move divided by the
+      median |24h change| of the cached quotes, clamped to
+      [MIN_TTL_FACTOR, MAX_TTL_FACTOR].
+    - Once a market has been closed for CLOSE_SETTLE_SECONDS, anything
+      fetched since then is the last close and stays fresh until the next
+      session opens, so closed markets make no upstream calls.
+
+    Categories without a schedule (e.g. ``all_quotes``) keep the cache TTLs.
+    """
+
+    CLOSE_SETTLE_SECONDS = 300  # Keep polling briefly after a close so the final print lands
+    MIN_TTL_FACTOR = 0.5
+    MAX_TTL_FACTOR = 4.0
+
+    def __init__(self, cache: CacheManager, schedules: Optional[dict[str, MarketSchedule]] = None):
+        self.cache = cache
+        self.schedules = MARKET_SCHEDULES if schedules is None else schedules
+
+    def _ttl_factor(self, schedule: MarketSchedule, quotes: list[PriceQuote]) -> float:
+        moves = sorted(abs(q.change_24h) for q in quotes)
+        if not moves:
+            return 1.0
+        median = moves[len(moves) // 2]
+        if median <= 0:
+            return self.MAX_TTL_FACTOR
+        return min(self.MAX_TTL_FACTOR, max(self.MIN_TTL_FACTOR, schedule.reference_move / median))
+
+    def ttls(self, cache_key: str, quotes: list[PriceQuote], now: Optional[float] = None) -> tuple[float, float]:
+        """(soft, hard) TTL in seconds for cached ``quotes`` of ``cache_key``."""
+        schedule = self.schedules.get(cache_key)
+        if schedule is None:
+            return self.cache.ttl_seconds, self.cache.hard_ttl_seconds
+
+        now = time.time() if now is None else now
+        is_open, last_close = schedule.state(now)
+        if not is_open and last_close is not None:
+            settled_for = now - last_close - self.CLOSE_SETTLE_SECONDS
+            if settled_for > 0:
+                # Entries younger than this were written after the close settled
+                return settled_for, max(settled_for, self.cache.hard_ttl_seconds)
+
+        soft = self.cache.ttl_seconds * self._ttl_factor(schedule, quotes)
+        return soft, max(soft, self.cache.hard_ttl_seconds)
+
+    def lookup_quotes(self, cache_key: str) -> Optional[tuple[list[PriceQuote], bool]]:
+        """Get cached quotes as (quotes, is_stale) under the category's schedule."""
+        entry = self.cache.read_quotes(cache_key, float("inf"))
+        if entry is None:
+            return None
+
+        quotes, age = entry
+        soft, hard = self.ttls(cache_key, quotes)
+        if age > hard:
+            return None
+        return quotes, age > soft
+
+    def lookup_index(self, symbols: list[str]) -> dict[str, tuple[PriceQuote, bool]]:
+        """Look up symbols as {symbol: (quote, is_stale)} under each symbol's schedule."""
+        now = time.time()
+        found = {}
+        for symbol, (quote, age) in self.cache.read_index(symbols).items():
+            soft, hard = self.ttls(_quote_category(symbol), [quote], now)
+            if age <= hard:
+                found[symbol] = (quote, age > soft)
+        return found
+
+
+# =============================================================================
+# Price Fetcher - Main Interface
+# =============================================================================
+
+def _quote_category(symbol: str) -> str:
+    """Cache key of the quote category holding a known symbol."""
+    return next(key for key, assets in QUOTE_CATEGORIES.items() if symbol in assets)
+
+
+def _plan_quote_lookup(cache: "CacheManager | RefreshScheduler", symbols: list[str],
+                       use_cache: bool) -> tuple[list[str], dict, set, set]:
+    """Split a batch lookup into quote index hits and categories to refresh.
+
+    ``cache`` is the CacheManager, or a RefreshScheduler wrapping it.
+
+    Returns (known symbols, found quotes, categories to fetch, stale categories).
+    """
+    known = []
+    for symbol in symbols:
+        symbol = symbol.upper()
+        if symbol in ALL_ASSETS:
+            known.append(symbol)
+        else:
+            logger.error(f"Unknown symbol: {symbol}")
+
+    found, stale = {}, set()
+    if use_cache:
+        stale_symbols = 0
+        for symbol, (quote, is_stale) in cache.lookup_index(known).items():
+            found[symbol] = quote
+            if is_stale:
+                stale.add(_quote_category(symbol))
+                stale_symbols += 1
+        for result, count in (("fresh", len(found) - stale_symbols), ("stale", stale_symbols),
+                              ("miss", len(known) - len(found))):
+            if count:
+                METRICS.inc("cache_lookups_total", count, key=CacheManager.INDEX_KEY, result=result)
+
+    missing = {_quote_category(s) for s in known if s not in found}
+    return known, found, missing, stale - missing
+
+
+class PriceFetcher:
+    """Main interface for fetching price data from all sources."""
+
+    def __init__(self, config: Optional[Config] = None, executor: Optional[Executor] = None):
+        self.config = config or Config.from_env()
+        self.cache = CACHE_BACKENDS[self.config.cache_format](
+            self.config.cache_dir,
+            self.config.cache_ttl_seconds,
+            self.config.memory_cache_entries,
+            self.config.cache_hard_ttl_seconds,
+            self.config.cache_max_bytes,
+            self.config.cache_max_entries
+        )
+        self.scheduler = RefreshScheduler(self.cache) if self.config.refresh_mode == "market" else None
+        METRICS.configure(self.config)
+        self._twelvedata = None
+        self._coingecko = None
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._flight = SingleFlight()
+        # Resolve clients at call time so cache hits never construct them
+        self._category_fetchers = {
+            "stock_quotes": lambda: self.twelvedata.fetch_stock_quotes(),
+            "commodity_quotes": lambda: self.twelvedata.fetch_commodity_quotes(),
+            "crypto_quotes": lambda: self.coingecko.fetch_crypto_quotes(),
+        }
+        self.candles = self.cache.candle_store()
+        self.board = QuoteBoard(Path(self.config.cache_dir) / QUOTE_BOARD_NAME) if self.config.quote_board else None
+
+    @property
+    def twelvedata(self) -> TwelveDataClient:
+        """TwelveData client (created on first use)."""
+        if self._twelvedata is None:
+            self._twelvedata = TwelveDataClient(self.config.twelvedata_api_key, self.config)
+        return self._twelvedata
+
+    @property
+    def coingecko(self) -> CoinGeckoClient:
+        """CoinGecko client (created on first use)."""
+        if self._coingecko is None:
+            self._coingecko = CoinGeckoClient(self.config)
+        return self._coingecko
+
+    @property
+    def executor(self) -> Executor:
+        """Executor used for concurrent fetches (created on first use)."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.config.max_workers,
+                thread_name_prefix="price-fetch"
+            )
+        return self._executor
+
+    def close(self) -> None:
+        """Shut down the executor if it was created by this fetcher, and unmap the board."""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self.board is not None:
+            self.board.close()
+
+    def _fetch_category(self, fetch, category: str, count: int) -> list[PriceQuote]:
+        """Run a category fetch, logging and swallowing failures."""
+        try:
+            with TRACER.span("quotes.category", category=category):
+                quotes = fetch()
+            logger.info(f"Fetched {count} {category} quotes")
+            return quotes
+        except Exception as e:
+            logger.error(f"Failed to fetch {category} quotes: {e}")
+            return []
+
+    def _fill_cache(self, cache_key: str, fetch, blocking: bool = True) -> Optional[list[PriceQuote]]:
+        """Fetch and cache quotes while holding the cross-process lock for the key.
+
+        With ``blocking=False``, returns None if another process holds the lock.
+        """
+        lock = self.cache.lock(cache_key)
+        if not blocking:
+            if not lock.try_acquire():
+                return None
+        elif not lock.acquire(self.config.lock_timeout):
+            # Writing without the lock could interleave with the holder's write
+            logger.warning(f"Timed out waiting for lock on {cache_key}; fetching without caching")
+            with METRICS.timer("refresh_seconds", key=cache_key), TRACER.span("quotes.refresh", key=cache_key):
+                return fetch()
+        try:
+            # Another process may have refreshed the entry while we waited
+            cached = self.cache.get_quotes(cache_key)
+            if cached:
+                return cached
+
+            with METRICS.timer("refresh_seconds", key=cache_key), TRACER.span("quotes.refresh", key=cache_key):
+                quotes = fetch()
+            if quotes:
+                self.cache.set_quotes(cache_key, quotes)
+                if self.board is not None:
+                    self.board.publish(quotes)
+            return quotes
+        finally:
+            lock.release()
+
+    def _revalidate(self, cache_key: str, fetch) -> None:
+        """Refresh a stale entry in a background thread, at most once per key."""
+        if self._flight.in_flight(cache_key):
+            return
+
+        def refresh():
+            try:
+                self._flight.do(cache_key, lambda: self._fill_cache(cache_key, fetch, blocking=False))
+            except Exception as e:
+                logger.warning(f"Background refresh of {cache_key} failed: {e}")
+
+        # Not a daemon: a short-lived CLI still finishes the refresh before exiting
+        threading.Thread(target=refresh, name=f"revalidate-{cache_key}").start()
+
+    def _cached_quotes(self, cache_key: str, fetch, use_cache: bool) -> list[PriceQuote]:
+        """Return cached quotes for ``cache_key`` or fetch them.
+
+        Concurrent misses for the same key share a single upstream fetch,
+        both across threads and across processes using the same cache_dir.
+        Stale entries (past the soft TTL, within the hard TTL) are returned
+        immediately and refreshed in the background.
+        """
+        if not use_cache:
+            return fetch()
+
+        entry = (self.scheduler or self.cache).lookup_quotes(cache_key)
+        METRICS.inc("cache_lookups_total", key=cache_key,
+                    result="miss" if entry is None else "stale" if entry[1] else "fresh")
+        if entry:
+            quotes, stale = entry
+            if stale:
+                self._revalidate(cache_key, fetch)
+            return quotes
+
+        # Copy so callers sharing the result can't affect each other
+        return list(self._flight.do(cache_key, lambda: self._fill_cache(cache_key, fetch)))
+
+    @TRACER.traced("quotes.all")
+    def get_all_quotes(self, use_cache: bool = True, concurrent: Optional[bool] = None) -> list[PriceQuote]:
+        """Fetch quotes for all assets.
+
+        When ``concurrent`` is true (default: ``config.concurrent_fetch``),
+        the stock, commodity and crypto fetches run in parallel on
+        ``self.executor``. A failure in one category does not affect the others.
+
+        With ``refresh_mode="market"`` each category is cached and refreshed
+        on its own schedule instead of as one ``all_quotes`` entry.
+        """
+        if self.scheduler is not None:
+            return self._scheduled_all_quotes(use_cache, concurrent)
+
+        return self._cached_quotes("all_quotes", lambda: self._fetch_all_quotes(concurrent), use_cache)
+
+    def _fetch_all_quotes(self, concurrent: Optional[bool]) -> list[PriceQuote]:
+        """Fetch every category from upstream and merge the results."""
+        categories = []
+
+        # TwelveData (stocks, ETFs, commodities)
+        if self.config.twelvedata_api_key:
+            categories.append((self.twelvedata.fetch_stock_quotes, "stock/ETF", len(STOCKS_ETFS)))
+            categories.append((self.twelvedata.fetch_commodity_quotes, "commodity", len(COMMODITIES)))
+        else:
+            logger.warning("TwelveData API key not configured - skipping stocks/commodities")
+
+        # CoinGecko (crypto)
+        categories.append((self.coingecko.fetch_crypto_quotes, "crypto", len(CRYPTO)))
+
+        if concurrent is None:
+            concurrent = self.config.concurrent_fetch
+
+        if concurrent and len(categories) > 1:
+            futures = [self.executor.submit(self._fetch_category, *c) for c in categories]
+            results = [f.result() for f in futures]
+        else:
+            results = [self._fetch_category(*c) for c in categories]
+
+        # Merge in category order so output is stable
+        return [q for result in results for q in result]
+
+    def _scheduled_all_quotes(self, use_cache: bool, concurrent: Optional[bool]) -> list[PriceQuote]:
+        """Merge per-category quotes, each refreshed on its own market schedule."""
+        categories = [("stock_quotes", "stock/ETF"), ("commodity_quotes", "commodity"), ("crypto_quotes", "crypto")]
+        if not self.config.twelvedata_api_key:
+            logger.warning("TwelveData API key not configured - skipping stocks/commodities")
+            categories = categories[2:]
+
+        def fetch(category):
+            cache_key, label = category
+            upstream = self._category_fetchers[cache_key]
+            count = len(QUOTE_CATEGORIES[cache_key])
+            return self._cached_quotes(cache_key, lambda: self._fetch_category(upstream, label, count), use_cache)
+
+        if concurrent is None:
+            concurrent = self.config.concurrent_fetch
+
+        if concurrent:
+            results = list(self.executor.map(fetch, categories))
+        else:
+            results = [fetch(category) for category in categories]
+        return [q for result in results for q in result]
+
+    def get_stock_quotes(self, use_cache: bool = True) -> list[PriceQuote]:
+        """Fetch quotes for stocks and ETFs only."""
+        return self._cached_quotes("stock_quotes", self._category_fetchers["stock_quotes"], use_cache)
+
+    def get_commodity_quotes(self, use_cache: bool = True) -> list[PriceQuote]:
+        """Fetch quotes for commodities only."""
+        return self._cached_quotes("commodity_quotes", self._category_fetchers["commodity_quotes"], use_cache)
+
+    def get_crypto_quotes(self, use_cache: bool = True) -> list[PriceQuote]:
+        """Fetch quotes for cryptocurrencies only."""
+        return self._cached_quotes("crypto_quotes", self._category_fetchers["crypto_quotes"], use_cache)
+
+    @TRACER.traced("quotes.get")
+    def get_quotes(self, symbols: list[str], use_cache: bool = True) -> list[PriceQuote]:
+        """Fetch quotes for several symbols, in request order.
+
+        Symbols are served from the quote index in one read; only the
+        categories holding missing symbols are fetched. Unknown or
+        unavailable symbols are left out.
+        """
+        known, found, missing, stale = _plan_quote_lookup(self.scheduler or self.cache, symbols, use_cache)
+
+        for cache_key in stale:
+            self._revalidate(cache_key, self._category_fetchers[cache_key])
+
+        def fetch(cache_key):
+            return self._cached_quotes(cache_key, self._category_fetchers[cache_key], use_cache)
+
+        missing = sorted(missing)
+        if self.config.concurrent_fetch and len(missing) > 1:
+            results = list(self.executor.map(fetch, missing))
+        else:
+            results = [fetch(cache_key) for cache_key in missing]
+
+        wanted = set(known)
+        for quotes in results:
+            found.update((q.symbol, q) for q in quotes if q.symbol in wanted)
+
+        return [found[s] for s in known if s in found]
+
+    def get_quote(self, symbol: str, use_cache: bool = True) -> Optional[PriceQuote]:
+        """Fetch quote for a single symbol."""
+        quotes = self.get_quotes([symbol], use_cache)
+        return quotes[0] if quotes else None
+
+    def watch(self, symbols: Optional[list[str]] = None, interval: Optional[float] = None,
+              snapshot_every: float = 0) -> Iterator[dict]:
+        """Poll quotes and yield change events: one snapshot, then deltas.
+
+        Every event is ``{"seq", "type", "time", "quotes"}``. The first is a
+        ``"snapshot"`` holding every quote; after that, ``"delta"`` events
+        carry only quotes whose price or 24h change moved, and polls with
+        no movement yield nothing. ``seq`` grows by one per event so
+        consumers can spot gaps. With ``snapshot_every`` > 0 a full
+        snapshot is re-sent that often for late joiners.
+
+        Polls every ``interval`` seconds (default: ``config.watch_interval``)
+        through the cache, so upstream traffic still follows the cache TTL
+        or refresh schedule.
+        """
+        interval = self.config.watch_interval if interval is None else interval
+        last: dict[str, tuple[float, float]] = {}
+        seq = 0
+        next_snapshot = time.monotonic()
+
+        while True:
+            started = time.monotonic()
+            quotes = self.get_quotes(symbols) if symbols else self.get_all_quotes()
+
+            if started >= next_snapshot:
+                kind, changed = "snapshot", quotes
+                next_snapshot = started + snapshot_every if snapshot_every > 0 else float("inf")
+            else:
+                kind = "delta"
+                changed = [q for q in quotes if last.get(q.symbol) != (q.price, q.change_24h)]
+            last.update((q.symbol, (q.price, q.change_24h)) for q in quotes)
+
+            if changed or kind == "snapshot":
+                seq += 1
+                yield {"seq": seq, "type": kind, "time": time.time(), "quotes": [q.to_dict() for q in changed]}
+
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    @TRACER.traced("history.fetch")
+    def _fetch_history(self, request: HistoryRequest, size: Optional[int] = None) -> HistoricalData:
+        """Fetch a full window, or ``size`` candles/days, from upstream."""
+        if request.source == "twelvedata":
+            return self.twelvedata.fetch_historical(request.symbol, request.window, outputsize=size)
+        return self.coingecko.fetch_historical(request.symbol, size or request.days, request.interval)
+
+    def _stored_historical(self, request: HistoryRequest) -> HistoricalData:
+        """Serve history from the candle store, fetching only what is missing."""
+        lock = self.candles.lock(request.symbol, request.interval)
+        if not lock.acquire(self.config.lock_timeout):
+            # merge() rewrites column files in place, so never write the series unlocked
+            logger.warning(f"Timed out waiting for lock on {request.symbol} {request.interval} history; "
+                           f"fetching without storing")
+            now = time.time()
+            data = self._fetch_history(request)
+            return request.to_historical(request.select(data.candles.sorted(), now))
+        try:
+            now = time.time()
+            meta = self.candles.meta(request.symbol, request.interval)
+            if not request.covered_by(meta, now):
+                # Fetch the longest window on this interval; shorter ones are then slices of it
+                widest = request.widest()
+                data = self._fetch_history(widest)
+                self.candles.merge(request.symbol, request.interval, data.candles,
+                                   exhausted=widest.is_exhausted(data, now))
+            elif now - meta.get("fetched_at", 0) > request.ttl:
+                # A None size refetches the whole widest window
+                data = self._fetch_history(request.widest(), request.tail_size(meta, now))
+                self.candles.merge(request.symbol, request.interval, data.candles)
+            # Under the lock: merge rewrites column files in place
+            candles = self.candles.read(request.symbol, request.interval, since=request.start(now))
+        finally:
+            lock.release()
+
+        with TRACER.span("history.select"):
+            return request.to_historical(request.select(candles, now))
+
+    @TRACER.traced("history.get")
+    def get_historical(self, symbol: str, window: str = "1M") -> Optional[HistoricalData]:
+        """Fetch historical data for a symbol.
+
+        With ``config.candle_store`` enabled, candles are persisted per
+        symbol and interval and later calls fetch only the missing tail.
+        """
+        symbol = symbol.upper()
+
+        if self.config.candle_store:
+            request = HistoryRequest.resolve(symbol, window)
+            if request is None:
+                logger.error(f"Unknown symbol: {symbol}")
+                return None
+            return self._stored_historical(request)
+
+        # Determine source
+        if symbol in STOCKS_ETFS or symbol in COMMODITIES:
+            return self.twelvedata.fetch_historical(symbol, window)
+        elif symbol in CRYPTO:
+            # Convert window to days for CoinGecko
+            days = CoinGeckoClient.WINDOW_DAYS.get(window, 30)
+            return self.coingecko.fetch_historical(symbol, days)
+        else:
+            logger.error(f"Unknown symbol: {symbol}")
+            return None
+
+    def export_prices_json(self, filepath: str = "prices.json") -> None:
+        """Export all prices to JSON file."""
+        quotes = self.get_all_quotes(use_cache=False)
+
+        output = {
+            "timestamp": datetime.now().isoformat(),
+            "count": len(quotes),
+            "prices": {}
+        }
+
+        for quote in quotes:
+            output["prices"][quote.symbol] = {
+                "name": quote.name,
+                "price": quote.price,
+                "change_24h": quote.change_24h,
+                "change_24h_usd": quote.change_24h_usd,
+                "high_24h": quote.high_24h,
+                "low_24h": quote.low_24h,
+                "volume_24h": quote.volume_24h,
+                "market_cap": quote.market_cap,
+                "source": quote.source,
+                "type": quote.asset_type
+            }
+
+        with open(filepath, "w") as f:
+            json.dump(output, f, indent=2)
+
+        logger.info(f"Exported {len(quotes)} prices to {filepath}")
+
+    def clear_cache(self) -> None:
+        """Clear the price cache."""
+        self.cache.clear()
+        self.candles.clear()
+        if self.board is not None:
+            self.board.clear()
+        logger.info("Cache cleared")
+
+
+# =============================================================================
+# Asyncio Clients
+# =============================================================================
+
+class _AsyncClient:
+    """Shared aiohttp plumbing for the asyncio API clients.
+
+    Requests are bounded by a semaphore of ``config.max_concurrency`` slots;
+    backoff uses ``asyncio.sleep`` and holds no slot, so cancelling a caller
+    cancels its pending request or sleep without blocking the event loop.
+    """
+
+    BASE_URL = ""
+    PROVIDER = ""
+
+    def __init__(self, config: Config):
+        if aiohttp is None:
+            raise ImportError("'aiohttp' package not installed. Run: pip install aiohttp")
+        self.config = config
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """Create the session lazily so it binds to the running event loop."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers={
+                    "Accept": "application/json",
+                    "User-Agent": "InsiderTrading-PriceFetcher/1.0"
+                },
+                timeout=aiohttp.ClientTimeout(total=self.config.request_timeout),
+                trace_configs=[TRACER.aiohttp_trace_config()] if TRACER.enabled else None
+            )
+            self._semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        return self._session
+
+    async def close(self) -> None:
+        """Close the underlying HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _get(self, endpoint: str, params: dict) -> tuple[int, dict, object]:
+        """Perform one GET; returns (status, headers, decoded JSON body).
+
+        The body is None only for a 429; an empty or non-JSON body raises
+        ``aiohttp.ClientPayloadError`` so callers retry it.
+
+        Latency (excluding the wait for a concurrency slot) and status are
+        recorded in METRICS.
+        """
+        session = self._get_session()
+        async with self._semaphore:
+            started = time.perf_counter()
+            status = "error"
+            try:
+                with TRACER.span("http.get", self.PROVIDER, endpoint=_endpoint_label(endpoint)):
+                    async with session.get(f"{_base_url(self)}/{endpoint}", params=params) as response:
+                        status = response.status
+                        if response.status == 429:
+                            return response.status, dict(response.headers), None
+                        response.raise_for_status()
+                        body = await response.read()
+                with TRACER.span("http.decode", self.PROVIDER):
+                    # Like the sync response.json(): an empty or malformed body is retried
+                    try:
+                        data = json.loads(body)
+                    except ValueError as e:
+                        raise aiohttp.ClientPayloadError(f"Invalid JSON body: {e}") from e
+                return status, dict(response.headers), data
+            finally:
+                METRICS.record_request(self.PROVIDER, endpoint, status, time.perf_counter() - started)
+
+
+class AsyncTwelveDataClient(_AsyncClient):
+    """Asyncio client for TwelveData API - Stocks, ETFs, Commodities."""
+
+    BASE_URL = TwelveDataClient.BASE_URL
+    PROVIDER = TwelveDataClient.PROVIDER
+    INTERVALS = TwelveDataClient.INTERVALS
+
+    def __init__(self, api_key: str, config: Config):
+        super().__init__(config)
+        self.api_key = api_key
+        self.limiter = TokenBucket.for_provider(config, "twelvedata")
+
+    async def _request(self, endpoint: str, params: dict, credits: int = 1) -> dict:
+        """Make API request with retry logic."""
+        params = {**params, "apikey": self.api_key}
+
+        last_error = None
+        for attempt in range(self.config.max_retries):
+            if attempt:
+                METRICS.inc("retries_total", provider=self.PROVIDER, endpoint=endpoint)
+            if self.limiter:
+                with METRICS.timer("stage_seconds", component=self.PROVIDER, stage="rate_limit"):
+                    await self.limiter.acquire_async(credits)
+            try:
+                status, headers, data = await self._get(endpoint, params)
+                if status == 429:
+                    if self.limiter:
+                        retry_after = int(headers.get("Retry-After", 60))
+                        logger.warning(f"Rate limited. Backing off {retry_after}s...")
+                        await self.limiter.penalize_async(retry_after)
+                        last_error = RateLimitExceeded(f"{self.PROVIDER} {endpoint} rate limited (429)")
+                        continue
+                    raise aiohttp.ClientResponseError(None, (), status=429, message="Too Many Requests")
+                METRICS.inc("credits_total", credits, provider=self.PROVIDER)
+
+                # Check for API-level errors
+                if not isinstance(data, dict):
+                    raise aiohttp.ClientPayloadError(f"Unexpected response body: {type(data).__name__}")
+                if data.get("status") == "error":
+                    raise ValueError(data.get("message", "Unknown API error"))
+
+                return data
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+                logger.warning(f"Attempt {attempt + 1} failed: {e}")
+                if attempt < self.config.max_retries - 1:
+                    await asyncio.sleep(self.config.retry_delay * (2 ** attempt))
+
+        raise last_error or Exception("All retry attempts failed")
+
+    async def get_quote(self, symbol: str) -> dict:
+        """Get real-time quote for a symbol."""
+        return await self._request("quote", {"symbol": symbol})
+
+    async def _get_quote_batch(self, symbols: list[str]) -> dict:
+        """Request one batch of quotes, keyed by symbol."""
+        data = await self._request("quote", {"symbol": ",".join(symbols)}, credits=len(symbols))
+        return TwelveDataClient._normalize_batch(data, symbols)
+
+    async def get_quotes(self, symbols: list[str]) -> dict:
+        """Get multiple quotes at once, batched like TwelveDataClient.get_quotes."""
+        chunks = TwelveDataClient._chunks(symbols, self.config.twelvedata_batch_size)
+        if len(chunks) == 1:
+            return await self._get_quote_batch(symbols)
+
+        results = await asyncio.gather(*(self._get_quote_batch(c) for c in chunks), return_exceptions=True)
+        for result in results:
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+        return TwelveDataClient._merge_chunks(chunks, results)
+
+    async def get_time_series(self, symbol: str, interval: str, outputsize: int) -> dict:
+        """Get historical time series data."""
+        return await self._request("time_series", {
+            "symbol": symbol,
+            "interval": interval,
+            "outputsize": outputsize
+        })
+
+    async def fetch_stock_quotes(self) -> list[PriceQuote]:
+        """Fetch quotes for all stocks and ETFs."""
+        if not self.api_key:
+            raise ValueError("TWELVE_DATA_API_KEY not configured")
+
+        symbols = [info["twelvedata"] for info in STOCKS_ETFS.values()]
+        return TwelveDataClient._build_quotes(await self.get_quotes(symbols), STOCKS_ETFS)
+
+    async def fetch_commodity_quotes(self) -> list[PriceQuote]:
+        """Fetch quotes for all commodities."""
+        if not self.api_key:
+            raise ValueError("TWELVE_DATA_API_KEY not configured")
+
+        symbols = [info["twelvedata"] for info in COMMODITIES.values()]
+        return TwelveDataClient._build_quotes(await self.get_quotes(symbols), COMMODITIES,
+                                              change_decimals=4, with_volume=False)
+
+    async def fetch_historical(self, symbol: str, window: str = "1M",
+                               outputsize: Optional[int] = None) -> HistoricalData:
+        """Fetch historical price data for a symbol."""
+        if not self.api_key:
+            raise ValueError("TWELVE_DATA_API_KEY not configured")
+
+        asset_info, interval, window_size = TwelveDataClient._resolve_historical(symbol, window)
+        outputsize = outputsize or window_size
+        data = await self.get_time_series(asset_info["twelvedata"], interval, outputsize)
+        return TwelveDataClient._build_historical(symbol, asset_info, interval, data)
+
+
+class AsyncCoinGeckoClient(_AsyncClient):
+    """Asyncio client for CoinGecko API - Cryptocurrencies."""
+
+    BASE_URL = CoinGeckoClient.BASE_URL
+    PROVIDER = CoinGeckoClient.PROVIDER
+
+    def __init__(self, config: Config):
+        super().__init__(config)
+        self.limiter = TokenBucket.for_provider(config, "coingecko")
+
+    async def _request(self, endpoint: str, params: dict = None) -> dict:
+        """Make API request with retry logic."""
+        last_error = None
+        for attempt in range(self.config.max_retries):
+            if attempt:
+                METRICS.inc("retries_total", provider=self.PROVIDER, endpoint=_endpoint_label(endpoint))
+            if self.limiter:
+                with METRICS.timer("stage_seconds", component=self.PROVIDER, stage="rate_limit"):
+                    await self.limiter.acquire_async()
+            try:
+                status, headers, data = await self._get(endpoint, params or {})
+
+                # Handle rate limiting
+                if status == 429:
+                    retry_after = int(headers.get("Retry-After", 60))
+                    if self.limiter:
+                        logger.warning(f"Rate limited. Backing off {retry_after}s...")
+                        await self.limiter.penalize_async(retry_after)
+                    else:
+                        logger.warning(f"Rate limited. Waiting {retry_after}s...")
+                        await asyncio.sleep(retry_after)
+                    last_error = RateLimitExceeded(f"{self.PROVIDER} {endpoint} rate limited (429)")
+                    continue
+
+                return data
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+                logger.warning(f"Attempt {attempt + 1} failed: {e}")
+                if attempt < self.config.max_retries - 1:
+                    await asyncio.sleep(self.config.retry_delay * (2 ** attempt))
+
+        raise last_error or Exception("All retry attempts failed")
+
+    async def get_markets(self, per_page: Optional[int] = None) -> list:
+        """Get ``coins/markets`` rows for all tracked coins, pages in parallel."""
+        pages = CoinGeckoClient._markets_pages(per_page or self.config.coingecko_page_size)
+        if len(pages) == 1:
+            return await self._request("coins/markets", pages[0])
+
+        results = await asyncio.gather(*(self._request("coins/markets", p) for p in pages),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+        return CoinGeckoClient._merge_pages(results)
+
+    async def fetch_crypto_quotes(self, per_page: Optional[int] = None) -> list[PriceQuote]:
+        """Fetch quotes for all cryptocurrencies."""
+        return CoinGeckoClient._build_quotes(await self.get_markets(per_page))
+
+    async def fetch_historical(self, symbol: str, days: int = 30, interval: Optional[str] = None) -> HistoricalData:
+        """Fetch historical price data for a cryptocurrency."""
+        asset_info = CRYPTO.get(symbol)
+        if not asset_info:
+            raise ValueError(f"Unknown crypto symbol: {symbol}")
 
-        return HistoricalData(
-            symbol=symbol,
-            name=asset_info["name"],
-            candles=candles,
-            interval="1day" if days > 1 else "1hour",
-            source="coingecko"
-        )
+        data = await self._request(f"coins/{asset_info['coingecko_id']}/market_chart",
+                                   CoinGeckoClient._chart_params(days, interval))
+        return CoinGeckoClient._build_historical(symbol, asset_info, days, data, interval)
 
 
-# =============================================================================
-# Price Fetcher - Main Interface
-# =============================================================================
+class AsyncPriceFetcher:
+    """Asyncio counterpart of PriceFetcher.
 
-class PriceFetcher:
-    """Main interface for fetching price data from all sources."""
+    Usage:
+        async with AsyncPriceFetcher() as fetcher:
+            quotes = await fetcher.get_all_quotes()
+    """
 
     def __init__(self, config: Optional[Config] = None):
         self.config = config or Config.from_env()
-        self.cache = CacheManager(
+        self.cache = CACHE_BACKENDS[self.config.cache_format](
             self.config.cache_dir,
-            self.config.cache_ttl_seconds
+            self.config.cache_ttl_seconds,
+            self.config.memory_cache_entries,
+            self.config.cache_hard_ttl_seconds,
+            self.config.cache_max_bytes,
+            self.config.cache_max_entries
         )
-        self.twelvedata = TwelveDataClient(
+        self.scheduler = RefreshScheduler(self.cache) if self.config.refresh_mode == "market" else None
+        METRICS.configure(self.config)
+        self.twelvedata = AsyncTwelveDataClient(
             self.config.twelvedata_api_key,
             self.config
         )
-        self.coingecko = CoinGeckoClient(self.config)
+        self.coingecko = AsyncCoinGeckoClient(self.config)
+        self._flight = AsyncSingleFlight()
+        self._category_fetchers = {
+            "stock_quotes": self.twelvedata.fetch_stock_quotes,
+            "commodity_quotes": self.twelvedata.fetch_commodity_quotes,
+            "crypto_quotes": self.coingecko.fetch_crypto_quotes,
+        }
+        self._background: set[asyncio.Task] = set()
+        self.candles = self.cache.candle_store()
+        self.board = QuoteBoard(Path(self.config.cache_dir) / QUOTE_BOARD_NAME) if self.config.quote_board else None
+
+    async def __aenter__(self) -> "AsyncPriceFetcher":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Cancel background refreshes and close both client sessions."""
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        await asyncio.gather(self.twelvedata.close(), self.coingecko.close())
+        if self.board is not None:
+            self.board.close()
+
+    async def _fetch_category(self, fetch, category: str, count: int) -> list[PriceQuote]:
+        """Await a category fetch, logging and swallowing failures."""
+        try:
+            with TRACER.span("quotes.category", category=category):
+                quotes = await fetch()
+            logger.info(f"Fetched {count} {category} quotes")
+            return quotes
+        except Exception as e:
+            logger.error(f"Failed to fetch {category} quotes: {e}")
+            return []
 
-    def get_all_quotes(self, use_cache: bool = True) -> list[PriceQuote]:
-        """Fetch quotes for all assets."""
-        cache_key = "all_quotes"
+    async def _fill_cache(self, cache_key: str, fetch, blocking: bool = True) -> Optional[list[PriceQuote]]:
+        """Fetch and cache quotes while holding the cross-process lock for the key.
 
-        if use_cache:
-            cached = self.cache.get(cache_key)
+        With ``blocking=False``, returns None if another process holds the lock.
+        """
+        lock = self.cache.lock(cache_key)
+        if not blocking:
+            if not lock.try_acquire():
+                return None
+        elif not await lock.acquire_async(self.config.lock_timeout):
+            # Writing without the lock could interleave with the holder's write
+            logger.warning(f"Timed out waiting for lock on {cache_key}; fetching without caching")
+            with METRICS.timer("refresh_seconds", key=cache_key), TRACER.span("quotes.refresh", key=cache_key):
+                return await fetch()
+        try:
+            # Another process may have refreshed the entry while we waited
+            cached = await asyncio.to_thread(self.cache.get_quotes, cache_key)
             if cached:
-                logger.info("Returning cached quotes")
-                return [PriceQuote(**q) for q in cached]
+                return cached
 
-        quotes = []
+            with METRICS.timer("refresh_seconds", key=cache_key), TRACER.span("quotes.refresh", key=cache_key):
+                quotes = await fetch()
+            if quotes:
+                await asyncio.to_thread(self._store_quotes, cache_key, quotes)
+            return quotes
+        finally:
+            lock.release()
 
-        # Fetch from TwelveData (stocks, ETFs, commodities)
-        if self.config.twelvedata_api_key:
-            try:
-                quotes.extend(self.twelvedata.fetch_stock_quotes())
-                logger.info(f"Fetched {len(STOCKS_ETFS)} stock/ETF quotes")
-            except Exception as e:
-                logger.error(f"Failed to fetch stock quotes: {e}")
+    def _store_quotes(self, cache_key: str, quotes: list[PriceQuote]) -> None:
+        """Write fetched quotes to the cache and board.
+
+        Blocks on file locks and I/O, so callers run it with ``asyncio.to_thread``.
+        """
+        self.cache.set_quotes(cache_key, quotes)
+        if self.board is not None:
+            self.board.publish(quotes)
 
+    def _revalidate(self, cache_key: str, fetch) -> None:
+        """Refresh a stale entry in a background task, at most once per key."""
+        if self._flight.in_flight(cache_key):
+            return
+
+        async def refresh():
             try:
-                quotes.extend(self.twelvedata.fetch_commodity_quotes())
-                logger.info(f"Fetched {len(COMMODITIES)} commodity quotes")
+                await self._flight.do(cache_key, lambda: self._fill_cache(cache_key, fetch, blocking=False))
             except Exception as e:
-                logger.error(f"Failed to fetch commodity quotes: {e}")
-        else:
-            logger.warning("TwelveData API key not configured - skipping stocks/commodities")
+                logger.warning(f"Background refresh of {cache_key} failed: {e}")
 
-        # Fetch from CoinGecko (crypto)
-        try:
-            quotes.extend(self.coingecko.fetch_crypto_quotes())
-            logger.info(f"Fetched {len(CRYPTO)} crypto quotes")
-        except Exception as e:
-            logger.error(f"Failed to fetch crypto quotes: {e}")
+        task = asyncio.ensure_future(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
 
-        # Cache results
-        if quotes and use_cache:
-            self.cache.set(cache_key, [q.to_dict() for q in quotes])
+    async def _cached_quotes(self, cache_key: str, fetch, use_cache: bool) -> list[PriceQuote]:
+        """Return cached quotes for ``cache_key`` or fetch them (coalesced per key).
 
-        return quotes
+        Stale entries are returned immediately and refreshed in the background.
+        """
+        if not use_cache:
+            return await fetch()
+
+        # Reads can wait on file locks (e.g. the index or a SQLite writer)
+        entry = await asyncio.to_thread((self.scheduler or self.cache).lookup_quotes, cache_key)
+        METRICS.inc("cache_lookups_total", key=cache_key,
+                    result="miss" if entry is None else "stale" if entry[1] else "fresh")
+        if entry:
+            quotes, stale = entry
+            if stale:
+                self._revalidate(cache_key, fetch)
+            return quotes
+
+        return list(await self._flight.do(cache_key, lambda: self._fill_cache(cache_key, fetch)))
+
+    @TRACER.traced("quotes.all")
+    async def get_all_quotes(self, use_cache: bool = True) -> list[PriceQuote]:
+        """Fetch quotes for all assets, running each category concurrently."""
+        if self.scheduler is not None:
+            return await self._scheduled_all_quotes(use_cache)
+
+        return await self._cached_quotes("all_quotes", self._fetch_all_quotes, use_cache)
+
+    async def _fetch_all_quotes(self) -> list[PriceQuote]:
+        """Fetch every category from upstream and merge the results."""
+        categories = []
+        if self.config.twelvedata_api_key:
+            categories.append((self.twelvedata.fetch_stock_quotes, "stock/ETF", len(STOCKS_ETFS)))
+            categories.append((self.twelvedata.fetch_commodity_quotes, "commodity", len(COMMODITIES)))
+        else:
+            logger.warning("TwelveData API key not configured - skipping stocks/commodities")
+        categories.append((self.coingecko.fetch_crypto_quotes, "crypto", len(CRYPTO)))
 
-    def get_stock_quotes(self, use_cache: bool = True) -> list[PriceQuote]:
-        """Fetch quotes for stocks and ETFs only."""
-        cache_key = "stock_quotes"
+        results = await asyncio.gather(*(self._fetch_category(*c) for c in categories))
+        return [q for result in results for q in result]
 
-        if use_cache:
-            cached = self.cache.get(cache_key)
-            if cached:
-                return [PriceQuote(**q) for q in cached]
+    async def _scheduled_all_quotes(self, use_cache: bool) -> list[PriceQuote]:
+        """Merge per-category quotes, each refreshed on its own market schedule."""
+        categories = [("stock_quotes", "stock/ETF"), ("commodity_quotes", "commodity"), ("crypto_quotes", "crypto")]
+        if not self.config.twelvedata_api_key:
+            logger.warning("TwelveData API key not configured - skipping stocks/commodities")
+            categories = categories[2:]
 
-        quotes = self.twelvedata.fetch_stock_quotes()
+        def fetch(cache_key, label):
+            upstream = self._category_fetchers[cache_key]
+            count = len(QUOTE_CATEGORIES[cache_key])
+            return self._cached_quotes(cache_key, lambda: self._fetch_category(upstream, label, count), use_cache)
 
-        if quotes and use_cache:
-            self.cache.set(cache_key, [q.to_dict() for q in quotes])
+        results = await asyncio.gather(*(fetch(*c) for c in categories))
+        return [q for result in results for q in result]
 
-        return quotes
+    async def get_stock_quotes(self, use_cache: bool = True) -> list[PriceQuote]:
+        """Fetch quotes for stocks and ETFs only."""
+        return await self._cached_quotes("stock_quotes", self.twelvedata.fetch_stock_quotes, use_cache)
 
-    def get_commodity_quotes(self, use_cache: bool = True) -> list[PriceQuote]:
+    async def get_commodity_quotes(self, use_cache: bool = True) -> list[PriceQuote]:
         """Fetch quotes for commodities only."""
-        cache_key = "commodity_quotes"
-
-        if use_cache:
-            cached = self.cache.get(cache_key)
-            if cached:
-                return [PriceQuote(**q) for q in cached]
-
-        quotes = self.twelvedata.fetch_commodity_quotes()
+        return await self._cached_quotes("commodity_quotes", self.twelvedata.fetch_commodity_quotes, use_cache)
 
-        if quotes and use_cache:
-            self.cache.set(cache_key, [q.to_dict() for q in quotes])
-
-        return quotes
-
-    def get_crypto_quotes(self, use_cache: bool = True) -> list[PriceQuote]:
+    async def get_crypto_quotes(self, use_cache: bool = True) -> list[PriceQuote]:
         """Fetch quotes for cryptocurrencies only."""
-        cache_key = "crypto_quotes"
+        return await self._cached_quotes("crypto_quotes", self.coingecko.fetch_crypto_quotes, use_cache)
 
-        if use_cache:
-            cached = self.cache.get(cache_key)
-            if cached:
-                return [PriceQuote(**q) for q in cached]
+    @TRACER.traced("quotes.get")
+    async def get_quotes(self, symbols: list[str], use_cache: bool = True) -> list[PriceQuote]:
+        """Fetch quotes for several symbols, in request order (see PriceFetcher.get_quotes)."""
+        known, found, missing, stale = await asyncio.to_thread(
+            _plan_quote_lookup, self.scheduler or self.cache, symbols, use_cache
+        )
 
-        quotes = self.coingecko.fetch_crypto_quotes()
+        for cache_key in stale:
+            self._revalidate(cache_key, self._category_fetchers[cache_key])
 
-        if quotes and use_cache:
-            self.cache.set(cache_key, [q.to_dict() for q in quotes])
+        results = await asyncio.gather(*(
+            self._cached_quotes(cache_key, self._category_fetchers[cache_key], use_cache)
+            for cache_key in sorted(missing)
+        ))
 
-        return quotes
+        wanted = set(known)
+        for quotes in results:
+            found.update((q.symbol, q) for q in quotes if q.symbol in wanted)
 
-    def get_quote(self, symbol: str, use_cache: bool = True) -> Optional[PriceQuote]:
+        return [found[s] for s in known if s in found]
+
+    async def get_quote(self, symbol: str, use_cache: bool = True) -> Optional[PriceQuote]:
         """Fetch quote for a single symbol."""
+        quotes = await self.get_quotes([symbol], use_cache)
+        return quotes[0] if quotes else None
+
+    @TRACER.traced("history.fetch")
+    async def _fetch_history(self, request: HistoryRequest, size: Optional[int] = None) -> HistoricalData:
+        """Fetch a full window, or ``size`` candles/days, from upstream."""
+        if request.source == "twelvedata":
+            return await self.twelvedata.fetch_historical(request.symbol, request.window, outputsize=size)
+        return await self.coingecko.fetch_historical(request.symbol, size or request.days, request.interval)
+
+    async def _stored_historical(self, request: HistoryRequest) -> HistoricalData:
+        """Serve history from the candle store, fetching only what is missing."""
+        lock = self.candles.lock(request.symbol, request.interval)
+        if not await lock.acquire_async(self.config.lock_timeout):
+            # merge() rewrites column files in place, so never write the series unlocked
+            logger.warning(f"Timed out waiting for lock on {request.symbol} {request.interval} history; "
+                           f"fetching without storing")
+            now = time.time()
+            data = await self._fetch_history(request)
+            return request.to_historical(request.select(data.candles.sorted(), now))
+        try:
+            # Store I/O runs in worker threads to keep the event loop free
+            now = time.time()
+            meta = await asyncio.to_thread(self.candles.meta, request.symbol, request.interval)
+            if not request.covered_by(meta, now):
+                # Fetch the longest window on this interval; shorter ones are then slices of it
+                widest = request.widest()
+                data = await self._fetch_history(widest)
+                await asyncio.to_thread(self.candles.merge, request.symbol, request.interval, data.candles,
+                                        exhausted=widest.is_exhausted(data, now))
+            elif now - meta.get("fetched_at", 0) > request.ttl:
+                # A None size refetches the whole widest window
+                data = await self._fetch_history(request.widest(), request.tail_size(meta, now))
+                await asyncio.to_thread(self.candles.merge, request.symbol, request.interval, data.candles)
+            # Under the lock: merge rewrites column files in place
+            candles = await asyncio.to_thread(self.candles.read, request.symbol, request.interval,
+                                              since=request.start(now))
+        finally:
+            lock.release()
+
+        with TRACER.span("history.select"):
+            return request.to_historical(request.select(candles, now))
+
+    @TRACER.traced("history.get")
+    async def get_historical(self, symbol: str, window: str = "1M") -> Optional[HistoricalData]:
+        """Fetch historical data for a symbol."""
         symbol = symbol.upper()
 
-        # Determine source based on asset type
+        if self.config.candle_store:
+            request = HistoryRequest.resolve(symbol, window)
+            if request is None:
+                logger.error(f"Unknown symbol: {symbol}")
+                return None
+            return await self._stored_historical(request)
+
         if symbol in STOCKS_ETFS or symbol in COMMODITIES:
-            quotes = self.get_stock_quotes(use_cache) if symbol in STOCKS_ETFS else self.get_commodity_quotes(use_cache)
+            return await self.twelvedata.fetch_historical(symbol, window)
         elif symbol in CRYPTO:
-            quotes = self.get_crypto_quotes(use_cache)
+            days = CoinGeckoClient.WINDOW_DAYS.get(window, 30)
+            return await self.coingecko.fetch_historical(symbol, days)
         else:
             logger.error(f"Unknown symbol: {symbol}")
             return None
 
-        for quote in quotes:
-            if quote.symbol == symbol:
-                return quote
 
-        return None
+# =============================================================================
+# Local Server
+# =============================================================================
 
-    def get_historical(self, symbol: str, window: str = "1M") -> Optional[HistoricalData]:
-        """Fetch historical data for a symbol."""
-        symbol = symbol.upper()
+class PriceRequestHandler:
+    """JSON API over a warm PriceFetcher.
 
-        # Determine source
-        if symbol in STOCKS_ETFS or symbol in COMMODITIES:
-            return self.twelvedata.fetch_historical(symbol, window)
-        elif symbol in CRYPTO:
-            # Convert window to days for CoinGecko
-            days_map = {"1D": 1, "1W": 7, "1M": 30, "3M": 90, "1Y": 365, "5Y": 1825}
-            days = days_map.get(window, 30)
-            return self.coingecko.fetch_historical(symbol, days)
-        else:
-            logger.error(f"Unknown symbol: {symbol}")
-            return None
+    Mixed into ``http.server.BaseHTTPRequestHandler`` by :func:`serve`, so
+    http.server is only imported by the command that needs it.
 
-    def export_prices_json(self, filepath: str = "prices.json") -> None:
-        """Export all prices to JSON file."""
-        quotes = self.get_all_quotes(use_cache=False)
+    Routes:
+        GET /health
+        GET /quotes[?category=all|stocks|commodities|crypto][&symbols=BTC,AAPL]
+        GET /quote/<symbol>
+        GET /history/<symbol>[?window=1M]
+        GET /metrics (Prometheus text)
+    """
 
-        output = {
-            "timestamp": datetime.now().isoformat(),
-            "count": len(quotes),
-            "prices": {}
-        }
+    server_version = "InsiderTrading-PriceFetcher/1.0"
+    protocol_version = "HTTP/1.1"  # Keep-alive for repeat callers
 
-        for quote in quotes:
-            output["prices"][quote.symbol] = {
-                "name": quote.name,
-                "price": quote.price,
-                "change_24h": quote.change_24h,
-                "change_24h_usd": quote.change_24h_usd,
-                "high_24h": quote.high_24h,
-                "low_24h": quote.low_24h,
-                "volume_24h": quote.volume_24h,
-                "market_cap": quote.market_cap,
-                "source": quote.source,
-                "type": quote.asset_type
-            }
+    @property
+    def fetcher(self) -> "PriceFetcher":
+        return self.server.fetcher
 
-        with open(filepath, "w") as f:
-            json.dump(output, f, indent=2)
+    def setup(self) -> None:
+        # Headers and body go out as separate writes; without TCP_NODELAY,
+        # keep-alive callers stall ~40ms per request on delayed ACKs.
+        # Only TCP peers have a (host, port) address - Unix sockets have no Nagle.
+        self.disable_nagle_algorithm = isinstance(self.client_address, tuple)
+        super().setup()
 
-        logger.info(f"Exported {len(quotes)} prices to {filepath}")
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else "unix"
 
-    def clear_cache(self) -> None:
-        """Clear the price cache."""
-        self.cache.clear()
-        logger.info("Cache cleared")
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload) -> None:
+        self._send(status, json.dumps(payload).encode(), "application/json")
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split("/") if p]
+
+        try:
+            if parts == ["health"]:
+                self._send_json(200, {"status": "ok"})
+            elif parts == ["metrics"]:
+                self._send(200, METRICS.totals().render_prometheus().encode(), "text/plain; version=0.0.4")
+            elif parts == ["quotes"]:
+                self._send_json(200, [q.to_dict() for q in self._quotes(query)])
+            elif len(parts) == 2 and parts[0] == "quote":
+                quote = self.fetcher.get_quote(parts[1])
+                if quote:
+                    self._send_json(200, quote.to_dict())
+                else:
+                    self._send_json(404, {"error": f"Symbol not found: {parts[1]}"})
+            elif len(parts) == 2 and parts[0] == "history":
+                window = query.get("window", "1M")
+                if window not in TwelveDataClient.INTERVALS:
+                    self._send_json(400, {"error": f"Unknown window: {window}"})
+                    return
+                data = self.fetcher.get_historical(parts[1], window)
+                if data:
+                    self._send_json(200, data.to_dict())
+                else:
+                    self._send_json(404, {"error": f"Could not fetch historical data for: {parts[1]}"})
+            else:
+                self._send_json(404, {"error": f"Unknown route: {url.path}"})
+        except Exception as e:
+            logger.error(f"Error serving {self.path}: {e}")
+            self._send_json(500, {"error": str(e)})
+
+    def _quotes(self, query: dict) -> list[PriceQuote]:
+        if "symbols" in query:
+            return self.fetcher.get_quotes([s for s in query["symbols"].split(",") if s])
+
+        category = query.get("category", "all")
+        if category == "stocks":
+            return self.fetcher.get_stock_quotes()
+        if category == "commodities":
+            return self.fetcher.get_commodity_quotes()
+        if category == "crypto":
+            return self.fetcher.get_crypto_quotes()
+        return self.fetcher.get_all_quotes()
+
+
+def serve(fetcher: "PriceFetcher", host: str = "127.0.0.1", port: int = 8787,
+          socket_path: Optional[str] = None) -> None:
+    """Serve ``fetcher`` over localhost HTTP, or a Unix socket if ``socket_path`` is set."""
+    import socketserver
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    handler = type("PriceRequestHandler", (PriceRequestHandler, BaseHTTPRequestHandler), {})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = socketserver.ThreadingUnixStreamServer(socket_path, handler)
+        server.daemon_threads = True
+        where = f"unix:{socket_path}"
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        where = f"http://{host}:{server.server_address[1]}"
+
+    server.fetcher = fetcher
+    logger.info(f"Serving prices on {where}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# =============================================================================
+# Startup Budget
+# =============================================================================
+
+# Wall-clock cost of a CLI call over a bare interpreter (median of several runs).
+# Scripts call the CLI in tight loops, so this is checked like a regression.
+# Most of it is compiling this file, which Python doesn't cache for a script
+# run directly; heavy imports are caught by the DEFERRED_MODULES check instead.
+STARTUP_BUDGET_MS = 250
+
+# Must stay off the import path of commands that make no API calls
+DEFERRED_MODULES = ("requests", "aiohttp", "numpy", "asyncio", "http.server", "sqlite3")
+
+STARTUP_CHECK_COMMANDS = (["list"], ["cache"])
+
+
+def check_startup(budget_ms: float = STARTUP_BUDGET_MS, runs: int = 5) -> list[str]:
+    """Time offline CLI commands in fresh interpreters and return any budget violations.
+
+    Each run is paired with a bare interpreter run so load changes during
+    the check hit both sides, and the median difference is compared with
+    the budget. Each command is also run under ``-X importtime`` to catch
+    deferred dependencies creeping back onto the startup path.
+    """
+    import statistics
+    import subprocess
+
+    def run_ms(cmd: list[str]) -> float:
+        start = time.perf_counter()
+        subprocess.run(cmd, capture_output=True, check=True)
+        return (time.perf_counter() - start) * 1000
+
+    baseline = [sys.executable, "-c", "pass"]
+    problems = []
+    for command in STARTUP_CHECK_COMMANDS:
+        cmd = [sys.executable, os.path.abspath(__file__), *command]
+        label = " ".join(command)
+
+        overhead = statistics.median(run_ms(cmd) - run_ms(baseline) for _ in range(runs))
+        logger.info(f"startup '{label}': {overhead:.0f}ms over bare interpreter (budget {budget_ms:.0f}ms)")
+        if overhead > budget_ms:
+            problems.append(f"'{label}' took {overhead:.0f}ms over a bare interpreter (budget {budget_ms:.0f}ms)")
+
+        trace = subprocess.run([sys.executable, "-X", "importtime", *cmd[1:]],
+                               capture_output=True, text=True, check=True).stderr
+        loaded = {line.rsplit("|", 1)[-1].strip() for line in trace.splitlines()
+                  if line.startswith("import time:")}
+        for name in DEFERRED_MODULES:
+            if name in loaded:
+                problems.append(f"'{label}' imported {name} at startup")
+
+    return problems
 
 
 # =============================================================================
@@ -784,6 +4603,278 @@ def print_quotes_table(quotes: list[PriceQuote]) -> None:
     print(f"\nTotal: {len(quotes)} assets | Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
 
+def print_quote(quote: PriceQuote) -> None:
+    """Print one quote in detail."""
+    print(f"\n{quote.symbol} - {quote.name}")
+    print(f"Price: {format_price(quote.price)}")
+    print(f"24h Change: {format_change(quote.change_24h)} ({format_price(quote.change_24h_usd)})")
+    if quote.high_24h:
+        print(f"24h High: {format_price(quote.high_24h)}")
+    if quote.low_24h:
+        print(f"24h Low: {format_price(quote.low_24h)}")
+    if quote.volume_24h:
+        print(f"24h Volume: ${quote.volume_24h:,.0f}")
+    if quote.market_cap:
+        print(f"Market Cap: ${quote.market_cap:,.0f}")
+    print(f"Source: {quote.source}")
+
+
+def print_history(data: HistoricalData, window: str) -> None:
+    """Print a summary of a historical window."""
+    print(f"\n{data.symbol} - {data.name} ({window})")
+    print(f"Interval: {data.interval}")
+    print(f"Data points: {len(data.candles)}")
+    if data.candles:
+        first = data.candles[0]
+        last = data.candles[-1]
+        print(f"Range: {datetime.fromtimestamp(first.time)} to {datetime.fromtimestamp(last.time)}")
+        print(f"Open: {format_price(first.open)} -> Close: {format_price(last.close)}")
+        change = (last.close - first.open) / first.open * 100
+        print(f"Period Change: {format_change(change)}")
+
+
+def print_trace_summary(tracer: Tracer, file=sys.stderr) -> None:
+    """Print the per-stage time split of a profiled run, biggest self time first."""
+    elapsed = tracer.elapsed_ms()
+    print(f"\n{'Stage':<24} {'Count':>6} {'Self ms':>10} {'Self %':>7} {'Total ms':>10} {'Max ms':>9}", file=file)
+    print("-" * 71, file=file)
+    for entry in tracer.summary():
+        share = entry["self_ms"] / elapsed * 100 if elapsed else 0.0
+        print(f"{entry['name']:<24} {entry['count']:>6} {entry['self_ms']:>10.2f} {share:>6.1f}% "
+              f"{entry['total_ms']:>10.2f} {entry['max_ms']:>9.2f}", file=file)
+    print(f"\nWall time: {elapsed:.2f}ms (self % sums past 100% when stages run concurrently)", file=file)
+
+
+def print_cache_usage(usage: dict) -> None:
+    """Print cache entry count and size against the configured limits."""
+    max_bytes = f"{usage['max_bytes'] / 1e6:.1f} MB" if usage["max_bytes"] else "unbounded"
+    print(f"Entries: {usage['entries']} (limit {usage['max_entries'] or 'unbounded'})")
+    print(f"Size:    {usage['bytes'] / 1e6:.1f} MB (limit {max_bytes})")
+    print(f"Candles: {usage['candle_series']} series, {usage['candle_bytes'] / 1e6:.1f} MB (counted above)")
+
+
+def print_symbols() -> None:
+    """Print every supported symbol, grouped by provider."""
+    print("\nSupported Symbols:")
+    print("\n--- Stocks & ETFs (TwelveData) ---")
+    for symbol, info in sorted(STOCKS_ETFS.items()):
+        print(f"  {symbol:<10} {info['name']}")
+
+    print("\n--- Commodities (TwelveData) ---")
+    for symbol, info in sorted(COMMODITIES.items()):
+        print(f"  {symbol:<10} {info['name']}")
+
+    print("\n--- Cryptocurrencies (CoinGecko) ---")
+    for symbol, info in sorted(CRYPTO.items()):
+        print(f"  {symbol:<10} {info['name']}")
+
+    print(f"\nTotal: {len(ALL_ASSETS)} assets")
+
+
+def print_stats(metrics: Metrics) -> None:
+    """Print request, cache and stage metrics as tables."""
+    def ms(series, q):
+        value = Metrics.quantile(series, q)
+        return "-" if value is None else f"{value * 1000:.1f}"
+
+    def totals(name, *label_names):
+        result = {}
+        for labels, value in metrics.counters(name):
+            key = tuple(labels.get(n, "") for n in label_names)
+            result[key] = result.get(key, 0) + value
+        return result
+
+    requests_seen = metrics.histograms("request_seconds")
+    stages = metrics.histograms("stage_seconds") + metrics.histograms("refresh_seconds")
+    lookups = totals("cache_lookups_total", "key", "result")
+    if not (requests_seen or stages or lookups):
+        print("No metrics recorded yet")
+        return
+
+    print(f"\nMetrics since {datetime.fromtimestamp(metrics.since).strftime('%Y-%m-%d %H:%M:%S')}")
+
+    if requests_seen:
+        errors = {}
+        for labels, value in metrics.counters("requests_total"):
+            if not labels["status"].startswith("2"):
+                key = (labels["provider"], labels["endpoint"])
+                errors[key] = errors.get(key, 0) + value
+        retries = totals("retries_total", "provider", "endpoint")
+
+        print(f"\n{'Requests':<36} {'Count':>7} {'Errors':>7} {'Retries':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        print("-" * 88)
+        for labels, series in sorted(requests_seen, key=lambda s: (s[0]["provider"], s[0]["endpoint"])):
+            key = (labels["provider"], labels["endpoint"])
+            print(f"{' '.join(key):<36} {sum(series[:-1]):>7.0f} {errors.get(key, 0):>7.0f} "
+                  f"{retries.get(key, 0):>7.0f} {ms(series, 0.5):>9} {ms(series, 0.95):>9} {ms(series, 0.99):>9}")
+
+        limited = totals("rate_limited_total", "provider")
+        credits = totals("credits_total", "provider")
+        print(f"\n429 responses: {', '.join(f'{p} {n:.0f}' for (p,), n in sorted(limited.items())) or 'none'}"
+              f" | Credits: {', '.join(f'{p} {n:.0f}' for (p,), n in sorted(credits.items())) or 'none'}")
+
+    if lookups:
+        print(f"\n{'Cache lookups':<36} {'Fresh':>7} {'Stale':>7} {'Miss':>7} {'Hit ratio':>10}")
+        print("-" * 72)
+        for key in sorted({key for key, _ in lookups}):
+            fresh, stale, miss = (lookups.get((key, r), 0) for r in ("fresh", "stale", "miss"))
+            ratio = (fresh + stale) / (fresh + stale + miss) * 100
+            print(f"{key:<36} {fresh:>7.0f} {stale:>7.0f} {miss:>7.0f} {ratio:>9.1f}%")
+
+        reads = totals("cache_reads_total", "tier", "result")
+        tiers = sorted({tier for tier, _ in reads})
+        evictions = totals("cache_evictions_total", "reason")
+        print("\nCache tiers: " + " | ".join(
+            f"{tier} {reads.get((tier, 'hit'), 0):.0f} hit / {reads.get((tier, 'miss'), 0):.0f} miss" for tier in tiers)
+            + f" | Evicted: {evictions.get(('lru',), 0):.0f} LRU, {evictions.get(('expired',), 0):.0f} expired")
+
+    if stages:
+        print(f"\n{'Stages':<36} {'Count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Total s':>9}")
+        print("-" * 84)
+        for labels, series in sorted(stages, key=lambda s: sorted(s[0].items())):
+            name = " ".join(labels[k] for k in ("component", "stage") if k in labels) or f"refresh {labels['key']}"
+            print(f"{name:<36} {sum(series[:-1]):>7.0f} {ms(series, 0.5):>9} {ms(series, 0.95):>9} "
+                  f"{ms(series, 0.99):>9} {series[-1]:>9.2f}")
+
+
+def run_command(args: argparse.Namespace) -> None:
+    """Run the CLI command parsed by ``main``."""
+    # Commands that never touch the cache or APIs skip building a fetcher
+    if args.command == "list":
+        print_symbols()
+        return
+
+    if args.command == "board":
+        board = QuoteBoard(Path(Config.from_env().cache_dir) / QUOTE_BOARD_NAME)
+        quotes = list(board.snapshot().values())
+        if args.json:
+            print(json.dumps([q.to_dict() for q in quotes], indent=2))
+        else:
+            print_quotes_table(quotes)
+        return
+
+    if args.command == "stats":
+        metrics_path = Path(Config.from_env().cache_dir) / METRICS_FILE_NAME
+        if args.reset:
+            Metrics.clear_file(metrics_path)
+            print("Metrics reset")
+            return
+
+        metrics = Metrics.load(metrics_path)
+        if args.json:
+            dump = json.dumps(metrics.to_dict(), indent=2) + "\n"
+        elif args.prometheus:
+            dump = metrics.render_prometheus()
+        else:
+            print_stats(metrics)
+            return
+
+        if args.output:
+            # Replace atomically so scrapers (e.g. a textfile collector) never see partial output
+            output = Path(args.output)
+            fd, tmp_path = tempfile.mkstemp(dir=output.parent, prefix=".", suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                f.write(dump)
+            os.replace(tmp_path, output)
+        else:
+            sys.stdout.write(dump)
+        return
+
+    if args.command == "startup-check":
+        problems = check_startup(args.budget_ms, args.runs)
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        if problems:
+            sys.exit(1)
+        print("Startup within budget")
+        return
+
+    # Initialize fetcher
+    fetcher = PriceFetcher()
+
+    try:
+        if args.command == "quotes":
+            use_cache = not getattr(args, "no_cache", False)
+
+            if args.stocks:
+                quotes = fetcher.get_stock_quotes(use_cache)
+            elif args.crypto:
+                quotes = fetcher.get_crypto_quotes(use_cache)
+            elif args.commodities:
+                quotes = fetcher.get_commodity_quotes(use_cache)
+            else:  # --all or default
+                quotes = fetcher.get_all_quotes(use_cache)
+
+            with TRACER.span("output", "cli"):
+                if args.json:
+                    print(json.dumps([q.to_dict() for q in quotes], indent=2))
+                else:
+                    print_quotes_table(quotes)
+
+        elif args.command == "quote":
+            quote = fetcher.get_quote(args.symbol)
+            if quote:
+                with TRACER.span("output", "cli"):
+                    if args.json:
+                        print(json.dumps(quote.to_dict(), indent=2))
+                    else:
+                        print_quote(quote)
+            else:
+                print(f"Symbol not found: {args.symbol}")
+                sys.exit(1)
+
+        elif args.command == "history":
+            data = fetcher.get_historical(args.symbol, args.window)
+            if data:
+                with TRACER.span("output", "cli"):
+                    if args.json:
+                        print(json.dumps(data.to_dict(), indent=2))
+                    else:
+                        print_history(data, args.window)
+            else:
+                print(f"Could not fetch historical data for: {args.symbol}")
+                sys.exit(1)
+
+        elif args.command == "export":
+            fetcher.export_prices_json(args.filepath)
+            print(f"Prices exported to {args.filepath}")
+
+        elif args.command == "watch":
+            try:
+                for event in fetcher.watch(args.symbols, args.interval, args.snapshot_every):
+                    sys.stdout.write(json.dumps(event, separators=(",", ":")) + "\n")
+                    sys.stdout.flush()
+            except KeyboardInterrupt:
+                pass  # Keep stdout pure NDJSON: no "Aborted" line
+            except BrokenPipeError:
+                # The reader went away; silence the final flush at exit
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+        elif args.command == "serve":
+            serve(fetcher, args.host, args.port, args.socket)
+
+        elif args.command == "cache":
+            if args.clear:
+                fetcher.clear_cache()
+                print("Cache cleared")
+            elif args.expire:
+                removed = fetcher.cache.expire()
+                print(f"Removed {removed} expired cache entries")
+            elif args.sweep:
+                result = fetcher.cache.sweep()
+                print(f"Removed {result['expired']} expired and {result['evicted']} least recently used entries; "
+                      f"{result['entries']} entries, {result['bytes'] / 1e6:.1f} MB remain")
+            elif args.stats:
+                print_cache_usage(fetcher.cache.usage())
+
+    except KeyboardInterrupt:
+        print("\nAborted")
+        sys.exit(130)
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        sys.exit(1)
+
+
 def main():
     """Main CLI entry point."""
     parser = argparse.ArgumentParser(
@@ -799,8 +4890,19 @@ Examples:
   %(prog)s history BTC --window 1M   Fetch historical data
   %(prog)s export prices.json    Export all prices to JSON
   %(prog)s list                  List all supported symbols
+  %(prog)s watch BTC ETH         Stream quote changes as NDJSON
+  %(prog)s board                 Show quotes from the shared quote board
+  %(prog)s serve --port 8787     Serve quotes/history as JSON over HTTP
+  %(prog)s stats                 Show request latency, retry and cache metrics
+  %(prog)s startup-check         Check CLI startup time against its budget
+  %(prog)s --profile history BTC --window 5Y
+                                 Write a trace and print where the time went
         """
     )
+    parser.add_argument("--profile", action="store_true",
+                        help="Trace the command: write a Chrome trace file and print a per-stage summary to stderr")
+    parser.add_argument("--profile-output", default="price_fetcher.trace.json", metavar="PATH",
+                        help="Trace file for --profile (default: price_fetcher.trace.json)")
 
     subparsers = parser.add_subparsers(dest="command", help="Commands")
 
@@ -834,9 +4936,43 @@ Examples:
     # list command
     subparsers.add_parser("list", help="List all supported symbols")
 
+    # board command
+    board_parser = subparsers.add_parser("board", help="Show quotes from the shared quote board (no fetching)")
+    board_parser.add_argument("--json", action="store_true", help="Output as JSON")
+
+    # watch command
+    watch_parser = subparsers.add_parser("watch", help="Stream quote changes as NDJSON")
+    watch_parser.add_argument("symbols", nargs="*", help="Symbols to watch (default: all)")
+    watch_parser.add_argument("--interval", type=float, help="Seconds between polls (default: PRICE_WATCH_INTERVAL or 5)")
+    watch_parser.add_argument("--snapshot-every", type=float, default=0,
+                              help="Re-send a full snapshot every N seconds (default: only at start)")
+
+    # serve command
+    serve_parser = subparsers.add_parser("serve", help="Serve quotes and history over a local socket")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=8787, help="HTTP port (default: 8787)")
+    serve_parser.add_argument("--socket", help="Listen on this Unix domain socket instead of TCP")
+
     # cache command
     cache_parser = subparsers.add_parser("cache", help="Cache management")
     cache_parser.add_argument("--clear", action="store_true", help="Clear cache")
+    cache_parser.add_argument("--expire", action="store_true", help="Delete entries past the retention period")
+    cache_parser.add_argument("--sweep", action="store_true", help="Expire, then evict least recently used entries over the limits")
+    cache_parser.add_argument("--stats", action="store_true", help="Show cache size against its limits")
+
+    # stats command
+    stats_parser = subparsers.add_parser("stats", help="Show request, retry and cache metrics")
+    stats_format = stats_parser.add_mutually_exclusive_group()
+    stats_format.add_argument("--json", action="store_true", help="Output as JSON")
+    stats_format.add_argument("--prometheus", action="store_true", help="Output in Prometheus text format")
+    stats_parser.add_argument("--output", help="Write the JSON/Prometheus dump to this file instead of stdout")
+    stats_parser.add_argument("--reset", action="store_true", help="Delete the recorded metrics")
+
+    # startup-check command
+    startup_parser = subparsers.add_parser("startup-check", help="Check CLI startup time against its budget")
+    startup_parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                                help=f"Allowed overhead over a bare interpreter (default: {STARTUP_BUDGET_MS})")
+    startup_parser.add_argument("--runs", type=int, default=5, help="Runs per command, the median is kept (default: 5)")
 
     args = parser.parse_args()
 
@@ -844,107 +4980,25 @@ Examples:
         parser.print_help()
         return
 
-    # Initialize fetcher
-    fetcher = PriceFetcher()
-
-    try:
-        if args.command == "quotes":
-            use_cache = not getattr(args, "no_cache", False)
-
-            if args.stocks:
-                quotes = fetcher.get_stock_quotes(use_cache)
-            elif args.crypto:
-                quotes = fetcher.get_crypto_quotes(use_cache)
-            elif args.commodities:
-                quotes = fetcher.get_commodity_quotes(use_cache)
-            else:  # --all or default
-                quotes = fetcher.get_all_quotes(use_cache)
-
-            if args.json:
-                print(json.dumps([q.to_dict() for q in quotes], indent=2))
-            else:
-                print_quotes_table(quotes)
-
-        elif args.command == "quote":
-            quote = fetcher.get_quote(args.symbol)
-            if quote:
-                if args.json:
-                    print(json.dumps(quote.to_dict(), indent=2))
-                else:
-                    print(f"\n{quote.symbol} - {quote.name}")
-                    print(f"Price: {format_price(quote.price)}")
-                    print(f"24h Change: {format_change(quote.change_24h)} ({format_price(quote.change_24h_usd)})")
-                    if quote.high_24h:
-                        print(f"24h High: {format_price(quote.high_24h)}")
-                    if quote.low_24h:
-                        print(f"24h Low: {format_price(quote.low_24h)}")
-                    if quote.volume_24h:
-                        print(f"24h Volume: ${quote.volume_24h:,.0f}")
-                    if quote.market_cap:
-                        print(f"Market Cap: ${quote.market_cap:,.0f}")
-                    print(f"Source: {quote.source}")
-            else:
-                print(f"Symbol not found: {args.symbol}")
-                sys.exit(1)
-
-        elif args.command == "history":
-            data = fetcher.get_historical(args.symbol, args.window)
-            if data:
-                if args.json:
-                    output = {
-                        "symbol": data.symbol,
-                        "name": data.name,
-                        "interval": data.interval,
-                        "source": data.source,
-                        "candles": [asdict(c) for c in data.candles]
-                    }
-                    print(json.dumps(output, indent=2))
-                else:
-                    print(f"\n{data.symbol} - {data.name} ({args.window})")
-                    print(f"Interval: {data.interval}")
-                    print(f"Data points: {len(data.candles)}")
-                    if data.candles:
-                        first = data.candles[0]
-                        last = data.candles[-1]
-                        print(f"Range: {datetime.fromtimestamp(first.time)} to {datetime.fromtimestamp(last.time)}")
-                        print(f"Open: {format_price(first.open)} -> Close: {format_price(last.close)}")
-                        change = (last.close - first.open) / first.open * 100
-                        print(f"Period Change: {format_change(change)}")
-            else:
-                print(f"Could not fetch historical data for: {args.symbol}")
-                sys.exit(1)
-
-        elif args.command == "export":
-            fetcher.export_prices_json(args.filepath)
-            print(f"Prices exported to {args.filepath}")
-
-        elif args.command == "list":
-            print("\nSupported Symbols:")
-            print("\n--- Stocks & ETFs (TwelveData) ---")
-            for symbol, info in sorted(STOCKS_ETFS.items()):
-                print(f"  {symbol:<10} {info['name']}")
-
-            print("\n--- Commodities (TwelveData) ---")
-            for symbol, info in sorted(COMMODITIES.items()):
-                print(f"  {symbol:<10} {info['name']}")
-
-            print("\n--- Cryptocurrencies (CoinGecko) ---")
-            for symbol, info in sorted(CRYPTO.items()):
-                print(f"  {symbol:<10} {info['name']}")
-
-            print(f"\nTotal: {len(ALL_ASSETS)} assets")
+    # A bare `cache` only prints usage; building a fetcher would create the cache dir
+    if args.command == "cache" and not (args.clear or args.expire or args.sweep or args.stats):
+        cache_parser.print_help()
+        return
 
-        elif args.command == "cache":
-            if args.clear:
-                fetcher.clear_cache()
-                print("Cache cleared")
+    if not args.profile:
+        run_command(args)
+        return
 
-    except KeyboardInterrupt:
-        print("\nAborted")
-        sys.exit(130)
-    except Exception as e:
-        logger.error(f"Error: {e}")
-        sys.exit(1)
+    TRACER.start(origin_ns=_IMPORT_STARTED_NS)
+    TRACER.add("startup", "cli", _IMPORT_STARTED_NS, time.perf_counter_ns())
+    try:
+        with TRACER.span(f"cli.{args.command}", "cli"):
+            run_command(args)
+    finally:
+        TRACER.stop()
+        TRACER.write_chrome_trace(args.profile_output)
+        print_trace_summary(TRACER)
+        print(f"Trace written to {args.profile_output}", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,698 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for price_fetcher.py
+
+Runs the fetcher against a local stand-in for the TwelveData and CoinGecko
+APIs, so numbers can be tracked across releases without spending API
+credits. The stand-in replays recorded payloads (built-in samples, or
+responses saved with --fixtures) for any number of synthetic symbols,
+with configurable latency, errors and 429s.
+
+Suites:
+    quotes   get_all_quotes() throughput without the cache
+    history  get_historical() end to end, and parse cost per candle
+    cache    CacheManager set_quotes/get_quotes cost per backend
+    startup  CLI startup over a bare interpreter, with a warm cache
+
+Sizes are symbol counts for the quotes and cache suites, and candle
+counts for history parsing.
+
+Usage:
+    python price_fetcher_bench.py
+    python price_fetcher_bench.py --suites quotes,cache --sizes 10,1000
+    python price_fetcher_bench.py --latency-ms 50 --error-rate 0.05 --rate-limited-rate 0.02
+    python price_fetcher_bench.py --json bench.json --baseline previous.json
+    python price_fetcher_bench.py --serve 8788    # Run only the stand-in
+
+Fixtures are raw API responses named quote.json (single or batch),
+time_series.json, coins_markets.json and market_chart.json; any that are
+missing fall back to the built-in samples.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import zlib
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from copy import deepcopy
+from datetime import datetime
+from pathlib import Path
+from statistics import median
+from typing import Callable, Iterator, Optional
+from urllib.parse import urlparse, parse_qs
+
+import price_fetcher as pf
+
+logger = logging.getLogger("price_fetcher_bench")
+
+
+# =============================================================================
+# Recorded Payloads
+# =============================================================================
+
+# Trimmed responses captured from the live APIs; the stand-in copies them
+# per symbol and cycles the OHLCV rows to any length
+SAMPLE_PAYLOADS = {
+    "quote": {
+        "symbol": "AAPL", "name": "Apple Inc", "exchange": "NASDAQ", "mic_code": "XNGS",
+        "currency": "USD", "datetime": "2024-06-14", "timestamp": 1718371800,
+        "open": "213.85001", "high": "215.17000", "low": "211.30000", "close": "212.49001",
+        "volume": "70122748", "previous_close": "214.24001", "change": "-1.75000",
+        "percent_change": "-0.81684", "average_volume": "96531470", "is_market_open": False,
+        "fifty_two_week": {
+            "low": "164.08000", "high": "220.20000", "low_change": "48.41001",
+            "high_change": "-7.70999", "low_change_percent": "29.50391",
+            "high_change_percent": "-3.50136", "range": "164.080002 - 220.199997",
+        },
+    },
+    "time_series": {
+        "meta": {"symbol": "AAPL", "interval": "1day", "currency": "USD",
+                 "exchange_timezone": "America/New_York", "exchange": "NASDAQ",
+                 "mic_code": "XNGS", "type": "Common Stock"},
+        "values": [
+            {"datetime": "2024-06-14", "open": "213.85001", "high": "215.17000",
+             "low": "211.30000", "close": "212.49001", "volume": "70122748"},
+            {"datetime": "2024-06-13", "open": "214.74001", "high": "216.75000",
+             "low": "211.60001", "close": "214.24001", "volume": "97862700"},
+            {"datetime": "2024-06-12", "open": "207.37000", "high": "220.20000",
+             "low": "206.89999", "close": "213.07001", "volume": "198134300"},
+            {"datetime": "2024-06-11", "open": "193.64999", "high": "207.16000",
+             "low": "193.63000", "close": "207.14999", "volume": "172373300"},
+            {"datetime": "2024-06-10", "open": "196.89999", "high": "197.30000",
+             "low": "192.14999", "close": "193.12000", "volume": "97262100"},
+        ],
+        "status": "ok",
+    },
+    "coins_markets": [{
+        "id": "bitcoin", "symbol": "btc", "name": "Bitcoin",
+        "image": "https://coin-images.coingecko.com/coins/images/1/large/bitcoin.png",
+        "current_price": 66291, "market_cap": 1306520853412, "market_cap_rank": 1,
+        "fully_diluted_valuation": 1392007620384, "total_volume": 20486785744,
+        "high_24h": 67247, "low_24h": 65175, "price_change_24h": 1011.25,
+        "price_change_percentage_24h": 1.54911, "market_cap_change_24h": 19968451048,
+        "market_cap_change_percentage_24h": 1.55205, "circulating_supply": 19710318.0,
+        "total_supply": 21000000.0, "max_supply": 21000000.0, "ath": 73738,
+        "ath_change_percentage": -10.09804, "ath_date": "2024-03-14T07:10:36.635Z",
+        "atl": 67.81, "atl_change_percentage": 97663.36856, "atl_date": "2013-07-06T00:00:00.000Z",
+        "roi": None, "last_updated": "2024-06-14T20:59:55.174Z",
+    }],
+    "market_chart": {
+        "prices": [[1718236800000, 67321.9], [1718240400000, 67410.3], [1718244000000, 67155.0],
+                   [1718247600000, 66920.4], [1718251200000, 67044.8], [1718254800000, 66873.2]],
+        "market_caps": [[1718236800000, 1327164893511.4], [1718240400000, 1328901238201.9],
+                        [1718244000000, 1323888146512.1], [1718247600000, 1319236120390.5],
+                        [1718251200000, 1321688307762.0], [1718254800000, 1318306011883.8]],
+        "total_volumes": [[1718236800000, 29865402017.1], [1718240400000, 29712538114.6],
+                          [1718244000000, 29571233876.3], [1718247600000, 29433870021.7],
+                          [1718251200000, 29301112650.8], [1718254800000, 29188756731.2]],
+    },
+}
+
+FIXTURE_FILES = {
+    "quote": "quote.json",
+    "time_series": "time_series.json",
+    "coins_markets": "coins_markets.json",
+    "market_chart": "market_chart.json",
+}
+
+
+def load_payloads(fixtures_dir: Optional[str] = None) -> dict:
+    """Sample payloads, overridden by any recorded responses in ``fixtures_dir``."""
+    payloads = deepcopy(SAMPLE_PAYLOADS)
+    if not fixtures_dir:
+        return payloads
+
+    for name, filename in FIXTURE_FILES.items():
+        path = Path(fixtures_dir) / filename
+        if not path.exists():
+            continue
+        with open(path, "r") as f:
+            data = json.load(f)
+        if name == "quote" and "symbol" not in data:
+            data = next(iter(data.values()))  # Batch response keyed by symbol
+        if name == "coins_markets":
+            data = data[:1]
+        payloads[name] = data
+    return payloads
+
+
+# =============================================================================
+# Provider Stand-in
+# =============================================================================
+
+INTRADAY_STEPS = {"1min": 60, "5min": 300, "15min": 900, "30min": 1800, "1h": 3600}
+
+
+def _scale(symbol: str) -> float:
+    """Stable per-symbol price multiplier, so symbols don't all look alike."""
+    return 0.5 + (zlib.crc32(symbol.encode()) % 1000) / 1000
+
+
+class StandIn:
+    """Answers TwelveData and CoinGecko requests from payload templates.
+
+    TwelveData endpoints live under ``/twelvedata`` and CoinGecko's under
+    ``/coingecko``. Each request sleeps ``latency`` seconds, then fails
+    with a 500 with probability ``error_rate`` or a 429 (``Retry-After:
+    0``) with probability ``rate_limited_rate``.
+    """
+
+    def __init__(self, payloads: dict, latency: float = 0.0, error_rate: float = 0.0,
+                 rate_limited_rate: float = 0.0, seed: int = 0):
+        self.payloads = payloads
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limited_rate = rate_limited_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _outcome(self) -> int:
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.error_rate:
+            return 500
+        if roll < self.error_rate + self.rate_limited_rate:
+            return 429
+        return 200
+
+    def _quote(self, query: dict):
+        symbols = query["symbol"][0].split(",")
+        body = {}
+        template = self.payloads["quote"]
+        for symbol in symbols:
+            scale = _scale(symbol)
+            body[symbol] = dict(template, symbol=symbol, **{
+                key: f"{float(template[key]) * scale:.5f}"
+                for key in ("open", "high", "low", "close", "previous_close") if key in template
+            })
+        return body[symbols[0]] if len(symbols) == 1 else body
+
+    def _time_series(self, query: dict):
+        interval = query["interval"][0]
+        size = int(query["outputsize"][0])
+        step = pf.INTERVAL_SECONDS[interval]
+        rows = self.payloads["time_series"]["values"]
+        scale = _scale(query["symbol"][0])
+        fmt = "%Y-%m-%d %H:%M:%S" if interval in INTRADAY_STEPS else "%Y-%m-%d"
+
+        newest = int(time.time()) // step * step
+        values = []
+        for i in range(size):
+            row = rows[i % len(rows)]
+            values.append({
+                "datetime": datetime.fromtimestamp(newest - i * step).strftime(fmt),
+                **{k: f"{float(row[k]) * scale:.5f}" for k in ("open", "high", "low", "close")},
+                "volume": row.get("volume", "0"),
+            })
+        return {"meta": {**self.payloads["time_series"].get("meta", {}), "interval": interval},
+                "values": values, "status": "ok"}
+
+    def _coins_markets(self, query: dict):
+        template = self.payloads["coins_markets"][0]
+        rows = []
+        for coin_id in query["ids"][0].split(","):
+            row = dict(template, id=coin_id, symbol=coin_id, name=coin_id)
+            row["current_price"] = template["current_price"] * _scale(coin_id)
+            rows.append(row)
+        return rows
+
+    def _market_chart(self, coin_id: str, query: dict):
+        days = float(query["days"][0])
+        # CoinGecko's automatic granularity
+        if query.get("interval") == ["daily"] or days > 90:
+            step = 86400
+        elif days > 1:
+            step = 3600
+        else:
+            step = 300
+        count = max(1, int(days * 86400 / step))
+        now = int(time.time()) // step * step
+        scale = _scale(coin_id)
+
+        def series(name):
+            points = self.payloads["market_chart"][name]
+            return [[(now - (count - 1 - i) * step) * 1000, points[i % len(points)][1] * scale]
+                    for i in range(count)]
+
+        return {name: series(name) for name in ("prices", "market_caps", "total_volumes")}
+
+    def respond(self, path: str, query: dict) -> tuple[int, Optional[object]]:
+        """(status, JSON body) for a request."""
+        if self.latency:
+            time.sleep(self.latency)
+        status = self._outcome()
+        if status != 200:
+            return status, None
+
+        parts = [p for p in path.split("/") if p]
+        if parts == ["twelvedata", "quote"]:
+            return 200, self._quote(query)
+        if parts == ["twelvedata", "time_series"]:
+            return 200, self._time_series(query)
+        if parts == ["coingecko", "coins", "markets"]:
+            return 200, self._coins_markets(query)
+        if len(parts) == 4 and parts[:2] == ["coingecko", "coins"] and parts[3] == "market_chart":
+            return 200, self._market_chart(parts[2], query)
+        return 404, {"error": f"Unknown route: {path}"}
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Serve until interrupted, printing the base URL on the first line of stdout."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Clients keep connections alive
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                status, payload = stand_in.respond(url.path, parse_qs(url.query))
+                body = b"" if payload is None else json.dumps(payload).encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        print(f"http://{host}:{server.server_address[1]}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+@contextmanager
+def stand_in_process(args: argparse.Namespace) -> Iterator[str]:
+    """Run the stand-in in a child process (so it doesn't share our GIL); yields its base URL."""
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve", "0",
+           "--latency-ms", str(args.latency_ms), "--error-rate", str(args.error_rate),
+           "--rate-limited-rate", str(args.rate_limited_rate), "--seed", str(args.seed)]
+    if args.fixtures:
+        cmd += ["--fixtures", args.fixtures]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    try:
+        base_url = proc.stdout.readline().strip()
+        if not base_url:
+            raise RuntimeError("Stand-in failed to start")
+        yield base_url
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+@contextmanager
+def pointed_at(base_url: str) -> Iterator[None]:
+    """Point every API client class at the stand-in."""
+    targets = {
+        pf.TwelveDataClient: f"{base_url}/twelvedata",
+        pf.AsyncTwelveDataClient: f"{base_url}/twelvedata",
+        pf.CoinGeckoClient: f"{base_url}/coingecko",
+        pf.AsyncCoinGeckoClient: f"{base_url}/coingecko",
+    }
+    saved = {cls: cls.BASE_URL for cls in targets}
+    for cls, url in targets.items():
+        cls.BASE_URL = url
+    try:
+        yield
+    finally:
+        for cls, url in saved.items():
+            cls.BASE_URL = url
+
+
+# =============================================================================
+# Synthetic Assets
+# =============================================================================
+
+@contextmanager
+def scaled_assets(count: int) -> Iterator[None]:
+    """Swap the fetcher's asset tables for ``count`` synthetic symbols.
+
+    Symbols are split like the real tables (about 36% stocks/ETFs, 12%
+    commodities, 52% crypto). Tables are updated in place because
+    QUOTE_CATEGORIES and the clients hold references to them; the quote
+    board is resized to match.
+    """
+    tables = (pf.STOCKS_ETFS, pf.COMMODITIES, pf.CRYPTO, pf.ALL_ASSETS)
+    saved = [dict(t) for t in tables]
+    saved_symbols = pf.QuoteBoard.SYMBOLS
+
+    commodities = max(1, count * 12 // 100)
+    stocks = max(1, count * 36 // 100)
+    crypto = max(1, count - stocks - commodities)
+    new_tables = (
+        {f"S{i:05d}": {"name": f"Stock {i}", "type": "stock", "twelvedata": f"S{i:05d}"}
+         for i in range(stocks)},
+        {f"C{i:05d}": {"name": f"Commodity {i}", "type": "commodity", "twelvedata": f"C{i:05d}/USD"}
+         for i in range(commodities)},
+        {f"X{i:05d}": {"name": f"Coin {i}", "type": "crypto", "coingecko_id": f"coin-{i:05d}"}
+         for i in range(crypto)},
+    )
+    try:
+        for table, new in zip(tables, new_tables):
+            table.clear()
+            table.update(new)
+        pf.ALL_ASSETS.clear()
+        for new in new_tables:
+            pf.ALL_ASSETS.update(new)
+        pf.QuoteBoard.SYMBOLS = tuple(pf.ALL_ASSETS)
+        yield
+    finally:
+        for table, old in zip(tables, saved):
+            table.clear()
+            table.update(old)
+        pf.QuoteBoard.SYMBOLS = saved_symbols
+
+
+def synthetic_quotes(count: int) -> list[pf.PriceQuote]:
+    """``count`` quotes shaped like CoinGecko's (every field set)."""
+    now = datetime.now().isoformat()
+    return [
+        pf.PriceQuote(
+            symbol=f"X{i:05d}", name=f"Coin {i}", price=100.0 + i, change_24h=1.25,
+            change_24h_usd=1.2345, high_24h=105.0 + i, low_24h=95.0 + i,
+            volume_24h=1.5e9, market_cap=2.5e11, timestamp=now, source="coingecko",
+            asset_type="crypto",
+        )
+        for i in range(count)
+    ]
+
+
+# =============================================================================
+# Harness
+# =============================================================================
+
+class Results:
+    """Collects one row per (suite, case, size, metric)."""
+
+    def __init__(self):
+        self.rows: list[dict] = []
+
+    def add(self, suite: str, case: str, size: Optional[int], metric: str, value: float, unit: str) -> None:
+        self.rows.append({"suite": suite, "case": case, "size": size, "metric": metric,
+                          "value": value, "unit": unit})
+        logger.info(f"{suite} {case} size={size} {metric}={value:.6g} {unit}")
+
+    def add_timings(self, suite: str, case: str, size: Optional[int], timings: list[float],
+                    per: Optional[tuple[str, int]] = None) -> None:
+        """Record best and median seconds, plus best cost per item if ``per`` = (name, count)."""
+        self.add(suite, case, size, "best", min(timings), "s")
+        self.add(suite, case, size, "median", median(timings), "s")
+        if per:
+            name, count = per
+            self.add(suite, case, size, f"per_{name}", min(timings) / max(count, 1) * 1e6, "us")
+
+
+def time_calls(fn: Callable[[], object], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_config(cache_dir: Path, args: argparse.Namespace, **overrides) -> pf.Config:
+    """Production defaults, minus the rate limiter (the stand-in has no budget)."""
+    options = dict(
+        twelvedata_api_key="bench",
+        cache_dir=str(cache_dir),
+        coingecko_rate_per_minute=0,
+        retry_delay=args.retry_delay,
+    )
+    options.update(overrides)
+    return pf.Config(**options)
+
+
+def request_counts() -> tuple[float, float]:
+    """(requests, retries) recorded in METRICS since the last reset."""
+    requests_made = sum(v for _, v in pf.METRICS.counters("requests_total"))
+    retries = sum(v for _, v in pf.METRICS.counters("retries_total"))
+    return requests_made, retries
+
+
+# =============================================================================
+# Suites
+# =============================================================================
+
+def bench_quotes(results: Results, args: argparse.Namespace, base_url: str, workdir: Path) -> None:
+    """get_all_quotes(use_cache=False) throughput as symbol counts grow."""
+    for size in args.sizes:
+        with scaled_assets(size), pointed_at(base_url):
+            fetcher = pf.PriceFetcher(bench_config(workdir / f"quotes-{size}", args))
+            try:
+                fetcher.get_all_quotes(use_cache=False)  # Warm sessions and connections
+                pf.METRICS.reset()
+                returned = []
+                timings = time_calls(lambda: returned.append(len(fetcher.get_all_quotes(use_cache=False))),
+                                     args.repeat)
+            finally:
+                fetcher.close()
+
+            results.add_timings("quotes", "sync", size, timings, per=("quote", size))
+            results.add("quotes", "sync", size, "quotes_per_s", size / min(timings), "1/s")
+            # Below ``size`` when injected errors exhausted a category's retries
+            results.add("quotes", "sync", size, "quotes_returned", min(returned), "")
+            requests_made, retries = request_counts()
+            results.add("quotes", "sync", size, "requests_per_call", requests_made / args.repeat, "")
+            results.add("quotes", "sync", size, "retries_per_call", retries / args.repeat, "")
+
+            if pf.aiohttp is None:
+                continue
+
+            async def run_async():
+                async with pf.AsyncPriceFetcher(bench_config(workdir / f"quotes-async-{size}", args)) as fetcher:
+                    await fetcher.get_all_quotes(use_cache=False)
+                    timings, returned = [], []
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        returned.append(len(await fetcher.get_all_quotes(use_cache=False)))
+                        timings.append(time.perf_counter() - start)
+                    return timings, returned
+
+            timings, returned = pf.asyncio.run(run_async())
+            results.add_timings("quotes", "async", size, timings, per=("quote", size))
+            results.add("quotes", "async", size, "quotes_per_s", size / min(timings), "1/s")
+            results.add("quotes", "async", size, "quotes_returned", min(returned), "")
+
+
+def bench_history(results: Results, args: argparse.Namespace, base_url: str, workdir: Path) -> None:
+    """Parse cost per candle as candle counts grow, and get_historical end to end."""
+    stand_in = StandIn(load_payloads(args.fixtures))
+    stock_info = {"name": "Stock", "type": "stock", "twelvedata": "S00000"}
+    coin_info = {"name": "Coin", "type": "crypto", "coingecko_id": "coin-00000"}
+
+    for size in args.sizes:
+        _, data = stand_in.respond("/twelvedata/time_series",
+                                   {"symbol": ["S00000"], "interval": ["1day"], "outputsize": [str(size)]})
+        timings = time_calls(
+            lambda: pf.TwelveDataClient._build_historical("S00000", stock_info, "1day", data), args.repeat)
+        results.add_timings("history", "parse-twelvedata", size, timings, per=("candle", size))
+
+        _, data = stand_in.respond("/coingecko/coins/coin-00000/market_chart",
+                                   {"days": [str(size)], "interval": ["daily"]})
+        timings = time_calls(
+            lambda: pf.CoinGeckoClient._build_historical("X00000", coin_info, size, data, "1day"), args.repeat)
+        results.add_timings("history", "parse-coingecko", size, timings, per=("candle", size))
+
+    with pointed_at(base_url):
+        for symbol in ("AAPL", "BTC"):
+            for store in (False, True):
+                case = f"get-{symbol}-1Y-{'store' if store else 'nostore'}"
+
+                def cold_fetch():
+                    # A fresh cache dir per call, so the candle store starts empty
+                    cache_dir = Path(tempfile.mkdtemp(dir=workdir))
+                    fetcher = pf.PriceFetcher(bench_config(cache_dir, args, candle_store=store))
+                    try:
+                        fetcher.get_historical(symbol, "1Y")
+                    finally:
+                        fetcher.close()
+
+                cold_fetch()
+                results.add_timings("history", case, None, time_calls(cold_fetch, args.repeat))
+
+
+def bench_cache(results: Results, args: argparse.Namespace, base_url: str, workdir: Path) -> None:
+    """CacheManager set_quotes/get_quotes per backend, file-only and with the memory tier."""
+    for size in args.sizes:
+        quotes = synthetic_quotes(size)
+        for backend_name, backend in pf.CACHE_BACKENDS.items():
+            for memory_entries in (0, 256):
+                case = f"{backend_name}-{'memory' if memory_entries else 'file'}"
+                cache = backend(str(workdir / f"cache-{case}-{size}"), 60, memory_entries, 0)
+
+                timings = time_calls(lambda: cache.set_quotes("bench_quotes", quotes), args.repeat)
+                results.add_timings("cache", f"{case}-set", size, timings, per=("quote", size))
+
+                timings = time_calls(lambda: cache.get_quotes("bench_quotes"), args.repeat)
+                results.add_timings("cache", f"{case}-get", size, timings, per=("quote", size))
+
+
+def bench_startup(results: Results, args: argparse.Namespace, base_url: str, workdir: Path) -> None:
+    """Wall-clock CLI overhead over a bare interpreter, with quotes already cached."""
+    cache_dir = workdir / "startup"
+    with pointed_at(base_url):
+        fetcher = pf.PriceFetcher(bench_config(cache_dir, args))
+        try:
+            fetcher.get_all_quotes()
+        finally:
+            fetcher.close()
+
+    # Point the CLI runs at the stand-in too, so a cache miss never reaches the real APIs
+    env = dict(os.environ, PRICE_CACHE_DIR=str(cache_dir),
+               TWELVE_DATA_API_KEY="bench", TWELVE_DATA_BASE_URL=f"{base_url}/twelvedata",
+               COINGECKO_BASE_URL=f"{base_url}/coingecko")
+    script = os.path.abspath(pf.__file__)
+
+    def run(cmd):
+        return time_calls(lambda: subprocess.run(cmd, env=env, capture_output=True, check=True),
+                          args.startup_runs)
+
+    baseline = min(run([sys.executable, "-c", "pass"]))
+    for command in (["list"], ["cache"], ["quote", "BTC"], ["quotes", "--all", "--json"], ["board"]):
+        timings = [t - baseline for t in run([sys.executable, script, *command])]
+        results.add_timings("startup", " ".join(command), None, timings)
+
+
+SUITES = {
+    "quotes": bench_quotes,
+    "history": bench_history,
+    "cache": bench_cache,
+    "startup": bench_startup,
+}
+
+
+# =============================================================================
+# Reporting
+# =============================================================================
+
+def _key(row: dict) -> tuple:
+    return row["suite"], row["case"], row["size"], row["metric"]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(rows: list[dict], baseline: Optional[dict] = None) -> None:
+    """Print results as a table, with the change against ``baseline`` rows if given."""
+    previous = {_key(r): r["value"] for r in (baseline or {}).get("results", [])}
+
+    header = f"{'Suite':<8} {'Case':<28} {'Size':>6} {'Metric':<18} {'Value':>12} {'Unit':<4}"
+    if previous:
+        header += f" {'Baseline':>12} {'Change':>8}"
+    print(f"\n{header}")
+    print("-" * len(header))
+
+    for row in rows:
+        size = "-" if row["size"] is None else str(row["size"])
+        line = (f"{row['suite']:<8} {row['case']:<28} {size:>6} {row['metric']:<18} "
+                f"{row['value']:>12.6g} {row['unit']:<4}")
+        old = previous.get(_key(row))
+        if old:
+            line += f" {old:>12.6g} {(row['value'] - old) / old * 100:>+7.1f}%"
+        print(line)
+
+
+def main():
+    """Benchmark CLI entry point."""
+    parser = argparse.ArgumentParser(
+        description="Offline benchmarks for price_fetcher.py",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--suites", default=",".join(SUITES),
+                        help=f"Comma-separated suites to run (default: {','.join(SUITES)})")
+    parser.add_argument("--sizes", default="10,100,1000,10000",
+                        help="Comma-separated symbol/candle counts (default: 10,100,1000,10000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (default: 5)")
+    parser.add_argument("--startup-runs", type=int, default=10, help="Runs per CLI command (default: 10)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Stand-in latency per request (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limited-rate", type=float, default=0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-delay", type=float, default=0.1,
+                        help="Client retry backoff base in seconds (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for injected errors")
+    parser.add_argument("--fixtures", help="Directory of recorded API responses to replay")
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    parser.add_argument("--baseline", help="Compare against results previously written with --json")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="Only run the stand-in on PORT (0: any)")
+    parser.add_argument("--verbose", action="store_true", help="Show fetcher logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", force=True)
+    # Injected errors make the fetcher log every retry
+    logging.getLogger(pf.__name__).setLevel(logging.INFO if args.verbose else logging.CRITICAL)
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+
+    if args.serve is not None:
+        StandIn(load_payloads(args.fixtures), args.latency_ms / 1000, args.error_rate,
+                args.rate_limited_rate, args.seed).serve(port=args.serve)
+        return
+
+    args.sizes = [int(s) for s in args.sizes.split(",") if s]
+    suites = [s for s in args.suites.split(",") if s]
+    unknown = [s for s in suites if s not in SUITES]
+    if unknown:
+        parser.error(f"Unknown suites: {', '.join(unknown)}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    results = Results()
+    workdir = Path(tempfile.mkdtemp(prefix="price_bench_"))
+    try:
+        with stand_in_process(args) as base_url:
+            for name in suites:
+                print(f"Running {name}...", file=sys.stderr)
+                SUITES[name](results, args, base_url, workdir)
+    finally:
+        pf.METRICS.reset()  # Nothing to flush into the temporary cache dirs
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results.rows, baseline)
+
+    if args.json_path:
+        report = {
+            "meta": {
+                "time": datetime.now().isoformat(),
+                "git": _git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "numpy": pf.np is not None,
+                "options": {k: v for k, v in vars(args).items() if k not in ("json_path", "baseline")},
+            },
+            "results": results.rows,
+        }
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1756 @@
+"""Tests for price_fetcher.
+
+Run from the repository root with::
+
+    python -m pytest scripts
+"""
+
+import asyncio
+import http.client
+import itertools
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import price_fetcher as pf
+
+
+def make_quote(symbol: str, price: float = 1.0, asset_type: str = "stock") -> pf.PriceQuote:
+    return pf.PriceQuote(symbol=symbol, name=symbol, price=price, change_24h=0.0, change_24h_usd=0.0,
+                         high_24h=None, low_24h=None, volume_24h=None, market_cap=None,
+                         timestamp="2026-01-01T00:00:00", source="test", asset_type=asset_type)
+
+
+def make_config(tmp_path, **overrides) -> pf.Config:
+    options = dict(twelvedata_api_key="test", cache_dir=str(tmp_path / "cache"), retry_delay=0.0)
+    options.update(overrides)
+    return pf.Config(**options)
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    fetcher = pf.PriceFetcher(make_config(tmp_path))
+    yield fetcher
+    fetcher.close()
+
+
+def stub_categories(fetcher, monkeypatch, **fetches) -> None:
+    """Replace the per-category client fetches with ``fetches`` callables."""
+    defaults = {
+        "stocks": lambda: [make_quote("AAPL")],
+        "commodities": lambda: [make_quote("GOLD", asset_type="commodity")],
+        "crypto": lambda: [make_quote("BTC", asset_type="crypto")],
+    }
+    defaults.update(fetches)
+    monkeypatch.setattr(fetcher.twelvedata, "fetch_stock_quotes", defaults["stocks"])
+    monkeypatch.setattr(fetcher.twelvedata, "fetch_commodity_quotes", defaults["commodities"])
+    monkeypatch.setattr(fetcher.coingecko, "fetch_crypto_quotes", defaults["crypto"])
+
+
+class StandInProvider:
+    """Local HTTP stand-in for the TwelveData and CoinGecko endpoints.
+
+    ``statuses`` are served (with ``Retry-After: 0``) before any real
+    response, then raw ``bodies`` with a 200; ``calls`` records each
+    request as ``(path, params)``.
+    """
+
+    STEPS = {"15min": 900, "1h": 3600, "1day": 86400, "1week": 604800}
+
+    def __init__(self):
+        self.calls = []
+        self.statuses = []
+        self.bodies = []
+        self.fail_symbols = set()
+        self.price = 100.0
+        self.lock = threading.Lock()
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = dict(parse_qsl(url.query))
+                status, body = provider.respond(url.path, params)
+                payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def requests_to(self, path: str) -> list[dict]:
+        return [params for p, params in self.calls if p.endswith(path)]
+
+    def respond(self, path: str, params: dict) -> tuple[int, object]:
+        with self.lock:
+            self.calls.append((path, params))
+            if self.statuses:
+                return self.statuses.pop(0), {}
+            if self.bodies:
+                return 200, self.bodies.pop(0)
+        if path == "/quote":
+            symbols = params["symbol"].split(",")
+            if self.fail_symbols.intersection(symbols):
+                return 500, {}
+            rows = {s: self.quote_row(s) for s in symbols}
+            return 200, rows[symbols[0]] if len(symbols) == 1 else rows
+        if path == "/time_series":
+            return 200, {"values": self.time_series(params["interval"], int(params["outputsize"]))}
+        if path == "/coins/markets":
+            ids = params["ids"].split(",")
+            if self.fail_symbols.intersection(ids):
+                return 500, {}
+            return 200, [self.market_row(coin_id) for coin_id in ids]
+        if path.endswith("/market_chart"):
+            return 200, self.market_chart(float(params["days"]), params.get("interval"))
+        return 404, {}
+
+    def quote_row(self, symbol: str) -> dict:
+        return {"symbol": symbol, "close": str(self.price), "previous_close": str(self.price - 1),
+                "high": str(self.price + 1), "low": str(self.price - 2), "volume": "1000"}
+
+    def market_row(self, coin_id: str) -> dict:
+        return {"id": coin_id, "current_price": self.price, "price_change_percentage_24h": 1.0,
+                "price_change_24h": 1.0, "high_24h": self.price + 1, "low_24h": self.price - 2,
+                "total_volume": 1000.0, "market_cap": 1e9}
+
+    def time_series(self, interval: str, outputsize: int) -> list[dict]:
+        step = self.STEPS[interval]
+        newest = int(time.time()) // step * step
+        return [{"datetime": datetime.fromtimestamp(newest - i * step).strftime("%Y-%m-%d %H:%M:%S"),
+                 "open": str(self.price), "high": str(self.price + 1), "low": str(self.price - 1),
+                 "close": str(self.price), "volume": "10"}
+                for i in range(outputsize)]
+
+    def market_chart(self, days: float, interval: str = None) -> dict:
+        step = 86400 if interval == "daily" else 3600
+        end = int(time.time()) // step * step
+        times = [(end - i * step) * 1000 for i in reversed(range(int(days * 86400 // step)))]
+        return {"prices": [[t, self.price] for t in times],
+                "total_volumes": [[t, 10.0] for t in times]}
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = StandInProvider()
+    for client in (pf.TwelveDataClient, pf.CoinGeckoClient, pf.AsyncTwelveDataClient, pf.AsyncCoinGeckoClient):
+        monkeypatch.setattr(client, "BASE_URL", provider.url)
+    yield provider
+    provider.close()
+
+
+# =============================================================================
+# Concurrent category fetches
+# =============================================================================
+
+def test_get_all_quotes_fetches_categories_in_parallel(fetcher, monkeypatch):
+    # Each fetch waits for the other two; a sequential fan-out would break the barrier
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fetch(symbol):
+        def run():
+            barrier.wait()
+            return [make_quote(symbol)]
+        return run
+
+    stub_categories(fetcher, monkeypatch, stocks=fetch("AAPL"), commodities=fetch("GOLD"), crypto=fetch("BTC"))
+
+    quotes = fetcher.get_all_quotes(use_cache=False)
+
+    assert [q.symbol for q in quotes] == ["AAPL", "GOLD", "BTC"]
+
+
+def test_failed_category_does_not_affect_the_others(fetcher, monkeypatch):
+    def fail():
+        raise RuntimeError("provider down")
+
+    stub_categories(fetcher, monkeypatch, commodities=fail)
+
+    for concurrent in (True, False):
+        quotes = fetcher.get_all_quotes(use_cache=False, concurrent=concurrent)
+        assert [q.symbol for q in quotes] == ["AAPL", "BTC"]
+
+
+# =============================================================================
+# Asyncio clients
+# =============================================================================
+
+ALL_SYMBOLS = [*pf.STOCKS_ETFS, *pf.COMMODITIES, *pf.CRYPTO]
+
+
+def test_async_fetcher_returns_the_same_quotes_as_the_sync_fetcher(tmp_path, provider, fetcher):
+    async def fetch():
+        async with pf.AsyncPriceFetcher(make_config(tmp_path)) as async_fetcher:
+            return await async_fetcher.get_all_quotes(use_cache=False)
+
+    async_quotes = asyncio.run(fetch())
+    sync_quotes = fetcher.get_all_quotes(use_cache=False)
+
+    assert [q.symbol for q in async_quotes] == ALL_SYMBOLS
+    assert [(q.symbol, q.price) for q in async_quotes] == [(q.symbol, q.price) for q in sync_quotes]
+
+
+def test_async_fetcher_single_quote_and_history(tmp_path, provider):
+    async def fetch():
+        async with pf.AsyncPriceFetcher(make_config(tmp_path)) as async_fetcher:
+            return await asyncio.gather(
+                async_fetcher.get_quote("eth"),
+                async_fetcher.get_historical("AAPL", "1M"),
+                async_fetcher.get_historical("BTC", "1W"),
+            )
+
+    quote, stock_history, crypto_history = asyncio.run(fetch())
+
+    assert (quote.symbol, quote.price) == ("ETH", 100.0)
+    assert len(stock_history.candles) == 30
+    assert len(crypto_history.candles) > 0
+
+
+def test_async_client_retries_server_errors(tmp_path, provider):
+    provider.statuses = [500]
+
+    async def fetch():
+        async with pf.AsyncPriceFetcher(make_config(tmp_path)) as async_fetcher:
+            return await async_fetcher.get_crypto_quotes(use_cache=False)
+
+    quotes = asyncio.run(fetch())
+
+    assert [q.symbol for q in quotes] == list(pf.CRYPTO)
+    assert len(provider.requests_to("/coins/markets")) == 2
+
+
+@pytest.mark.parametrize("body", [b"", b"[]", b"{not json"])
+def test_async_client_retries_empty_and_malformed_bodies(tmp_path, provider, body):
+    provider.bodies = [body]
+
+    async def fetch():
+        async with pf.AsyncPriceFetcher(make_config(tmp_path)) as async_fetcher:
+            return await async_fetcher.get_quote("AAPL", use_cache=False)
+
+    quote = asyncio.run(fetch())
+
+    assert quote.price == provider.price
+    assert len(provider.requests_to("/quote")) == 2
+
+
+def test_async_cache_lookups_do_not_block_the_event_loop(tmp_path, provider, monkeypatch):
+    async def scenario():
+        async with pf.AsyncPriceFetcher(make_config(tmp_path)) as fetcher:
+            fetcher.cache.update_index([make_quote("AAPL")])
+            fetcher.cache.set_quotes("crypto_quotes", [make_quote("BTC", asset_type="crypto")])
+            lookup_quotes = fetcher.cache.lookup_quotes
+
+            def slow_lookup(key):
+                time.sleep(0.2)
+                return lookup_quotes(key)
+
+            monkeypatch.setattr(fetcher.cache, "lookup_quotes", slow_lookup)
+            ticks = []
+
+            async def tick():
+                while True:
+                    ticks.append(1)
+                    await asyncio.sleep(0.01)
+
+            ticker = asyncio.ensure_future(tick())
+            # The index read waits on a writer holding the index lock
+            fetcher.cache._index_lock.acquire()
+            threading.Timer(0.2, fetcher.cache._index_lock.release).start()
+            quotes = await fetcher.get_quotes(["AAPL"])
+            index_ticks, ticks[:] = len(ticks), []
+            crypto = await fetcher.get_crypto_quotes()
+            ticker.cancel()
+            return quotes, crypto, index_ticks, len(ticks)
+
+    quotes, crypto, index_ticks, lookup_ticks = asyncio.run(scenario())
+
+    assert [q.symbol for q in quotes] == ["AAPL"] and [q.symbol for q in crypto] == ["BTC"]
+    assert index_ticks >= 5 and lookup_ticks >= 5
+    assert provider.calls == []
+
+
+# =============================================================================
+# Memory cache tier
+# =============================================================================
+
+def test_memory_cache_evicts_the_least_recently_used_entry():
+    memory = pf.MemoryCache(max_entries=2)
+    memory.set("a", 1, ttl_seconds=60)
+    memory.set("b", 2, ttl_seconds=60)
+    assert memory.get("a") == 1
+
+    memory.set("c", 3, ttl_seconds=60)
+
+    assert memory.get("b") is None
+    assert (memory.get("a"), memory.get("c")) == (1, 3)
+
+
+def test_memory_cache_expires_entries():
+    memory = pf.MemoryCache()
+    memory.set("short", 1, ttl_seconds=0.01)
+    memory.set("never", 2, ttl_seconds=0)
+    time.sleep(0.02)
+
+    assert memory.get("short") is None
+    assert memory.get("never") is None
+
+
+def test_cache_manager_serves_quotes_from_memory_in_front_of_files(tmp_path):
+    cache = pf.CacheManager(str(tmp_path), ttl_seconds=60, memory_entries=8)
+    quotes = [make_quote("AAPL", 1.5), make_quote("MSFT", 2.5)]
+    cache.set_quotes("stock_quotes", quotes)
+
+    # A fresh manager promotes the file entry into its own memory tier
+    cold = pf.CacheManager(str(tmp_path), ttl_seconds=60, memory_entries=8)
+    assert cold.get_quotes("stock_quotes") == quotes
+    for path in tmp_path.rglob("*.json"):
+        path.unlink()
+
+    assert cache.get_quotes("stock_quotes") == quotes
+    assert cold.get_quotes("stock_quotes") == quotes
+    assert pf.CacheManager(str(tmp_path), ttl_seconds=60).get_quotes("stock_quotes") is None
+
+
+# =============================================================================
+# Atomic writes and cache backends
+# =============================================================================
+
+@pytest.fixture(params=sorted(pf.CACHE_BACKENDS))
+def file_cache_cls(request):
+    return pf.CACHE_BACKENDS[request.param]
+
+
+def test_cache_backends_round_trip_and_expire(tmp_path, file_cache_cls):
+    cache = file_cache_cls(str(tmp_path), ttl_seconds=60)
+    cache.set("k", {"price": 1.5, "symbols": ["A", "B"]})
+    assert cache.get("k") == {"price": 1.5, "symbols": ["A", "B"]}
+
+    cache.ttl_seconds = 0
+    assert cache.get("k") is None
+
+
+def test_cache_backends_never_expose_partial_writes(tmp_path, file_cache_cls):
+    cache = file_cache_cls(str(tmp_path), ttl_seconds=60)
+    payloads = [{"n": n, "rows": [n] * 20000} for n in range(2)]
+    cache.set("k", payloads[0])
+    stop = threading.Event()
+
+    def write():
+        n = 0
+        while not stop.is_set():
+            n += 1
+            cache.set("k", payloads[n % 2])
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(200):
+            assert cache.get("k") in payloads
+    finally:
+        stop.set()
+        writer.join()
+
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_binary_cache_rejects_foreign_files(tmp_path):
+    cache = pf.BinaryCacheManager(str(tmp_path), ttl_seconds=60)
+    cache.set("k", [1, 2, 3])
+    path = cache._get_cache_path("k")
+    path.write_bytes(b"JUNK" + path.read_bytes()[4:])
+
+    assert cache.get("k") is None
+
+
+# =============================================================================
+# Request coalescing
+# =============================================================================
+
+def test_single_flight_runs_once_for_concurrent_callers():
+    flight = pf.SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "quotes"
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", fetch))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        time.sleep(0.001)
+    time.sleep(0.1)  # Let the followers reach do()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["quotes"] * 8
+
+
+def test_single_flight_shares_errors_and_forgets_the_key():
+    flight = pf.SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        flight.do("k", fail)
+    assert flight.do("k", lambda: 42) == 42
+
+
+def test_async_single_flight_survives_a_cancelled_waiter():
+    async def scenario():
+        flight = pf.AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "quotes"
+
+        cancelled = asyncio.ensure_future(flight.do("k", fetch))
+        waiters = [asyncio.ensure_future(flight.do("k", fetch)) for _ in range(4)]
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return calls, await asyncio.gather(*waiters)
+
+    calls, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == ["quotes"] * 4
+
+
+def test_fetchers_sharing_a_cache_dir_make_one_upstream_fetch(tmp_path, monkeypatch):
+    # Separate fetchers stand in for separate processes: only the file lock is shared
+    fetchers = [pf.PriceFetcher(make_config(tmp_path)) for _ in range(2)]
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return [make_quote("BTC", asset_type="crypto")]
+
+    for fetcher in fetchers:
+        monkeypatch.setattr(fetcher.coingecko, "fetch_crypto_quotes", fetch)
+
+    results = []
+    threads = [threading.Thread(target=lambda f=f: results.append(f.get_crypto_quotes()))
+               for f in fetchers for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [[q.symbol for q in r] for r in results] == [["BTC"]] * 6
+
+
+def test_quotes_are_not_cached_when_the_key_lock_times_out(tmp_path, provider):
+    config = make_config(tmp_path, lock_timeout=0.05)
+    fetcher = pf.PriceFetcher(config)
+    holder = fetcher.cache.lock("crypto_quotes")
+    assert holder.acquire(1)
+
+    async def fetch_async():
+        async with pf.AsyncPriceFetcher(config) as async_fetcher:
+            return await async_fetcher.get_crypto_quotes()
+
+    try:
+        quotes = fetcher.get_crypto_quotes()
+        async_quotes = asyncio.run(fetch_async())
+    finally:
+        holder.release()
+
+    assert [q.symbol for q in quotes] == [q.symbol for q in async_quotes] == list(pf.CRYPTO)
+    assert fetcher.cache.lookup_quotes("crypto_quotes") is None
+
+
+# =============================================================================
+# Stale-while-revalidate
+# =============================================================================
+
+def join_revalidations() -> None:
+    for thread in threading.enumerate():
+        if thread.name.startswith("revalidate-"):
+            thread.join()
+
+
+def test_lookup_quotes_flags_entries_past_the_soft_ttl(tmp_path):
+    cache = pf.CacheManager(str(tmp_path), ttl_seconds=0, hard_ttl_seconds=60)
+    cache.set_quotes("k", [make_quote("AAPL")])
+
+    quotes, stale = cache.lookup_quotes("k")
+
+    assert stale and [q.symbol for q in quotes] == ["AAPL"]
+    assert pf.CacheManager(str(tmp_path), ttl_seconds=0).lookup_quotes("k") is None
+
+
+def test_stale_quotes_are_served_while_one_background_refresh_runs(tmp_path, monkeypatch):
+    fetcher = pf.PriceFetcher(make_config(tmp_path, cache_ttl_seconds=0, cache_hard_ttl_seconds=60))
+    prices = iter([1.0, 2.0])
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        price = next(prices)
+        if price > 1:
+            time.sleep(0.2)
+        return [make_quote("BTC", price, asset_type="crypto")]
+
+    monkeypatch.setattr(fetcher.coingecko, "fetch_crypto_quotes", fetch)
+    assert fetcher.get_crypto_quotes()[0].price == 1.0
+
+    started = time.perf_counter()
+    served = [fetcher.get_crypto_quotes()[0].price for _ in range(3)]
+    elapsed = time.perf_counter() - started
+    join_revalidations()
+
+    assert served == [1.0] * 3
+    assert elapsed < 0.1
+    assert len(calls) == 2
+    assert fetcher.cache.lookup_quotes("crypto_quotes")[0][0].price == 2.0
+
+
+def test_async_fetcher_revalidates_stale_quotes_in_the_background(tmp_path, monkeypatch):
+    config = make_config(tmp_path, cache_ttl_seconds=0, cache_hard_ttl_seconds=60)
+    prices = iter([1.0, 2.0])
+
+    async def fetch():
+        return [make_quote("BTC", next(prices), asset_type="crypto")]
+
+    async def scenario():
+        async with pf.AsyncPriceFetcher(config) as fetcher:
+            monkeypatch.setattr(fetcher.coingecko, "fetch_crypto_quotes", fetch)
+            first = await fetcher.get_crypto_quotes()
+            stale = await fetcher.get_crypto_quotes()
+            await asyncio.gather(*fetcher._background)
+            return first[0].price, stale[0].price, fetcher.cache.lookup_quotes("crypto_quotes")[0][0].price
+
+    assert asyncio.run(scenario()) == (1.0, 1.0, 2.0)
+
+
+def test_all_quotes_read_the_cache_once_per_call(tmp_path, monkeypatch):
+    config = make_config(tmp_path, cache_ttl_seconds=0, cache_hard_ttl_seconds=60, memory_cache_entries=0)
+    fetcher = pf.PriceFetcher(config)
+    fetcher.cache.set_quotes("all_quotes", [make_quote("AAPL")])
+    reads = []
+    read_quotes = fetcher.cache.read_quotes
+    monkeypatch.setattr(fetcher.cache, "read_quotes", lambda *args: reads.append(args) or read_quotes(*args))
+    monkeypatch.setattr(fetcher, "_revalidate", lambda *args: None)
+
+    assert [q.symbol for q in fetcher.get_all_quotes()] == ["AAPL"]
+    assert len(reads) == 1
+
+    async def fetch():
+        async with pf.AsyncPriceFetcher(config) as async_fetcher:
+            async_fetcher.cache = fetcher.cache
+            monkeypatch.setattr(async_fetcher, "_revalidate", lambda *args: None)
+            return await async_fetcher.get_all_quotes()
+
+    assert [q.symbol for q in asyncio.run(fetch())] == ["AAPL"]
+    assert len(reads) == 2
+
+
+# =============================================================================
+# Candle store
+# =============================================================================
+
+def make_candles(times, close: float = 1.0) -> pf.CandleSeries:
+    return pf.CandleSeries.from_candles(
+        pf.PriceCandle(time=t, open=close, high=close, low=close, close=close, volume=1.0) for t in times
+    )
+
+
+def closes(candles) -> dict[int, float]:
+    return {c.time: c.close for c in candles}
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def candle_store(request, tmp_path):
+    cache_cls = pf.SQLiteCacheManager if request.param == "sqlite" else pf.CacheManager
+    return cache_cls(str(tmp_path)).candle_store()
+
+
+def merge(store: pf.CandleStore, candles, exhausted: bool = False) -> dict:
+    with store.lock("AAPL", "1day").held(5):
+        return store.merge("AAPL", "1day", candles, exhausted=exhausted)
+
+
+def read(store: pf.CandleStore, since=None):
+    with store.lock("AAPL", "1day").held(5):
+        return store.read("AAPL", "1day", since=since)
+
+
+def test_merge_appends_and_replaces_the_forming_candle(candle_store):
+    merge(candle_store, make_candles([0, 10, 20, 30, 40]))
+    meta = merge(candle_store, make_candles([40, 50], close=2.0))
+
+    assert meta["rows"] == 6
+    assert (meta["first_time"], meta["last_time"]) == (0, 50)
+    assert closes(read(candle_store)) == {0: 1.0, 10: 1.0, 20: 1.0, 30: 1.0, 40: 2.0, 50: 2.0}
+
+
+def test_merge_keeps_a_complete_candle_over_a_partial_tail_head(candle_store):
+    merge(candle_store, make_candles([0, 10, 20, 30, 40]))
+    # A resampled tail starts mid-bucket, so its first candle (20) is partial
+    merge(candle_store, make_candles([20, 30, 40, 50], close=2.0))
+
+    assert closes(read(candle_store)) == {0: 1.0, 10: 1.0, 20: 1.0, 30: 2.0, 40: 2.0, 50: 2.0}
+
+
+def test_merge_inside_stored_history_rebuilds_the_union(candle_store):
+    merge(candle_store, make_candles([0, 10, 20, 30, 40]))
+    meta = merge(candle_store, make_candles([5, 10], close=2.0))
+
+    assert meta["rows"] == 6
+    assert meta["last_time"] == 40
+    assert closes(read(candle_store)) == {0: 1.0, 5: 2.0, 10: 2.0, 20: 1.0, 30: 1.0, 40: 1.0}
+
+
+@pytest.mark.parametrize("update, expected", [
+    # A stored head candle is complete, so the update's copy is dropped
+    ([0, 25], {0: 1.0, 10: 1.0, 20: 1.0, 25: 2.0, 30: 1.0}),
+    ([5, 25], {0: 1.0, 5: 2.0, 10: 1.0, 20: 1.0, 25: 2.0, 30: 1.0}),
+    ([10, 15, 25, 40], {0: 1.0, 10: 1.0, 15: 2.0, 20: 1.0, 25: 2.0, 30: 1.0, 40: 2.0}),
+])
+def test_merge_overlapping_the_tail_with_gaps_keeps_every_stored_candle(candle_store, update, expected):
+    merge(candle_store, make_candles([0, 10, 20, 30]))
+    meta = merge(candle_store, make_candles(update, close=2.0))
+
+    assert closes(read(candle_store)) == expected
+    assert (meta["rows"], meta["first_time"], meta["last_time"]) == (len(expected), 0, max(expected))
+
+
+def test_merge_rewrites_a_series_with_a_missing_column(tmp_path):
+    store = pf.CandleStore(tmp_path / "candles")
+    merge(store, make_candles([0, 10, 20, 30]), exhausted=True)
+    (store._series_dir("AAPL", "1day") / "volume.col").unlink()
+
+    meta = merge(store, make_candles([30, 40], close=2.0))
+
+    assert (meta["rows"], meta["first_time"], meta["exhausted"]) == (2, 30, False)
+    assert closes(read(store)) == {30: 2.0, 40: 2.0}
+
+
+def test_read_since_and_exhausted_flag(candle_store):
+    merge(candle_store, make_candles([0, 10, 20, 30, 40]), exhausted=True)
+    meta = merge(candle_store, make_candles([40, 50]))
+
+    assert meta["exhausted"] is True
+    assert [c.time for c in read(candle_store, since=30)] == [30, 40, 50]
+    assert len(read(candle_store, since=60)) == 0
+
+
+@pytest.fixture
+def expired_history(monkeypatch):
+    """Make every stored series due for a tail refresh."""
+    monkeypatch.setattr(pf, "HISTORY_TTL_SECONDS", dict.fromkeys(pf.INTERVAL_SECONDS, 0))
+
+
+def test_history_is_stored_and_refreshed_by_tail_requests(tmp_path, provider, expired_history):
+    fetcher = pf.PriceFetcher(make_config(tmp_path))
+
+    first = fetcher.get_historical("AAPL", "1D")
+    second = fetcher.get_historical("AAPL", "1D")
+
+    sizes = [int(params["outputsize"]) for params in provider.requests_to("/time_series")]
+    assert sizes[0] == 96 and sizes[1] <= 3
+    assert len(first.candles) == len(second.candles) == 96
+    assert [c.time for c in first.candles] == [c.time for c in second.candles]
+
+
+def test_async_history_uses_the_same_store(tmp_path, provider, expired_history):
+    config = make_config(tmp_path)
+    pf.PriceFetcher(config).get_historical("BTC", "1M")
+
+    async def fetch():
+        async with pf.AsyncPriceFetcher(config) as fetcher:
+            return await fetcher.get_historical("BTC", "1M")
+
+    history = asyncio.run(fetch())
+
+    days = [float(params["days"]) for params in provider.requests_to("/market_chart")]
+    assert days[0] == 365 and days[1] <= 2
+    assert 30 <= len(history.candles) <= 31
+
+
+def test_history_is_not_stored_when_the_series_lock_times_out(tmp_path, provider):
+    config = make_config(tmp_path, lock_timeout=0.05)
+    fetcher = pf.PriceFetcher(config)
+    holder = fetcher.candles.lock("AAPL", "1day")
+    assert holder.acquire(1)
+
+    async def fetch_async():
+        async with pf.AsyncPriceFetcher(config) as async_fetcher:
+            return await async_fetcher.get_historical("AAPL", "1M")
+
+    try:
+        history = fetcher.get_historical("AAPL", "1M")
+        async_history = asyncio.run(fetch_async())
+    finally:
+        holder.release()
+
+    assert len(history.candles) == len(async_history.candles) == 30
+    assert [int(params["outputsize"]) for params in provider.requests_to("/time_series")] == [30, 30]
+    assert fetcher.candles.meta("AAPL", "1day") is None
+
+
+# =============================================================================
+# Columnar candles
+# =============================================================================
+
+@pytest.fixture(params=["numpy", "array"])
+def columns_backend(request, monkeypatch):
+    """Run a test with NumPy columns and with the array.array fallback."""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(pf, "np", None)
+    return request.param
+
+
+def test_candle_series_behaves_like_a_list_of_candles(columns_backend):
+    rows = [pf.PriceCandle(time=t, open=1.0, high=2.0, low=0.5, close=1.5, volume=float(t)) for t in (30, 10, 20)]
+    series = pf.CandleSeries.from_candles(rows)
+
+    assert len(series) == 3
+    assert list(series) == rows
+    assert series[1] == rows[1] and series[-1] == rows[-1]
+    assert isinstance(series[1:], pf.CandleSeries) and list(series[1:]) == rows[1:]
+    assert [c.time for c in series.sorted()] == [10, 20, 30]
+    assert series.to_dicts()[0] == {"time": 30, "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 30.0}
+
+
+def test_candle_series_between_and_buffers(columns_backend):
+    series = make_candles([0, 10, 20, 30, 40])
+
+    assert [c.time for c in series.between(10, 30)] == [10, 20]
+    assert [c.time for c in series.between(start=25)] == [30, 40]
+    assert [c.time for c in series.between(end=0)] == []
+
+    copy = pf.CandleSeries.from_buffers({name: bytes(series.to_bytes(name)) for name, _ in series.COLUMNS})
+    assert list(copy) == list(series)
+
+
+def test_candle_series_rejects_ragged_columns_and_historical_data_coerces_lists():
+    with pytest.raises(ValueError):
+        pf.CandleSeries({"time": [1, 2], "close": [1.0]})
+
+    data = pf.HistoricalData("AAPL", "Apple", list(make_candles([0, 10])), "1day", "test")
+    assert isinstance(data.candles, pf.CandleSeries) and len(data.candles) == 2
+
+
+# =============================================================================
+# Time series parsing
+# =============================================================================
+
+@pytest.fixture
+def new_york_time(monkeypatch):
+    """Interpret naive datetimes in a zone with DST transitions."""
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def time_series_rows(start: str, count: int, step: int = 3600) -> list[dict]:
+    first = datetime.fromisoformat(start).timestamp()
+    return [{"datetime": datetime.fromtimestamp(first + i * step).strftime("%Y-%m-%d %H:%M:%S"),
+             "open": "1.0", "high": "2.0", "low": "0.5", "close": str(i), "volume": "10"}
+            for i in range(count)]
+
+
+def test_parse_time_series_matches_local_time_across_dst(new_york_time, columns_backend):
+    rows = time_series_rows("2024-03-09 22:00:00", 12) + [{"datetime": "2024-03-10", "open": "1", "high": "1",
+                                                          "low": "1", "close": "1"}]
+
+    candles, invalid = pf.TwelveDataClient._parse_time_series(rows)
+
+    assert invalid == []
+    expected = [int(datetime.fromisoformat(r["datetime"]).timestamp()) for r in rows]
+    assert [c.time for c in candles] == expected
+    assert candles[-1].volume == 0.0
+
+
+def test_parse_time_series_reports_bad_rows(columns_backend):
+    rows = time_series_rows("2024-01-02 10:00:00", 5)
+    rows[1]["datetime"] = "not a date"
+    rows[3]["close"] = None
+    del rows[4]["open"]
+
+    candles, invalid = pf.TwelveDataClient._parse_time_series(rows)
+
+    assert invalid == [1, 3, 4]
+    assert [c.close for c in candles] == [0.0, 2.0]
+
+
+# =============================================================================
+# Resampling
+# =============================================================================
+
+def test_resample_ohlcv_builds_buckets_with_as_of_volume(columns_backend):
+    prices = [[0, 5.0], [1_200_000, 7.0], [2_400_000, 4.0], [3_000_000, 6.0], [3_600_000, 8.0]]
+    volumes = [[0, 100.0], [2_000_000, 150.0], [3_600_000, 200.0]]
+
+    candles = pf.resample_ohlcv(prices, volumes, 3600)
+
+    assert [(c.time, c.open, c.high, c.low, c.close, c.volume) for c in candles] == [
+        (0, 5.0, 7.0, 4.0, 6.0, 150.0),
+        (3600, 8.0, 8.0, 8.0, 8.0, 200.0),
+    ]
+
+
+def test_resample_ohlcv_sorts_points_and_tolerates_missing_volume(columns_backend):
+    prices = [[7_200_000, 2.0], [0, 1.0]]
+
+    candles = pf.resample_ohlcv(prices, [], 3600)
+
+    assert [(c.time, c.close, c.volume) for c in candles] == [(0, 1.0, 0.0), (7200, 2.0, 0.0)]
+    assert len(pf.resample_ohlcv([], [], 3600)) == 0
+
+
+def test_weekly_candles_start_on_monday(columns_backend):
+    day = 86400 * 1000
+    prices = [[t * day, float(t)] for t in range(19_000, 19_030)]
+
+    candles = pf.resample_ohlcv(prices, [], 7 * 86400)
+
+    assert {datetime.fromtimestamp(c.time, timezone.utc).weekday() for c in candles} == {0}
+    assert sum(1 for _ in candles) == 5
+
+
+def test_crypto_history_uses_twelvedata_intervals(tmp_path, provider):
+    fetcher = pf.PriceFetcher(make_config(tmp_path, candle_store=False))
+
+    day = fetcher.get_historical("BTC", "1D")
+    week = fetcher.get_historical("BTC", "1W")
+
+    assert (day.interval, week.interval) == ("15min", "1h")
+    assert all(c.time % 900 == 0 for c in day.candles)
+    assert [params.get("interval") for params in provider.requests_to("/market_chart")] == [None, None]
+
+
+# =============================================================================
+# Quote index
+# =============================================================================
+
+def test_quote_index_is_shared_between_cache_instances(tmp_path):
+    writer = pf.CacheManager(str(tmp_path), ttl_seconds=60)
+    reader = pf.CacheManager(str(tmp_path), ttl_seconds=60)
+    writer.set_quotes("stock_quotes", [make_quote("AAPL", 1.0), make_quote("MSFT", 2.0)])
+    assert {s: (q.price, stale) for s, (q, stale) in reader.lookup_index(["AAPL", "TSLA"]).items()} == {
+        "AAPL": (1.0, False)
+    }
+
+    time.sleep(0.01)  # Distinct mtime for the rewritten index
+    writer.set_quotes("stock_quotes", [make_quote("AAPL", 3.0)])
+
+    index = reader.lookup_index(["AAPL", "MSFT"])
+    assert {s: q.price for s, (q, _) in index.items()} == {"AAPL": 3.0, "MSFT": 2.0}
+
+
+def test_get_quotes_fetches_only_the_categories_it_needs(provider, fetcher):
+    def requested():
+        quote_batches = [params["symbol"] for params in provider.requests_to("/quote")]
+        return len(provider.requests_to("/coins/markets")), sorted(quote_batches)
+
+    first = fetcher.get_quotes(["btc", "NOPE", "AAPL"])
+    second = fetcher.get_quotes(["AAPL", "BTC"])
+
+    assert [q.symbol for q in first] == ["BTC", "AAPL"]
+    assert [q.symbol for q in second] == ["AAPL", "BTC"]
+    assert requested() == (1, [",".join(pf.STOCKS_ETFS)])
+
+    assert fetcher.get_quote("gold").symbol == "GOLD"
+    assert len(requested()[1]) == 2
+
+
+# =============================================================================
+# Rate limiting
+# =============================================================================
+
+def test_token_bucket_is_thread_safe_and_paces_callers(tmp_path):
+    bucket = pf.TokenBucket(tmp_path / ".ratelimit_test", rate_per_minute=6000, max_wait=10)
+    bucket.acquire(bucket.capacity)  # Start empty: 100 tokens/s from here
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(10):
+                bucket.acquire()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    assert errors == []
+    # 80 tokens at 100/s
+    assert elapsed >= 0.7
+
+
+def test_token_bucket_fail_mode_raises_when_empty(tmp_path):
+    bucket = pf.TokenBucket(tmp_path / ".ratelimit_test", rate_per_minute=60, mode="fail")
+    bucket.acquire(bucket.capacity)
+    with pytest.raises(pf.RateLimitExceeded):
+        bucket.acquire()
+
+
+def test_token_bucket_budget_is_shared_through_its_file(tmp_path):
+    # Separate instances stand in for separate processes
+    first = pf.TokenBucket(tmp_path / ".ratelimit_test", rate_per_minute=60, mode="fail")
+    second = pf.TokenBucket(tmp_path / ".ratelimit_test", rate_per_minute=60, mode="fail")
+    first.acquire(first.capacity)
+    with pytest.raises(pf.RateLimitExceeded):
+        second.acquire()
+
+
+def test_rate_limited_response_penalizes_the_shared_bucket(tmp_path, provider):
+    fetcher = pf.PriceFetcher(make_config(tmp_path, coingecko_rate_per_minute=600))
+    provider.statuses = [429]
+
+    quotes = fetcher.get_crypto_quotes(use_cache=False)
+
+    assert len(quotes) == len(pf.CRYPTO)
+    assert len(provider.requests_to("/coins/markets")) == 2
+    tokens, _ = pf.TokenBucket.STATE.unpack((tmp_path / "cache" / ".ratelimit_coingecko").read_bytes())
+    assert tokens < fetcher.coingecko.limiter.capacity - 2
+
+
+def test_rate_limited_on_every_attempt_raises_rate_limit_exceeded(tmp_path, provider):
+    config = make_config(tmp_path, max_retries=2, twelvedata_rate_per_minute=6000,
+                         coingecko_rate_per_minute=6000)
+    fetcher = pf.PriceFetcher(config)
+
+    async def fetch_async(fetch):
+        async with pf.AsyncPriceFetcher(config) as async_fetcher:
+            return await fetch(async_fetcher)
+
+    requests = [
+        lambda: fetcher.twelvedata.get_quote("AAPL"),
+        lambda: fetcher.coingecko.get_markets(),
+        lambda: asyncio.run(fetch_async(lambda f: f.twelvedata.get_quote("AAPL"))),
+        lambda: asyncio.run(fetch_async(lambda f: f.coingecko.get_markets())),
+    ]
+    for request in requests:
+        provider.statuses = [429, 429]
+        with pytest.raises(pf.RateLimitExceeded):
+            request()
+    assert len(provider.calls) == 8
+
+
+def test_token_bucket_penalty_is_capped_at_max_wait_in_queue_mode(tmp_path):
+    bucket = pf.TokenBucket(tmp_path / ".ratelimit_test", rate_per_minute=600, max_wait=0.5)
+    bucket.penalize(60)
+    started = time.perf_counter()
+    bucket.acquire()
+    assert time.perf_counter() - started <= 0.6
+
+
+def test_token_bucket_raises_when_its_lock_times_out(tmp_path, monkeypatch):
+    bucket = pf.TokenBucket(tmp_path / ".ratelimit_test", rate_per_minute=60)
+    monkeypatch.setattr(bucket, "LOCK_TIMEOUT", 0.05)
+    holder = threading.Thread(target=lambda: bucket._lock.acquire(1))
+    holder.start()
+    holder.join()
+    try:
+        with pytest.raises(pf.LockTimeout):
+            bucket.acquire()
+        with pytest.raises(pf.LockTimeout):
+            bucket.penalize(1)
+    finally:
+        bucket._lock.release()
+
+
+def test_shared_file_lock_admits_one_thread_at_a_time(tmp_path):
+    lock = pf.FileLock(tmp_path / ".shared.lock")
+    inside = []
+    overlaps = []
+
+    def worker():
+        for _ in range(50):
+            with lock.held(5):
+                inside.append(1)
+                if len(inside) > 1:
+                    overlaps.append(1)
+                inside.pop()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert overlaps == []
+
+
+def test_shared_files_are_left_alone_when_their_lock_times_out(tmp_path, monkeypatch):
+    cache = pf.CacheManager(str(tmp_path))
+    board = pf.QuoteBoard(tmp_path / "quotes.board")
+    metrics = pf.Metrics()
+    metrics.path = tmp_path / pf.METRICS_FILE_NAME
+    metrics.inc("retries_total", provider="coingecko")
+    monkeypatch.setattr(cache, "INDEX_LOCK_TIMEOUT", 0.05)
+    monkeypatch.setattr(board, "LOCK_TIMEOUT", 0.05)
+    monkeypatch.setattr(metrics, "LOCK_TIMEOUT", 0.05)
+
+    holders = [cache.lock(cache.INDEX_KEY), pf.FileLock(board._lock.path), metrics._file_lock(metrics.path)]
+    for holder in holders:
+        assert holder.acquire(1)
+    try:
+        cache.update_index([make_quote("AAPL")])
+        board.publish([make_quote("AAPL")])
+        metrics.flush()
+    finally:
+        for holder in holders:
+            holder.release()
+
+    assert cache.read_index(["AAPL"]) == {}
+    assert board.get("AAPL") is None
+    assert not metrics.path.exists()
+    # Kept for the next flush
+    metrics.flush()
+    assert pf.Metrics.load(metrics.path).counters("retries_total") == [({"provider": "coingecko"}, 1)]
+
+
+# =============================================================================
+# Quote batching
+# =============================================================================
+
+def test_stock_quotes_are_requested_in_batches(tmp_path, provider):
+    fetcher = pf.PriceFetcher(make_config(tmp_path, twelvedata_batch_size=4))
+
+    quotes = fetcher.twelvedata.fetch_stock_quotes()
+
+    batches = sorted(params["symbol"].split(",") for params in provider.requests_to("/quote"))
+    assert sorted(len(batch) for batch in batches) == [1, 4, 4]
+    assert sorted(s for batch in batches for s in batch) == sorted(pf.STOCKS_ETFS)
+    assert [q.symbol for q in quotes] == list(pf.STOCKS_ETFS)
+
+
+def test_failed_batch_only_drops_its_own_symbols(tmp_path, provider):
+    config = make_config(tmp_path, twelvedata_batch_size=4)
+    provider.fail_symbols = {"SPY"}
+    expected = [s for s in pf.STOCKS_ETFS if s not in list(pf.STOCKS_ETFS)[:4]]
+
+    async def fetch_async():
+        async with pf.AsyncPriceFetcher(config) as fetcher:
+            return await fetcher.twelvedata.fetch_stock_quotes()
+
+    assert [q.symbol for q in pf.PriceFetcher(config).twelvedata.fetch_stock_quotes()] == expected
+    assert [q.symbol for q in asyncio.run(fetch_async())] == expected
+
+    provider.fail_symbols = set(pf.STOCKS_ETFS)
+    with pytest.raises(OSError):  # requests.HTTPError
+        pf.PriceFetcher(config).twelvedata.fetch_stock_quotes()
+
+
+# =============================================================================
+# CoinGecko paging
+# =============================================================================
+
+def test_markets_pages_split_ids_and_clamp_the_page_size():
+    coin_ids = [info["coingecko_id"] for info in pf.CRYPTO.values()]
+
+    pages = pf.CoinGeckoClient._markets_pages(5)
+
+    assert [len(page["ids"].split(",")) for page in pages] == [5, 5, 3]
+    assert [i for page in pages for i in page["ids"].split(",")] == coin_ids
+    assert len(pf.CoinGeckoClient._markets_pages(1000)) == 1
+    assert len(pf.CoinGeckoClient._markets_pages(0)) == len(coin_ids)
+
+
+def test_crypto_quotes_are_fetched_in_pages_and_survive_a_failed_page(tmp_path, provider):
+    config = make_config(tmp_path, coingecko_page_size=5)
+
+    async def fetch_async():
+        async with pf.AsyncPriceFetcher(config) as fetcher:
+            return await fetcher.coingecko.fetch_crypto_quotes()
+
+    assert [q.symbol for q in pf.PriceFetcher(config).coingecko.fetch_crypto_quotes()] == list(pf.CRYPTO)
+    assert len(provider.requests_to("/coins/markets")) == 3
+
+    provider.fail_symbols = {"bitcoin"}
+    expected = list(pf.CRYPTO)[5:]
+    assert [q.symbol for q in pf.PriceFetcher(config).coingecko.fetch_crypto_quotes()] == expected
+    assert [q.symbol for q in asyncio.run(fetch_async())] == expected
+
+
+# =============================================================================
+# Serve
+# =============================================================================
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def wait_for_socket(path) -> None:
+    """Block until a server accepts connections on the unix socket ``path``."""
+    while True:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(str(path))
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                time.sleep(0.01)
+
+
+def test_serve_answers_json_over_a_keep_alive_unix_socket(tmp_path, provider, fetcher):
+    path = tmp_path / "s.sock"
+    # serve() runs until the process exits; the daemon thread dies with the test run
+    threading.Thread(target=pf.serve, args=(fetcher,), kwargs={"socket_path": str(path)}, daemon=True).start()
+    wait_for_socket(path)
+    connection = UnixHTTPConnection(str(path))
+
+    def get(url):
+        connection.request("GET", url)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    try:
+        assert get("/health") == (200, {"status": "ok"})
+        status, quotes = get("/quotes?symbols=BTC,AAPL")
+        assert status == 200 and [q["symbol"] for q in quotes] == ["BTC", "AAPL"]
+        assert get("/quote/eth")[1]["price"] == 100.0
+        assert get("/quote/NOPE")[0] == 404
+        assert get("/history/AAPL?window=9Y")[0] == 400
+        status, history = get("/history/AAPL?window=1M")
+        assert status == 200 and len(history["candles"]) == 30
+        assert get("/nowhere")[0] == 404
+    finally:
+        connection.close()
+
+
+# =============================================================================
+# Startup cost
+# =============================================================================
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "price_fetcher.py")
+
+
+def run_cli(tmp_path, *args: str, python_options: tuple = (), **env: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PRICE_CACHE_DIR": str(tmp_path / "cache"), **env}
+    return subprocess.run([sys.executable, *python_options, SCRIPT, *args],
+                          capture_output=True, text=True, env=env, check=True)
+
+
+@pytest.mark.parametrize("command", [["list"], ["cache"]])
+def test_offline_commands_do_not_import_deferred_modules(tmp_path, command):
+    trace = run_cli(tmp_path, *command, python_options=("-X", "importtime")).stderr
+    loaded = {line.rsplit("|", 1)[-1].strip() for line in trace.splitlines() if line.startswith("import time:")}
+
+    assert loaded.isdisjoint(pf.DEFERRED_MODULES)
+
+
+def test_bare_cache_command_prints_usage_without_building_a_fetcher(tmp_path):
+    result = run_cli(tmp_path, "cache")
+
+    assert result.stdout.startswith("usage:") and "--sweep" in result.stdout
+    assert not (tmp_path / "cache").exists()
+
+
+def test_offline_commands_start_within_the_budget(tmp_path, monkeypatch):
+    monkeypatch.setenv("PRICE_CACHE_DIR", str(tmp_path / "cache"))
+
+    assert pf.check_startup(pf.STARTUP_BUDGET_MS, runs=3) == []
+
+
+def test_cached_lookups_do_not_create_api_clients(tmp_path, provider):
+    pf.PriceFetcher(make_config(tmp_path)).get_all_quotes()
+
+    fetcher = pf.PriceFetcher(make_config(tmp_path))
+    assert [q.symbol for q in fetcher.get_quotes(["AAPL", "BTC"])] == ["AAPL", "BTC"]
+    assert fetcher._twelvedata is None and fetcher._coingecko is None
+
+
+def test_cli_uses_base_url_overrides_from_the_environment(tmp_path, provider):
+    result = run_cli(tmp_path, "quote", "BTC", COINGECKO_BASE_URL=provider.url)
+
+    assert "BTC" in result.stdout
+    [params] = provider.requests_to("/coins/markets")
+    assert "bitcoin" in params["ids"].split(",")
+
+
+# =============================================================================
+# Market-hours scheduling
+# =============================================================================
+
+def new_york(*args) -> float:
+    return datetime(*args, tzinfo=ZoneInfo("America/New_York")).timestamp()
+
+
+def test_nyse_holidays_follow_the_observance_rules():
+    assert pf.nyse_holidays(2024) == {
+        date(2024, 1, 1), date(2024, 1, 15), date(2024, 2, 19), date(2024, 3, 29), date(2024, 5, 27),
+        date(2024, 6, 19), date(2024, 7, 4), date(2024, 9, 2), date(2024, 11, 28), date(2024, 12, 25),
+    }
+    # Weekend dates move to the adjacent weekday; a Saturday New Year's Day is skipped
+    assert {date(2022, 6, 20), date(2022, 12, 26)} <= pf.nyse_holidays(2022)
+    assert date(2021, 12, 31) not in pf.nyse_holidays(2021)
+    assert {date(2027, 7, 5), date(2027, 12, 24)} <= pf.nyse_holidays(2027)
+    assert [pf._easter(year) for year in (2024, 2025, 2038)] == [date(2024, 3, 31), date(2025, 4, 20),
+                                                                 date(2038, 4, 25)]
+
+
+def test_market_schedules_report_sessions_and_the_last_close():
+    stocks = pf.MARKET_SCHEDULES["stock_quotes"]
+    commodities = pf.MARKET_SCHEDULES["commodity_quotes"]
+    crypto = pf.MARKET_SCHEDULES["crypto_quotes"]
+
+    assert stocks.state(new_york(2024, 7, 5, 10, 0)) == (True, None)
+    # Saturday and the July 4th holiday both fall back to the previous session's close
+    assert stocks.state(new_york(2024, 7, 6, 12, 0)) == (False, new_york(2024, 7, 5, 16, 0))
+    assert stocks.state(new_york(2024, 7, 4, 10, 0)) == (False, new_york(2024, 7, 3, 16, 0))
+
+    assert commodities.state(new_york(2024, 7, 10, 17, 30)) == (False, new_york(2024, 7, 10, 17, 0))
+    assert commodities.state(new_york(2024, 7, 7, 19, 0)) == (True, None)
+    assert commodities.state(new_york(2024, 7, 6, 12, 0)) == (False, new_york(2024, 7, 5, 17, 0))
+    assert crypto.state(new_york(2024, 7, 6, 12, 0)) == (True, None)
+
+
+def test_refresh_scheduler_scales_ttls_by_session_and_volatility(tmp_path):
+    scheduler = pf.RefreshScheduler(pf.CacheManager(str(tmp_path), ttl_seconds=60))
+
+    def quotes(change):
+        return [pf.PriceQuote(**{**make_quote("AAPL").to_dict(), "change_24h": change})]
+
+    open_market = new_york(2024, 7, 5, 10, 0)
+    assert scheduler.ttls("stock_quotes", quotes(0.5), open_market)[0] == 120
+    assert scheduler.ttls("stock_quotes", quotes(10.0), open_market)[0] == 30
+    assert scheduler.ttls("crypto_quotes", quotes(0.0), open_market)[0] == 240
+
+    saturday = new_york(2024, 7, 6, 12, 0)
+    settled = saturday - new_york(2024, 7, 5, 16, 0) - scheduler.CLOSE_SETTLE_SECONDS
+    assert scheduler.ttls("stock_quotes", quotes(0.5), saturday) == (settled, settled)
+    assert scheduler.ttls("all_quotes", quotes(0.5), saturday) == (60, 60)
+
+
+# =============================================================================
+# Watch stream
+# =============================================================================
+
+def test_watch_yields_a_snapshot_then_only_changed_quotes(fetcher, monkeypatch):
+    polls = iter([
+        {"AAPL": 1.0, "BTC": 5.0},
+        {"AAPL": 1.0, "BTC": 5.0},  # No movement: no event
+        {"AAPL": 2.0, "BTC": 5.0},
+        {"AAPL": 2.0, "BTC": 6.0},
+    ])
+    monkeypatch.setattr(fetcher, "get_quotes", lambda symbols: [make_quote(s, p) for s, p in next(polls).items()])
+
+    events = list(itertools.islice(fetcher.watch(["AAPL", "BTC"], interval=0), 3))
+
+    assert [(e["seq"], e["type"]) for e in events] == [(1, "snapshot"), (2, "delta"), (3, "delta")]
+    assert [[(q["symbol"], q["price"]) for q in e["quotes"]] for e in events] == [
+        [("AAPL", 1.0), ("BTC", 5.0)], [("AAPL", 2.0)], [("BTC", 6.0)],
+    ]
+
+
+def test_watch_resends_snapshots_for_late_joiners(fetcher, monkeypatch):
+    monkeypatch.setattr(fetcher, "get_all_quotes", lambda: [make_quote("AAPL")])
+
+    events = list(itertools.islice(fetcher.watch(interval=0, snapshot_every=1e-9), 3))
+
+    assert [(e["seq"], e["type"], len(e["quotes"])) for e in events] == [(1, "snapshot", 1), (2, "snapshot", 1),
+                                                                        (3, "snapshot", 1)]
+
+
+# =============================================================================
+# Quote board
+# =============================================================================
+
+def test_quote_board_round_trips_published_quotes(tmp_path):
+    board = pf.QuoteBoard(tmp_path / "quotes.board")
+    assert board.snapshot() == {} and board.get("AAPL") is None
+
+    quote = pf.PriceQuote(symbol="AAPL", name="Apple Inc", price=1.5, change_24h=0.5, change_24h_usd=0.25,
+                          high_24h=None, low_24h=1.0, volume_24h=None, market_cap=None,
+                          timestamp="2026-01-01T00:00:00", source="twelvedata", asset_type="stock")
+    board.publish([quote, make_quote("NOT-TRACKED")])
+
+    reader = pf.QuoteBoard(tmp_path / "quotes.board")
+    assert reader.get("aapl") == quote
+    assert reader.snapshot() == {"AAPL": quote}
+    price, change, _, high, *_ = reader.records()["AAPL"]
+    assert (price, change) == (1.5, 0.5) and high != high  # NaN marks a missing value
+
+
+def _publish_rounds(path, rounds: int) -> None:
+    board = pf.QuoteBoard(path)
+    symbols = list(pf.QuoteBoard.SYMBOLS)
+    for n in range(1, rounds + 1):
+        board.publish([make_quote(symbol, float(n)) for symbol in symbols])
+
+
+def test_quote_board_readers_never_see_a_torn_update(tmp_path):
+    path = tmp_path / "quotes.board"
+    _publish_rounds(path, 1)
+    writer = multiprocessing.get_context("fork").Process(target=_publish_rounds, args=(path, 2000))
+    writer.start()
+    reader = pf.QuoteBoard(path)
+    snapshots = 0
+    try:
+        while writer.is_alive():
+            prices = {record[0] for record in reader.records().values()}
+            assert len(prices) == 1
+            snapshots += 1
+    finally:
+        writer.join()
+
+    assert writer.exitcode == 0 and snapshots > 0
+    assert {record[0] for record in reader.records().values()} == {2000.0}
+
+
+def test_fetched_quotes_are_published_to_the_board(tmp_path, provider, fetcher):
+    fetcher.get_crypto_quotes()
+
+    board = pf.QuoteBoard(tmp_path / "cache" / pf.QUOTE_BOARD_NAME)
+    assert set(board.snapshot()) == set(pf.CRYPTO)
+    assert board.get("BTC").price == 100.0
+
+
+# =============================================================================
+# Shared history windows
+# =============================================================================
+
+def test_widest_window_shares_the_interval():
+    assert pf.HistoryRequest.resolve("AAPL", "1M").widest().window == "1Y"
+    assert pf.HistoryRequest.resolve("AAPL", "1D").widest().window == "1D"
+    assert pf.HistoryRequest.resolve("BTC", "3M").widest().days == 365
+    assert pf.HistoryRequest.resolve("BTC", "1W").ttl < pf.HistoryRequest.resolve("BTC", "5Y").ttl
+
+
+def test_tail_size_covers_the_widest_window():
+    now = 1000 * 86400
+    request = pf.HistoryRequest.resolve("AAPL", "1M")
+    stored_100_days_ago = {"last_time": now - 100 * 86400}
+
+    assert request.tail_size(stored_100_days_ago, now) == 102
+    assert request.tail_size({"last_time": now - 400 * 86400}, now) is None
+    assert pf.HistoryRequest.resolve("BTC", "1M").tail_size(stored_100_days_ago, now) == 102
+
+
+def test_daily_windows_are_slices_of_one_fetch(tmp_path, provider, fetcher):
+    windows = {window: fetcher.get_historical("AAPL", window) for window in ("1M", "3M", "1Y")}
+
+    assert [int(params["outputsize"]) for params in provider.requests_to("/time_series")] == [365]
+    assert {window: len(data.candles) for window, data in windows.items()} == {"1M": 30, "3M": 90, "1Y": 365}
+    assert list(windows["1M"].candles) == list(windows["1Y"].candles[-30:])
+
+
+def test_day_windows_keep_the_bucket_holding_the_window_start():
+    now = 10 * 86400 + 3600
+    request = pf.HistoryRequest.resolve("BTC", "1W")
+    candles = make_candles(range(0, now, request.step))
+
+    selected = request.select(candles, now)
+
+    assert selected[0].time == now - 7 * 86400 - 3600 + request.step
+    assert selected[0].time <= now - 7 * 86400 < selected[0].time + request.step
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+def test_metrics_counters_and_histograms():
+    metrics = pf.Metrics()
+    metrics.record_request("twelvedata", "/quote", 200, 0.003)
+    metrics.record_request("twelvedata", "/quote", 429, 0.2)
+    metrics.inc("credits_total", 8, provider="twelvedata")
+
+    assert sorted(value for _, value in metrics.counters("requests_total")) == [1, 1]
+    assert metrics.counters("rate_limited_total") == [({"provider": "twelvedata"}, 1)]
+    [(labels, series)] = metrics.histograms("request_seconds")
+    assert labels == {"provider": "twelvedata", "endpoint": "/quote"}
+    assert sum(series[:-1]) == 2 and series[-1] == pytest.approx(0.203)
+    assert 0.0025 <= pf.Metrics.quantile(series, 0.5) <= 0.005
+    assert pf.Metrics.quantile(series, 0.99) <= 0.25
+
+
+def test_metrics_disabled_records_nothing():
+    metrics = pf.Metrics()
+    metrics.enabled = False
+    metrics.inc("retries_total", provider="coingecko")
+    with metrics.timer("stage_seconds", stage="parse"):
+        pass
+
+    assert metrics.to_dict()["counters"] == metrics.to_dict()["histograms"] == []
+
+
+def test_metrics_flush_adds_to_the_file(tmp_path):
+    path = tmp_path / pf.METRICS_FILE_NAME
+    for _ in range(2):
+        metrics = pf.Metrics()
+        metrics.path = path
+        metrics.inc("retries_total", provider="coingecko")
+        metrics.observe("refresh_seconds", 0.01, key="all_quotes")
+        metrics.flush()
+        assert metrics.counters("retries_total") == []
+
+    total = pf.Metrics.load(path)
+    assert total.counters("retries_total") == [({"provider": "coingecko"}, 2)]
+    assert sum(total.histograms("refresh_seconds")[0][1][:-1]) == 2
+
+
+def test_metrics_flush_at_exit_only_once_something_is_recorded(tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(pf.atexit, "register", registered.append)
+    metrics = pf.Metrics()
+
+    metrics.configure(make_config(tmp_path))
+    assert registered == []
+    metrics.inc("retries_total", provider="coingecko")
+    metrics.observe("refresh_seconds", 0.01, key="all_quotes")
+    assert registered == [metrics.flush]
+
+    disabled = pf.Metrics()
+    disabled.configure(make_config(tmp_path, metrics=False))
+    disabled.inc("retries_total", provider="coingecko")
+    recorded_first = pf.Metrics()
+    recorded_first.inc("retries_total", provider="coingecko")
+    recorded_first.configure(make_config(tmp_path))
+    assert registered == [metrics.flush, recorded_first.flush]
+
+
+def test_metrics_render_prometheus():
+    metrics = pf.Metrics()
+    metrics.inc("cache_reads_total", tier="memory", result="hit")
+    metrics.observe("request_seconds", 0.002, provider="coingecko", endpoint="/coins/markets")
+
+    lines = metrics.render_prometheus().splitlines()
+
+    assert "# TYPE price_fetcher_cache_reads_total counter" in lines
+    assert 'price_fetcher_cache_reads_total{result="hit",tier="memory"} 1' in lines
+    assert 'price_fetcher_request_seconds_bucket{endpoint="/coins/markets",provider="coingecko",le="0.001"} 0' in lines
+    assert 'price_fetcher_request_seconds_bucket{endpoint="/coins/markets",provider="coingecko",le="+Inf"} 1' in lines
+    assert 'price_fetcher_request_seconds_count{endpoint="/coins/markets",provider="coingecko"} 1' in lines
+
+
+def test_requests_are_recorded_per_endpoint(provider, fetcher, monkeypatch):
+    metrics = pf.Metrics()
+    monkeypatch.setattr(pf, "METRICS", metrics)
+    provider.statuses.append(500)
+
+    fetcher.get_quote("BTC")
+
+    requests = {labels["status"]: value for labels, value in metrics.counters("requests_total")
+                if labels["provider"] == "coingecko"}
+    assert requests == {"500": 1, "200": 1}
+    assert metrics.counters("retries_total") == [({"endpoint": "coins/markets", "provider": "coingecko"}, 1)]
+
+
+# =============================================================================
+# Benchmark suite
+# =============================================================================
+
+BENCH_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "price_fetcher_bench.py")
+
+
+def test_bench_stand_in_answers_both_providers():
+    import price_fetcher_bench as bench
+
+    stand_in = bench.StandIn(bench.load_payloads())
+
+    status, body = stand_in.respond("/twelvedata/quote", {"symbol": ["AAPL,MSFT"]})
+    assert status == 200 and set(body) == {"AAPL", "MSFT"}
+    status, body = stand_in.respond("/twelvedata/time_series",
+                                    {"symbol": ["AAPL"], "interval": ["1day"], "outputsize": ["5"]})
+    candles, skipped = pf.TwelveDataClient._parse_time_series(body["values"])
+    assert len(candles) == 5 and not skipped
+    status, body = stand_in.respond("/coingecko/coins/bitcoin/market_chart", {"days": ["2"]})
+    assert len(body["prices"]) == 48
+    assert stand_in.respond("/coingecko/unknown", {})[0] == 404
+
+
+def test_bench_injects_errors():
+    import price_fetcher_bench as bench
+
+    stand_in = bench.StandIn(bench.load_payloads(), error_rate=0.5, rate_limited_rate=0.5)
+
+    statuses = {stand_in.respond("/twelvedata/quote", {"symbol": ["AAPL"]})[0] for _ in range(50)}
+    assert statuses == {500, 429}
+
+
+def test_bench_run_writes_results(tmp_path):
+    out = tmp_path / "bench.json"
+    subprocess.run([sys.executable, BENCH_SCRIPT, "--suites", "quotes,cache", "--sizes", "10",
+                    "--repeat", "1", "--json", str(out)], check=True, capture_output=True, timeout=60)
+
+    report = json.loads(out.read_text())
+    assert {row["suite"] for row in report["results"]} == {"quotes", "cache"}
+    assert report["meta"]["options"]["sizes"] == [10]
+
+
+# =============================================================================
+# Tracing
+# =============================================================================
+
+def test_tracer_disabled_records_nothing():
+    tracer = pf.Tracer()
+
+    with tracer.span("quotes.all"):
+        pass
+
+    assert tracer.span("quotes.all") is pf._NO_SPAN
+    assert tracer.summary() == []
+
+
+def test_tracer_summary_subtracts_child_spans():
+    tracer = pf.Tracer()
+    tracer.start(origin_ns=0, network=False)
+    tracer.add("outer", "fetch", 0, 10_000_000)
+    tracer.add("inner", "fetch", 2_000_000, 6_000_000)
+    tracer.add("inner", "fetch", 6_000_000, 7_000_000)
+    tracer.stop()
+
+    summary = {entry["name"]: entry for entry in tracer.summary()}
+
+    assert summary["outer"]["self_ms"] == pytest.approx(5.0)
+    assert summary["inner"]["count"] == 2
+    assert summary["inner"]["total_ms"] == pytest.approx(5.0)
+    assert summary["inner"]["max_ms"] == pytest.approx(4.0)
+    assert tracer.elapsed_ms() == pytest.approx(10.0)
+
+
+def test_traced_coroutines_get_a_row_per_task():
+    tracer = pf.Tracer()
+
+    @tracer.traced("step")
+    async def step():
+        await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(step(), step())
+
+    tracer.start(network=False)
+    asyncio.run(run())
+    tracer.stop()
+
+    assert [entry["count"] for entry in tracer.summary()] == [2]
+    assert len({span[4] for span in tracer._spans}) == 2
+
+
+def test_trace_of_a_fetch(tmp_path, provider, fetcher):
+    pf.TRACER.start()
+    try:
+        fetcher.get_quote("BTC")
+    finally:
+        pf.TRACER.stop()
+    path = tmp_path / "trace.json"
+    pf.TRACER.write_chrome_trace(str(path))
+
+    events = json.loads(path.read_text())["traceEvents"]
+    names = {event["name"] for event in events if event["ph"] == "X"}
+    assert {"quotes.get", "quotes.refresh", "http.get", "net.connect", "coingecko.parse"} <= names
+    assert socket.socket.connect.__name__ == "connect" and not pf.TRACER._patches
+
+
+# =============================================================================
+# SQLite cache backend
+# =============================================================================
+
+def test_sqlite_entries_and_quote_index(tmp_path):
+    cache = pf.SQLiteCacheManager(str(tmp_path), ttl_seconds=60)
+    cache.set("k", {"a": 1})
+    cache.set_quotes("stocks", [make_quote("AAPL", 1.0), make_quote("MSFT", 2.0)])
+
+    assert cache.get("k") == {"a": 1}
+    assert cache.get("missing") is None
+    assert [q.symbol for q in cache.get_quotes("stocks")] == ["AAPL", "MSFT"]
+    index = cache.read_index(["AAPL", "MSFT", "GOOG"])
+    assert {symbol: quote.price for symbol, (quote, _) in index.items()} == {"AAPL": 1.0, "MSFT": 2.0}
+
+
+def test_sqlite_concurrent_writers_and_readers(tmp_path):
+    cache = pf.SQLiteCacheManager(str(tmp_path))
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(25):
+                cache.set(f"w{n}-{i}", {"i": i})
+                cache.get(f"w{(n + 1) % 4}-{i}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert all(cache.get(f"w{n}-{i}") == {"i": i} for n in range(4) for i in range(25))
+
+
+def test_sqlite_expire_and_clear(tmp_path, monkeypatch):
+    cache = pf.SQLiteCacheManager(str(tmp_path))
+    cache.set("k", {"a": 1})
+    merge(cache.candle_store(), make_candles([0, 10]))
+    assert cache.usage()["candle_series"] == 1
+
+    monkeypatch.setattr(cache, "RETENTION_SECONDS", 0)
+    monkeypatch.setattr(cache, "hard_ttl_seconds", 0)
+    time.sleep(0.01)
+    assert cache.expire() == 2
+    assert cache.usage()["entries"] == 0
+    assert len(read(cache.candle_store())) == 0
+
+    cache.set_quotes("stocks", [make_quote("AAPL")])
+    cache.clear()
+    assert cache.get_quotes("stocks") is None
+    assert cache.read_index(["AAPL"]) == {}
+
+
+def test_sqlite_backend_serves_the_fetcher(tmp_path, provider):
+    fetcher = pf.PriceFetcher(make_config(tmp_path, cache_format="sqlite"))
+
+    fetcher.get_quotes(["AAPL", "BTC"])
+    fetcher.get_quotes(["AAPL", "BTC"])
+    history = fetcher.get_historical("AAPL", "1M")
+
+    assert isinstance(fetcher.cache, pf.SQLiteCacheManager)
+    assert len(provider.requests_to("/quote")) == len(provider.requests_to("/coins/markets")) == 1
+    assert len(history.candles) == 30
+    assert [p.name for p in (tmp_path / "cache").glob("*.json")] == []
+
+
+# =============================================================================
+# File cache sweep and eviction
+# =============================================================================
+
+@pytest.fixture(params=[pf.CacheManager, pf.BinaryCacheManager])
+def cache_cls(request):
+    return request.param
+
+
+def age_entry(cache: pf.CacheManager, key: str, used_at: float, written_at: float = None) -> None:
+    """Backdate an entry's last read (atime) and, optionally, its write (mtime)."""
+    path = cache._get_cache_path(key)
+    os.utime(path, (used_at, written_at if written_at is not None else path.stat().st_mtime))
+
+
+def wait_for_sweeps() -> None:
+    for thread in threading.enumerate():
+        if thread.name == "cache-sweep":
+            thread.join()
+
+
+def test_sweep_evicts_least_recently_used_and_keeps_the_index(tmp_path, cache_cls):
+    # Fill unbounded so no background sweep races the test
+    filler = cache_cls(str(tmp_path))
+    filler.set_quotes("stocks", [make_quote("AAPL")])
+    now = time.time()
+    for i in range(20):
+        filler.set(f"k{i}", {"i": i})
+        age_entry(filler, f"k{i}", now - 1000 + i)
+
+    cache = cache_cls(str(tmp_path), max_entries=10)
+    result = cache.sweep()
+
+    # Down to SWEEP_LOW_WATER of the limit, newest first
+    assert result["entries"] == 9
+    assert result["evicted"] == 13
+    assert cache.read_index(["AAPL"])
+    assert [i for i in range(20) if cache.get(f"k{i}") is not None] == list(range(13, 20))
+
+
+def test_reads_protect_entries_from_eviction(tmp_path, cache_cls):
+    filler = cache_cls(str(tmp_path))
+    now = time.time()
+    for i in range(12):
+        filler.set(f"k{i}", {"i": i})
+        age_entry(filler, f"k{i}", now - 1000 + i)
+
+    cache = cache_cls(str(tmp_path), max_entries=10)
+    assert cache.get("k0") == {"i": 0}
+    cache.sweep()
+
+    assert cache.get("k0") is not None
+    assert cache.get("k1") is None
+
+
+def test_sweep_expires_entries_past_retention(tmp_path, cache_cls):
+    cache = cache_cls(str(tmp_path))
+    cache.set("old", {})
+    cache.set("new", {})
+    old = time.time() - cache.retention_seconds - 60
+    age_entry(cache, "old", old, old)
+
+    result = cache.sweep()
+    assert (result["expired"], result["entries"]) == (1, 1)
+    assert cache.get("new") is not None
+
+
+def test_candle_series_count_toward_limits(tmp_path):
+    filler = pf.CacheManager(str(tmp_path))
+    store = filler.candle_store()
+    for symbol in ("A", "B", "C"):
+        with store.lock(symbol, "1day").held(5):
+            store.merge(symbol, "1day", make_candles(range(0, 100, 10)))
+    usage = filler.usage()
+    assert (usage["entries"], usage["candle_series"]) == (3, 3)
+    assert usage["bytes"] == usage["candle_bytes"] > 0
+
+    cache = pf.CacheManager(str(tmp_path), max_entries=2)
+    busy = store.lock("A", "1day")
+    assert busy.acquire(5)
+    try:
+        result = cache.sweep()
+    finally:
+        busy.release()
+
+    # A is the least recently used but is being updated, so it is skipped
+    assert result["evicted"] == 2
+    assert [key for key, *_ in store.entries()] == ["A_1day"]
+
+
+def test_writes_start_a_background_sweep(tmp_path, cache_cls):
+    cache = cache_cls(str(tmp_path), max_entries=10)
+    for i in range(30):
+        cache.set(f"k{i}", {"i": i})
+    wait_for_sweeps()
+    # Writes made during the last sweep are caught by the next one
+    cache.set("last", {})
+    wait_for_sweeps()
+
+    assert cache.usage()["entries"] <= 10